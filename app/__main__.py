@@ -36,14 +36,16 @@ def startup() -> None:
 def shutdown() -> None:
     """ Shutdown function """
     logger.info("Application shutdown!")
+    ServiceManager.stop_services()
 
 
-try:
-    startup()
+if __name__ == "__main__":  # shard processes are spawned and import this module under other name
+    try:
+        startup()
 
-    uvicorn.run(app, host=config.SERVER_HOST, port=config.SERVER_PORT, log_level="error")
-except Exception as e:
-    logger.exception(f"Unexcepted exception at top level: {e}")
-    time.sleep(60 * 5)  # sleep 5 min
-finally:
-    shutdown()
+        uvicorn.run(app, host=config.SERVER_HOST, port=config.SERVER_PORT, log_level="error")
+    except Exception as e:
+        logger.exception(f"Unexcepted exception at top level: {e}")
+        time.sleep(60 * 5)  # sleep 5 min
+    finally:
+        shutdown()
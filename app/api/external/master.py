@@ -2,10 +2,11 @@ __all__ = ["router", ]
 
 from fastapi import APIRouter, Response
 from starlette.requests import Request
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, PlainTextResponse
 
 from app.configuration import logger, config
 from app.manager import ServiceManager
+from app.metrics import registry
 from app.schemas.models import TraderSettings, UserSettings
 
 router = APIRouter()
@@ -61,3 +62,16 @@ async def send_service_statuses(request: Request) -> JSONResponse:
 
     # Возвращаем JSON-ответ со статусами сервисов
     return JSONResponse(content=ServiceManager.get_service_statuses())
+
+
+@router.get("/metrics")
+async def send_metrics(request: Request) -> PlainTextResponse:
+    """
+    Функция возвращает метрики в формате prometheus.
+    """
+    # Проверка на то что запрос пришел с master сервера
+    if request.client.host != config.MASTER_SERVER_HOST:
+        logger.warning(f"Request from unknown host: {request.client.host}:{request.client.port}")
+        return PlainTextResponse(status_code=403, content="Forbidden")
+
+    return PlainTextResponse(content=registry.render(), media_type="text/plain; version=0.0.4")
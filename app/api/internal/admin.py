@@ -10,7 +10,7 @@ from starlette.requests import Request
 from starlette.responses import HTMLResponse
 
 from app.configuration import config
-from app.database import Database, Keys
+from app.database import Database, Keys, Tenant
 from app.manager import ServiceManager
 
 
@@ -57,6 +57,24 @@ class KeysAdmin(ModelView, model=Keys):
         ServiceManager.on_api_keys_update(u=model)
 
 
+class TenantAdmin(ModelView, model=Tenant):
+    name = "Tenant"
+    name_plural = "Tenants"
+    can_create = True
+    can_export = False
+    can_view_details = False
+    can_edit = True
+    can_delete = True
+    column_list = [Tenant.id, Tenant.name, Tenant.exchange, Tenant.api_key, Tenant.status, Tenant.balance_threshold,
+                   Tenant.multiplier]
+
+    async def after_model_change(self, data: dict, model: Tenant, is_created: bool, request: Request) -> None:
+        ServiceManager.on_tenant_update(u=model)
+
+    async def after_model_delete(self, model: Tenant, request: Request) -> None:
+        ServiceManager.on_tenant_delete(tenant_id=model.id)
+
+
 class LogsView(BaseView):
     name = "Logs"
 
@@ -99,7 +117,7 @@ def register_admin_routes(app: FastAPI) -> None:
         logo_url=config.ADMIN_LOGO_URL,
     )
     # Регистрируем модели для админки
-    model_views: list[type[ModelView]] = [KeysAdmin]
+    model_views: list[type[ModelView]] = [KeysAdmin, TenantAdmin]
     for m_view in model_views:
         admin.add_model_view(m_view)
     base_views: list[type[BaseView]] = [StatusView, LogsView]
@@ -21,6 +21,7 @@ class Paths:
     Contains configuration parametrs about paths.
     """
     LOGS_FOLDER_PATH: str = "logs"
+    EXCHANGE_INFO_FOLDER_PATH: str = "exchange_info"
 
 
 @dataclass
@@ -66,12 +67,130 @@ class Configuration:
     # interval to update balance
     BALANCE_UPDATE_INTERVAL: int | float = 1
 
+    # polling - request balance every BALANCE_UPDATE_INTERVAL,
+    # events - take balance from client websocket and request it every BALANCE_SAFETY_POLL_INTERVAL
+    BALANCE_UPDATE_MODE: Literal["polling", "events"] = getenv("BALANCE_UPDATE_MODE", "events")
+
+    # interval to request balance in events mode in case some events were missed
+    BALANCE_SAFETY_POLL_INTERVAL: int | float = 30
+
+    # max time to close all client positions and orders after balance dropped below threshold
+    STOP_TRADE_DEADLINE: int | float = 10
+
+    # pause between stop trade attempts, positions and orders left after attempt are closed again
+    STOP_TRADE_RETRY_DELAY: int | float = 0.5
+
     # interval to notify master-server about current balance
     BALANCE_NOTIFY_INTERVAL: int | float = 60
 
+    # connect and read timeouts of master-server requests
+    MASTER_SERVER_CONNECT_TIMEOUT: int | float = 3
+    MASTER_SERVER_READ_TIMEOUT: int | float = 10
+
+    # max amount of kept alive connections to master-server
+    MASTER_SERVER_POOL_SIZE: int = 4
+
+    # max amount of requests waiting to be sent to master-server, oldest one is dropped on overflow
+    MASTER_SERVER_QUEUE_SIZE: int = 100
+
+    # attempts of one master-server request and delay between them, it doubles up to max and is jittered
+    MASTER_SERVER_RETRIES: int = 5
+    MASTER_SERVER_RETRY_BACKOFF: int | float = 1
+    MASTER_SERVER_MAX_RETRY_BACKOFF: int | float = 30
+
+    # master-server requests are not sent for cooldown after this amount of consecutive failures
+    MASTER_SERVER_BREAKER_THRESHOLD: int = 5
+    MASTER_SERVER_BREAKER_COOLDOWN: int | float = 30
+
     # interval to fetch orders and positions from trader and user accounts
     TRADER_POLLING_INTERVAL: int | float = 10
 
+    # interval to compare local client state from websocket with exchange REST
+    CLIENT_STATE_CHECKSUM_INTERVAL: int | float = 60
+
+    # interval to refresh symbols precisions from exchange
+    EXCHANGE_INFO_UPDATE_INTERVAL: int | float = 60 * 60
+
+    # max time to wait symbols precisions before starting services, which place orders
+    EXCHANGE_INFO_WAIT_TIMEOUT: int | float = 30
+
+    # binance usd-m futures REST and websocket urls, can point to local fake exchange for offline load tests
+    BINANCE_REST_URL: str = getenv("BINANCE_REST_URL", "https://fapi.binance.com")
+    BINANCE_WS_URL: str = getenv("BINANCE_WS_URL", "wss://fstream.binance.com")
+
+    # time to hold trader websocket event, so events of the same symbol are sorted by transaction time
+    WEBSOCKET_REORDER_WINDOW: float = float(getenv("WEBSOCKET_REORDER_WINDOW", "0.02"))
+
+    # amount of serial lanes, in which trader websocket events are copied to clients concurrently,
+    # in multi-tenant mode it should grow with amount of client accounts
+    WEBSOCKET_LANES: int = int(getenv("WEBSOCKET_LANES", "5"))
+
+    # file to record raw trader websocket frames for replay, recording is disabled if it is empty
+    WEBSOCKET_RECORD_PATH: str = getenv("WEBSOCKET_RECORD_PATH", "")
+
+    # time to wait first message of new trader websocket on restart, old one works until then
+    WEBSOCKET_HANDOVER_TIMEOUT: int | float = 10
+
+    # time, during which old trader websocket works after switch to new one, duplicated events are dropped
+    WEBSOCKET_HANDOVER_OVERLAP: int | float = 5
+
+    # interval to check, that trader websocket is alive, it is reconnected and catches up missed events if not
+    WEBSOCKET_WATCHDOG_INTERVAL: int | float = 5
+
+    # relay node rebroadcasts trader stream and book snapshots to client nodes on this port, disabled if it is 0,
+    # feed is not encrypted, so port must be reachable only from client nodes
+    RELAY_SERVER_HOST: str = getenv("RELAY_SERVER_HOST", "127.0.0.1")
+    RELAY_SERVER_PORT: int = int(getenv("RELAY_SERVER_PORT", "0"))
+
+    # host:port of relay node, client node takes trader stream from it instead of exchange, if it is set
+    RELAY_URL: str = getenv("RELAY_URL", "")
+
+    # shared secret, which client node sends to relay node on connect, relay node does not start without it
+    RELAY_TOKEN: str = getenv("RELAY_TOKEN", "")
+
+    # interval of full trader book snapshots in relay feed, client reconnects if relay is silent for 3 intervals
+    RELAY_SNAPSHOT_INTERVAL: int | float = 30
+
+    # max amount of messages queued for one relay subscriber, slow subscriber is disconnected
+    RELAY_SUBSCRIBER_QUEUE_SIZE: int = 10_000
+
+    # amount of worker processes, between which tenants are split by id, tenants run in main process if it is 0
+    TENANT_WORKERS: int = int(getenv("TENANT_WORKERS", "0"))
+
+    # interval of shard status reports to main process and of trader book snapshots sent to shards
+    SHARD_STATUS_INTERVAL: int | float = 5
+    SHARD_SNAPSHOT_INTERVAL: int | float = 30
+
+    # max amount of messages queued for one shard, trader events are dropped for shard, while it is full
+    SHARD_QUEUE_SIZE: int = 10_000
+
+    # delay before polling retries failed action, it doubles with every next failure up to max
+    POLLING_FAILED_ACTION_BACKOFF: int | float = 10
+    POLLING_FAILED_ACTION_MAX_BACKOFF: int | float = 15 * 60
+
+    # time to hold client action taken by websocket or polling, so other path does not repeat it:
+    # while request is in flight (lost request is released after ttl) and after success
+    INFLIGHT_ACTION_TTL: int | float = 10
+    COMPLETED_ACTION_TTL: int | float = 30
+
+    # max amount of concurrent requests to one account in polling cycle
+    POLLING_MAX_CONCURRENCY: int = 5
+
+    # use asyncio connector with pooled keep-alive http session instead of blocking one
+    USE_ASYNC_CONNECTOR: bool = getenv("USE_ASYNC_CONNECTOR", "true").lower() == "true"
+
+    # max amount of opened connections in async connector pool
+    CONNECTOR_POOL_SIZE: int = 100
+
+    # max amount of opened connections to one host in async connector pool
+    CONNECTOR_POOL_SIZE_PER_HOST: int = 50
+
+    # time to keep idle connection alive in async connector pool
+    CONNECTOR_KEEPALIVE_TIMEOUT: int | float = 60
+
+    # total timeout for one request to exchange
+    CONNECTOR_REQUEST_TIMEOUT: int | float = 10
+
     def __post_init__(self) -> None:
         assert self.MASTER_SERVER_HOST, "Master server host and port are required!"
 
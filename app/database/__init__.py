@@ -1,7 +1,9 @@
 __all__ = [
     "Database",
     "KeysRepository",
+    "TenantsRepository",
     "Keys",
+    "Tenant",
 ]
 
 from .database import Database
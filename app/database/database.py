@@ -5,7 +5,7 @@ from sqlalchemy.orm import sessionmaker
 
 from app.configuration import config
 from .models import Base
-from .repositories import KeysRepository
+from .repositories import KeysRepository, TenantsRepository
 
 
 class Database:
@@ -17,3 +17,4 @@ class Database:
     __session_maker = sessionmaker(bind=engine)
 
     keys_repo: KeysRepository = KeysRepository(__session_maker)
+    tenants_repo: TenantsRepository = TenantsRepository(__session_maker)
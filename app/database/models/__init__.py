@@ -1,4 +1,5 @@
-__all__ = ["Base", "Keys", ]
+__all__ = ["Base", "Keys", "Tenant", ]
 
 from .base import Base
 from .keys import Keys
+from .tenant import Tenant
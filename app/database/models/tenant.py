@@ -0,0 +1,48 @@
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.schemas.enums import Exchange
+from app.schemas.models import UserSettings
+from .base import Base
+
+
+class Tenant(Base):
+    """ Database model of additional client account, which follows the same trader in this process """
+
+    __tablename__ = "tenants_table"
+
+    id: Mapped[int] = mapped_column(primary_key=True, unique=True, nullable=False, autoincrement=True)
+
+    name: Mapped[str] = mapped_column(nullable=False, unique=True)
+
+    exchange: Mapped[Exchange] = mapped_column(nullable=True)
+
+    api_key: Mapped[str] = mapped_column(nullable=True, unique=True)
+
+    api_secret: Mapped[str] = mapped_column(nullable=True, unique=True)
+
+    status: Mapped[bool] = mapped_column(nullable=False, default=True)
+
+    balance_threshold: Mapped[float] = mapped_column(nullable=False, default=0.0)
+
+    multiplier: Mapped[float] = mapped_column(nullable=False, default=1.0)
+
+    def __str__(self) -> str:
+        return (f"TenantORM(id={self.id}, name={self.name}, exchange={self.exchange or ''}, "
+                f"api_key_len={len(self.api_key or '')}, api_secret_len={len(self.api_secret or '')}, "
+                f"status={self.status}, balance_threshold={self.balance_threshold}, multiplier={self.multiplier})")
+
+    def __repr__(self) -> str:
+        return (f"<TenantORM(id={self.id}, name={self.name}, exchange={self.exchange or ''}, "
+                f"api_key_len={len(self.api_key or '')}, api_secret_len={len(self.api_secret or '')}, "
+                f"status={self.status}, balance_threshold={self.balance_threshold}, multiplier={self.multiplier})>")
+
+    def is_fully_filled(self) -> bool:
+        return all([self.api_key, self.api_secret, self.exchange])
+
+    def get_user_settings(self) -> UserSettings:
+        """ Settings of tenant in the same model, which master-server sends for main client """
+        return UserSettings(
+            status=bool(self.status),
+            balance_threshold=self.balance_threshold or 0.0,
+            multiplier=self.multiplier if self.multiplier is not None else 1.0
+        )
@@ -1,3 +1,4 @@
-__all__ = ["KeysRepository", ]
+__all__ = ["KeysRepository", "TenantsRepository", ]
 
 from .keys import KeysRepository
+from .tenants import TenantsRepository
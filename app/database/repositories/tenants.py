@@ -0,0 +1,30 @@
+__all__ = ["TenantsRepository", ]
+
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from ..models import Tenant
+
+
+class TenantsRepository:
+    model = Tenant
+
+    def __init__(self, session_maker: sessionmaker):
+        self.session_maker = session_maker
+
+    def get(self, tenant_id: int) -> model | None:
+        """
+        Возвращает клиента по id, если он существует.
+        Если нет - то возвращает None.
+        :return:
+        """
+        with self.session_maker() as session:
+            return session.get(entity=self.model, ident=tenant_id)
+
+    def get_all(self) -> list[model]:
+        """
+        Возвращает всех клиентов, которые работают в этом процессе вместе с основным.
+        :return:
+        """
+        with self.session_maker() as session:
+            return list(session.scalars(select(self.model).order_by(self.model.id)))
@@ -0,0 +1 @@
+from .recorder import FrameRecorder, read_frames
@@ -0,0 +1,627 @@
+"""
+Local stand-in for Binance USDⓈ-M futures for offline load tests.
+Serves REST endpoints used by connectors and user data stream websocket. Orders are matched against mark price:
+MARKET orders are filled at once, LIMIT orders are filled when mark price crosses order price, other order types
+stay NEW until they are canceled. Fills change positions and balance and are pushed to account websockets as
+ORDER_TRADE_UPDATE and ACCOUNT_UPDATE events. Accounts are created on first request by X-MBX-APIKEY header,
+signatures are not checked.
+
+Usage:
+    python -m app.devtools.fake_exchange --port 8100 --latency 0.02 --load-key trader --load-rate 5
+    BINANCE_REST_URL=http://localhost:8100 BINANCE_WS_URL=ws://localhost:8100 python main.py
+Mark price is moved with POST /fake/price?symbol=BTCUSDT&price=60000, trader orders are placed with usual
+POST /fapi/v1/order with trader api key or generated with --load-key.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import secrets
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from aiohttp import WSMsgType, web
+
+# symbol -> (mark price, tick size, step size)
+DEFAULT_SYMBOLS: dict[str, tuple[float, str, str]] = {
+    "BTCUSDT": (60000.0, "0.10", "0.001"),
+    "ETHUSDT": (3000.0, "0.01", "0.001"),
+    "BNBUSDT": (500.0, "0.010", "0.01"),
+    "XRPUSDT": (0.5, "0.0001", "0.1"),
+    "TRXUSDT": (0.15, "0.00001", "1"),
+}
+
+
+class FakeExchangeError(Exception):
+    """ Error answered with 400 status and binance error body """
+
+    def __init__(self, code: int, msg: str) -> None:
+        super().__init__(msg)
+        self.code: int = code
+        self.msg: str = msg
+
+
+def _now() -> int:
+    return int(time.time() * 1000)
+
+
+def _str(value: float) -> str:
+    return f"{value:.8f}".rstrip("0").rstrip(".") or "0"
+
+
+@dataclass
+class FakePosition:
+    amount: float = 0.0  # signed, negative for short
+    entry_price: float = 0.0
+    accumulated_realized: float = 0.0
+
+
+@dataclass(eq=False)
+class FakeAccount:
+    api_key: str
+    balance: float
+    positions: dict[tuple[str, str], FakePosition] = field(default_factory=dict)
+    open_orders: dict[int, dict] = field(default_factory=dict)
+    orders: list[dict] = field(default_factory=list)  # all orders for allOrders
+    trades: list[dict] = field(default_factory=list)  # all fills for userTrades
+    sockets: set[web.WebSocketResponse] = field(default_factory=set)
+    events: Optional[asyncio.Queue] = None
+
+
+class FakeExchange:
+    """ Exchange state and aiohttp application, everything runs in one event loop, so there are no locks """
+
+    def __init__(
+            self,
+            symbols: dict[str, tuple[float, str, str]] = None,
+            latency: float = 0.0,
+            event_latency: float = 0.0,
+            balance: float = 10000.0,
+            hedge_mode: bool = True
+    ) -> None:
+        self.symbols: dict[str, tuple[float, str, str]] = dict(symbols or DEFAULT_SYMBOLS)
+        self.prices: dict[str, float] = {symbol: price for symbol, (price, _, _) in self.symbols.items()}
+        self.latency: float = latency
+        self.event_latency: float = event_latency
+        self.initial_balance: float = balance
+        self.position_sides: tuple[str, ...] = ("LONG", "SHORT") if hedge_mode else ("BOTH",)
+
+        self.accounts: dict[str, FakeAccount] = {}
+        self.listen_keys: dict[str, FakeAccount] = {}
+        self._ids: itertools.count = itertools.count(1_000_000)
+
+    # ---------- state ---------- #
+
+    def get_account(self, api_key: str) -> FakeAccount:
+        account: Optional[FakeAccount] = self.accounts.get(api_key)
+        if account is None:
+            account = self.accounts[api_key] = FakeAccount(api_key=api_key, balance=self.initial_balance)
+            account.events = asyncio.Queue()
+            asyncio.get_running_loop().create_task(self._send_events(account))
+        return account
+
+    def _check_symbol(self, symbol: Optional[str]) -> str:
+        if symbol not in self.symbols:
+            raise FakeExchangeError(-1121, "Invalid symbol.")
+        return symbol
+
+    def new_order(self, account: FakeAccount, params: dict) -> dict:
+        symbol: str = self._check_symbol(params.get("symbol"))
+        order_type: str = params.get("type", "")
+        side: str = params.get("side", "")
+        if side not in ("BUY", "SELL") or not order_type:
+            raise FakeExchangeError(-1102, "Mandatory parameter 'side' or 'type' was not sent or is invalid.")
+
+        client_order_id: str = params.get("newClientOrderId") or f"fake_{secrets.token_hex(8)}"
+        if any(o["clientOrderId"] == client_order_id for o in account.open_orders.values()):
+            raise FakeExchangeError(-4116, "ClientOrderId is duplicated.")
+
+        close_position: bool = str(params.get("closePosition", "false")).lower() == "true"
+        quantity: float = float(params.get("quantity") or 0)
+        if quantity <= 0 and not close_position:
+            raise FakeExchangeError(-4003, "Quantity less than or equal to zero.")
+        if order_type == "LIMIT" and float(params.get("price") or 0) <= 0:
+            raise FakeExchangeError(-4014, "Price not increased by tick size.")
+
+        now: int = _now()
+        order: dict = {
+            "orderId": next(self._ids),
+            "symbol": symbol,
+            "status": "NEW",
+            "clientOrderId": client_order_id,
+            "price": params.get("price", "0"),
+            "avgPrice": "0",
+            "origQty": _str(quantity),
+            "executedQty": "0",
+            "cumQuote": "0",
+            "timeInForce": params.get("timeInForce", "GTC"),
+            "type": order_type,
+            "reduceOnly": str(params.get("reduceOnly", "false")).lower() == "true",
+            "closePosition": close_position,
+            "side": side,
+            "positionSide": params.get("positionSide", "BOTH"),
+            "stopPrice": params.get("stopPrice", "0"),
+            "workingType": "CONTRACT_PRICE",
+            "priceProtect": False,
+            "origType": order_type,
+            "time": now,
+            "updateTime": now,
+        }
+        if order_type == "TRAILING_STOP_MARKET":
+            order["activatePrice"] = params.get("activationPrice", "0")
+            order["priceRate"] = params.get("callbackRate", "0")
+
+        account.orders.append(order)
+        account.open_orders[order["orderId"]] = order
+        self._emit_order(account, order, "NEW", now)
+
+        if order_type == "MARKET" or (order_type == "LIMIT" and self._crosses(order, self.prices[symbol])):
+            self._fill(account, order, self.prices[symbol])
+        return dict(order)
+
+    def cancel_order(self, account: FakeAccount, params: dict) -> dict:
+        symbol: str = self._check_symbol(params.get("symbol"))
+        order: Optional[dict] = None
+        if params.get("orderId"):
+            order = account.open_orders.get(int(params["orderId"]))
+        elif params.get("origClientOrderId"):
+            order = next((o for o in account.open_orders.values()
+                          if o["clientOrderId"] == params["origClientOrderId"]), None)
+        if order is None or order["symbol"] != symbol:
+            raise FakeExchangeError(-2011, "Unknown order sent.")
+
+        del account.open_orders[order["orderId"]]
+        order["status"] = "CANCELED"
+        order["updateTime"] = _now()
+        self._emit_order(account, order, "CANCELED", order["updateTime"])
+        return dict(order)
+
+    def set_price(self, symbol: str, price: float) -> int:
+        """ Moves mark price and fills crossed LIMIT orders at their price, returns amount of filled orders """
+        self.prices[self._check_symbol(symbol)] = price
+        filled: int = 0
+        for account in self.accounts.values():
+            for order in list(account.open_orders.values()):
+                if order["symbol"] == symbol and order["type"] == "LIMIT" and self._crosses(order, price):
+                    self._fill(account, order, float(order["price"]))
+                    filled += 1
+        return filled
+
+    @staticmethod
+    def _crosses(order: dict, price: float) -> bool:
+        if order["side"] == "BUY":
+            return price <= float(order["price"])
+        return price >= float(order["price"])
+
+    def _fill(self, account: FakeAccount, order: dict, price: float) -> None:
+        symbol: str = order["symbol"]
+        position_side: str = order["positionSide"]
+        position: FakePosition = account.positions.setdefault((symbol, position_side), FakePosition())
+
+        quantity: float = float(order["origQty"])
+        if order["closePosition"] or order["reduceOnly"]:
+            quantity = min(quantity, abs(position.amount)) if quantity else abs(position.amount)
+        signed: float = quantity if order["side"] == "BUY" else -quantity
+
+        realized: float = 0.0
+        if position.amount == 0 or (position.amount > 0) == (signed > 0):
+            # Position is opened or increased, entry price is averaged
+            amount: float = position.amount + signed
+            position.entry_price = (position.amount * position.entry_price + signed * price) / amount if amount else 0
+            position.amount = amount
+        else:
+            # Position is reduced, closed or flipped (only in one-way mode)
+            closed: float = min(abs(signed), abs(position.amount))
+            realized = closed * (price - position.entry_price) * (1 if position.amount > 0 else -1)
+            amount: float = round(position.amount + signed, 12)
+            if amount == 0 or (amount > 0) == (position.amount > 0):
+                position.entry_price = position.entry_price if amount else 0.0
+            else:
+                position.entry_price = price
+            position.amount = amount
+        position.accumulated_realized += realized
+        account.balance += realized
+
+        now: int = _now()
+        del account.open_orders[order["orderId"]]
+        order.update(status="FILLED", avgPrice=_str(price), executedQty=_str(quantity),
+                     cumQuote=_str(quantity * price), updateTime=now)
+        account.trades.append({
+            "id": len(account.trades) + 1,
+            "orderId": order["orderId"],
+            "symbol": symbol,
+            "side": order["side"],
+            "positionSide": position_side,
+            "price": _str(price),
+            "qty": _str(quantity),
+            "quoteQty": _str(quantity * price),
+            "realizedPnl": _str(realized),
+            "commission": "0",
+            "commissionAsset": "USDT",
+            "buyer": order["side"] == "BUY",
+            "maker": order["type"] == "LIMIT",
+            "time": now,
+        })
+
+        self._emit_order(account, order, "TRADE", now, last_quantity=quantity, last_price=price, realized=realized)
+        self._emit(account, {
+            "e": "ACCOUNT_UPDATE",
+            "E": now,
+            "T": now,
+            "a": {
+                "m": "ORDER",
+                "B": [{"a": "USDT", "wb": _str(account.balance), "cw": _str(account.balance), "bc": "0"}],
+                "P": [self._position_event(symbol, position_side, position)],
+            },
+        })
+
+    def _position_event(self, symbol: str, position_side: str, position: FakePosition) -> dict:
+        return {
+            "s": symbol,
+            "pa": _str(position.amount),
+            "ep": _str(position.entry_price),
+            "bep": _str(position.entry_price),
+            "cr": _str(position.accumulated_realized),
+            "up": _str((self.prices[symbol] - position.entry_price) * position.amount),
+            "mt": "cross",
+            "iw": "0",
+            "ps": position_side,
+            "ma": "USDT",
+        }
+
+    def _emit_order(self, account: FakeAccount, order: dict, execution_type: str, now: int,
+                    last_quantity: float = 0.0, last_price: float = 0.0, realized: float = 0.0) -> None:
+        o: dict = {
+            "s": order["symbol"],
+            "c": order["clientOrderId"],
+            "S": order["side"],
+            "o": order["type"],
+            "f": order["timeInForce"],
+            "q": order["origQty"],
+            "p": order["price"],
+            "ap": order["avgPrice"],
+            "sp": order["stopPrice"],
+            "x": execution_type,
+            "X": order["status"],
+            "i": order["orderId"],
+            "l": _str(last_quantity),
+            "z": order["executedQty"],
+            "L": _str(last_price),
+            "T": now,
+            "t": len(account.trades) if execution_type == "TRADE" else 0,
+            "b": "0",
+            "a": "0",
+            "m": order["type"] == "LIMIT",
+            "R": order["reduceOnly"],
+            "wt": order["workingType"],
+            "ot": order["origType"],
+            "ps": order["positionSide"],
+            "cp": order["closePosition"],
+            "rp": _str(realized),
+        }
+        if order["type"] == "TRAILING_STOP_MARKET":
+            o["AP"] = order["activatePrice"]
+            o["cr"] = order["priceRate"]
+        self._emit(account, {"e": "ORDER_TRADE_UPDATE", "E": now, "T": now, "o": o})
+
+    def _emit(self, account: FakeAccount, event: dict) -> None:
+        if account.sockets:
+            account.events.put_nowait((time.monotonic() + self.event_latency, json.dumps(event)))
+
+    @staticmethod
+    async def _send_events(account: FakeAccount) -> None:
+        """ Sends events of account in order, every event is delayed by event latency """
+        while True:
+            ready_at, frame = await account.events.get()
+            delay: float = ready_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            for ws in list(account.sockets):
+                try:
+                    await ws.send_str(frame)
+                except Exception:  # noqa
+                    account.sockets.discard(ws)
+
+    # ---------- responses ---------- #
+
+    def balance_response(self, account: FakeAccount) -> list[dict]:
+        balance: str = _str(account.balance)
+        return [{
+            "accountAlias": "fake",
+            "asset": "USDT",
+            "balance": balance,
+            "crossWalletBalance": balance,
+            "crossUnPnl": "0",
+            "availableBalance": balance,
+            "maxWithdrawAmount": balance,
+            "marginAvailable": True,
+            "updateTime": _now(),
+        }]
+
+    def position_risk_response(self, account: FakeAccount, symbol: Optional[str]) -> list[dict]:
+        symbols: list[str] = [self._check_symbol(symbol)] if symbol else list(self.symbols)
+        result: list[dict] = []
+        for s in symbols:
+            for position_side in self.position_sides:
+                position: FakePosition = account.positions.get((s, position_side), FakePosition())
+                mark_price: float = self.prices[s]
+                result.append({
+                    "symbol": s,
+                    "positionAmt": _str(position.amount),
+                    "entryPrice": _str(position.entry_price),
+                    "breakEvenPrice": _str(position.entry_price),
+                    "markPrice": _str(mark_price),
+                    "unRealizedProfit": _str((mark_price - position.entry_price) * position.amount),
+                    "liquidationPrice": "0",
+                    "leverage": "20",
+                    "maxNotionalValue": "1000000",
+                    "marginType": "cross",
+                    "isolatedMargin": "0",
+                    "isAutoAddMargin": "false",
+                    "positionSide": position_side,
+                    "notional": _str(position.amount * mark_price),
+                    "isolatedWallet": "0",
+                    "updateTime": _now(),
+                })
+        return result
+
+    def exchange_info_response(self) -> dict:
+        return {
+            "timezone": "UTC",
+            "serverTime": _now(),
+            "symbols": [{
+                "symbol": symbol,
+                "status": "TRADING",
+                "contractType": "PERPETUAL",
+                "filters": [
+                    {"filterType": "PRICE_FILTER", "tickSize": tick_size, "minPrice": tick_size, "maxPrice": "1000000"},
+                    {"filterType": "LOT_SIZE", "stepSize": step_size, "minQty": step_size, "maxQty": "100000"},
+                    {"filterType": "MARKET_LOT_SIZE", "stepSize": step_size, "minQty": step_size, "maxQty": "10000"},
+                ],
+            } for symbol, (_, tick_size, step_size) in self.symbols.items()],
+        }
+
+    # ---------- http ---------- #
+
+    def create_app(self) -> web.Application:
+        app: web.Application = web.Application(middlewares=[self._middleware])
+        app.add_routes([
+            web.get("/fapi/v1/time", self._time),
+            web.get("/fapi/v1/exchangeInfo", self._exchange_info),
+            web.post("/fapi/v1/listenKey", self._new_listen_key),
+            web.put("/fapi/v1/listenKey", self._keep_listen_key),
+            web.delete("/fapi/v1/listenKey", self._keep_listen_key),
+            web.get("/fapi/v2/balance", self._balance),
+            web.get("/fapi/v2/positionRisk", self._position_risk),
+            web.get("/fapi/v1/openOrders", self._open_orders),
+            web.post("/fapi/v1/order", self._new_order),
+            web.delete("/fapi/v1/order", self._cancel_order),
+            web.delete("/fapi/v1/allOpenOrders", self._cancel_all_orders),
+            web.post("/fapi/v1/batchOrders", self._new_batch_orders),
+            web.delete("/fapi/v1/batchOrders", self._cancel_batch_orders),
+            web.get("/fapi/v1/allOrders", self._all_orders),
+            web.get("/fapi/v1/userTrades", self._user_trades),
+            web.get("/fapi/v1/income", self._income),
+            web.post("/fake/price", self._set_price),
+            web.get("/ws", self._websocket),
+            web.get("/ws/{listen_key}", self._websocket),
+            web.get("/", self._websocket),
+        ])
+        return app
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler) -> web.StreamResponse:
+        if self.latency and not request.path.startswith("/ws") and request.path != "/":
+            await asyncio.sleep(self.latency)
+        try:
+            return await handler(request)
+        except FakeExchangeError as e:
+            return web.json_response({"code": e.code, "msg": e.msg}, status=400)
+        except (KeyError, ValueError) as e:
+            return web.json_response({"code": -1102, "msg": f"Illegal parameter: {e}"}, status=400)
+
+    async def _params(self, request: web.Request) -> tuple[FakeAccount, dict[str, Any]]:
+        """ Connectors send params in query string, form body is accepted too """
+        params: dict[str, Any] = dict(request.query)
+        if request.can_read_body:
+            params.update(await request.post())
+        return self.get_account(request.headers.get("X-MBX-APIKEY", "")), params
+
+    async def _time(self, request: web.Request) -> web.Response:
+        return web.json_response({"serverTime": _now()})
+
+    async def _exchange_info(self, request: web.Request) -> web.Response:
+        return web.json_response(self.exchange_info_response())
+
+    async def _new_listen_key(self, request: web.Request) -> web.Response:
+        account, _ = await self._params(request)
+        listen_key: str = secrets.token_hex(32)
+        self.listen_keys[listen_key] = account
+        return web.json_response({"listenKey": listen_key})
+
+    async def _keep_listen_key(self, request: web.Request) -> web.Response:
+        return web.json_response({})
+
+    async def _balance(self, request: web.Request) -> web.Response:
+        account, _ = await self._params(request)
+        return web.json_response(self.balance_response(account))
+
+    async def _position_risk(self, request: web.Request) -> web.Response:
+        account, params = await self._params(request)
+        return web.json_response(self.position_risk_response(account, params.get("symbol")))
+
+    async def _open_orders(self, request: web.Request) -> web.Response:
+        account, params = await self._params(request)
+        symbol: Optional[str] = params.get("symbol")
+        return web.json_response([dict(o) for o in account.open_orders.values() if not symbol or o["symbol"] == symbol])
+
+    async def _new_order(self, request: web.Request) -> web.Response:
+        account, params = await self._params(request)
+        return web.json_response(self.new_order(account, params))
+
+    async def _cancel_order(self, request: web.Request) -> web.Response:
+        account, params = await self._params(request)
+        return web.json_response(self.cancel_order(account, params))
+
+    async def _cancel_all_orders(self, request: web.Request) -> web.Response:
+        account, params = await self._params(request)
+        symbol: str = self._check_symbol(params.get("symbol"))
+        for order in [o for o in account.open_orders.values() if o["symbol"] == symbol]:
+            self.cancel_order(account, {"symbol": symbol, "orderId": order["orderId"]})
+        return web.json_response({"code": 200, "msg": "The operation of cancel all open order is done."})
+
+    async def _new_batch_orders(self, request: web.Request) -> web.Response:
+        account, params = await self._params(request)
+        results: list[dict] = []
+        for order_params in json.loads(params["batchOrders"])[:5]:
+            try:
+                results.append(self.new_order(account, order_params))
+            except FakeExchangeError as e:
+                results.append({"code": e.code, "msg": e.msg})
+        return web.json_response(results)
+
+    async def _cancel_batch_orders(self, request: web.Request) -> web.Response:
+        account, params = await self._params(request)
+        if params.get("orderIdList"):
+            keys: list[tuple[str, Any]] = [("orderId", i) for i in json.loads(params["orderIdList"])]
+        else:
+            keys = [("origClientOrderId", i) for i in json.loads(params["origClientOrderIdList"])]
+        results: list[dict] = []
+        for key, value in keys[:10]:
+            try:
+                results.append(self.cancel_order(account, {"symbol": params.get("symbol"), key: value}))
+            except FakeExchangeError as e:
+                results.append({"code": e.code, "msg": e.msg})
+        return web.json_response(results)
+
+    async def _all_orders(self, request: web.Request) -> web.Response:
+        account, params = await self._params(request)
+        symbol: str = self._check_symbol(params.get("symbol"))
+        start_time: int = int(params.get("startTime", 0))
+        from_id: int = int(params.get("orderId", 0))
+        orders: list[dict] = [dict(o) for o in account.orders
+                              if o["symbol"] == symbol and o["updateTime"] >= start_time and o["orderId"] >= from_id]
+        return web.json_response(orders[:int(params.get("limit", 500))])
+
+    async def _user_trades(self, request: web.Request) -> web.Response:
+        account, params = await self._params(request)
+        symbol: str = self._check_symbol(params.get("symbol"))
+        start_time: int = int(params.get("startTime", 0))
+        from_id: int = int(params.get("fromId", 0))
+        trades: list[dict] = [t for t in account.trades
+                              if t["symbol"] == symbol and t["time"] >= start_time and t["id"] >= from_id]
+        return web.json_response(trades[:int(params.get("limit", 500))])
+
+    async def _income(self, request: web.Request) -> web.Response:
+        """ Only commission records, one per fill """
+        account, params = await self._params(request)
+        start_time: int = int(params.get("startTime", 0))
+        records: list[dict] = [{"symbol": t["symbol"], "incomeType": "COMMISSION", "income": t["commission"],
+                                "asset": t["commissionAsset"], "info": "", "time": t["time"], "tranId": t["id"],
+                                "tradeId": str(t["id"])} for t in account.trades if t["time"] >= start_time]
+        return web.json_response(records[:int(params.get("limit", 100))])
+
+    async def _set_price(self, request: web.Request) -> web.Response:
+        _, params = await self._params(request)
+        filled: int = self.set_price(params.get("symbol"), float(params["price"]))
+        return web.json_response({"symbol": params["symbol"], "price": params["price"], "filled": filled})
+
+    async def _websocket(self, request: web.Request) -> web.WebSocketResponse:
+        """ User data stream: listen key is taken from path (/ws/<listenKey>) or from SUBSCRIBE message """
+        ws: web.WebSocketResponse = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+
+        subscribed: set[FakeAccount] = set()
+        listen_key: Optional[str] = request.match_info.get("listen_key")
+        if listen_key in self.listen_keys:
+            subscribed.add(self.listen_keys[listen_key])
+            self.listen_keys[listen_key].sockets.add(ws)
+
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                data: dict = json.loads(msg.data)
+                if data.get("method") == "SUBSCRIBE":
+                    for key in data.get("params", []):
+                        account: Optional[FakeAccount] = self.listen_keys.get(key)
+                        if account is not None:
+                            subscribed.add(account)
+                            account.sockets.add(ws)
+                await ws.send_str(json.dumps({"result": None, "id": data.get("id")}))
+        finally:
+            for account in subscribed:
+                account.sockets.discard(ws)
+        return ws
+
+    # ---------- load ---------- #
+
+    async def generate_load(self, api_key: str, rate: float) -> None:
+        """ Trades on account with api key: opens and closes positions with MARKET orders, places and cancels
+        LIMIT orders and moves mark prices, rate is amount of actions per second """
+        account: FakeAccount = self.get_account(api_key)
+        while True:
+            await asyncio.sleep(1 / rate)
+            symbol: str = random.choice(list(self.symbols))
+            price: float = self.prices[symbol]
+            position_side: str = random.choice(self.position_sides)
+            position: FakePosition = account.positions.get((symbol, position_side), FakePosition())
+            quantity: str = self._min_notional_quantity(symbol)
+            action: float = random.random()
+            try:
+                if action < 0.3:
+                    side: str = "SELL" if position_side == "SHORT" else "BUY"
+                    self.new_order(account, {"symbol": symbol, "type": "MARKET", "side": side,
+                                             "positionSide": position_side, "quantity": quantity})
+                elif action < 0.5 and position.amount:
+                    self.new_order(account, {"symbol": symbol, "type": "MARKET",
+                                             "side": "SELL" if position.amount > 0 else "BUY",
+                                             "positionSide": position_side, "quantity": _str(abs(position.amount))})
+                elif action < 0.75:
+                    side = random.choice(("BUY", "SELL"))
+                    offset: float = price * random.uniform(0.001, 0.01) * (-1 if side == "BUY" else 1)
+                    self.new_order(account, {"symbol": symbol, "type": "LIMIT", "side": side, "timeInForce": "GTC",
+                                             "positionSide": position_side if self.position_sides != ("BOTH",)
+                                             else "BOTH", "quantity": quantity, "price": _str(price + offset)})
+                elif action < 0.9 and account.open_orders:
+                    order: dict = random.choice(list(account.open_orders.values()))
+                    self.cancel_order(account, {"symbol": order["symbol"], "orderId": order["orderId"]})
+                else:
+                    self.set_price(symbol, price * random.uniform(0.995, 1.005))
+            except FakeExchangeError:
+                continue
+
+    def _min_notional_quantity(self, symbol: str) -> str:
+        """ Quantity of about 10 USDT rounded up to step size """
+        step: float = float(self.symbols[symbol][2])
+        steps: int = max(int(10 / self.prices[symbol] / step) + 1, 1)
+        return _str(steps * step)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local fake Binance USDⓈ-M futures exchange")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.0, help="Delay of every REST response in seconds")
+    parser.add_argument("--event-latency", type=float, default=0.0, help="Delay of websocket events in seconds")
+    parser.add_argument("--balance", type=float, default=10000.0, help="USDT balance of new accounts")
+    parser.add_argument("--one-way", action="store_true", help="One-way position mode instead of hedge mode")
+    parser.add_argument("--load-key", help="Api key of account (trader), which trades by itself")
+    parser.add_argument("--load-rate", type=float, default=1.0, help="Actions per second of --load-key account")
+    args = parser.parse_args()
+
+    exchange: FakeExchange = FakeExchange(
+        latency=args.latency, event_latency=args.event_latency, balance=args.balance, hedge_mode=not args.one_way)
+    app: web.Application = exchange.create_app()
+    if args.load_key:
+        async def start_load(_: web.Application) -> None:
+            asyncio.get_running_loop().create_task(exchange.generate_load(args.load_key, args.load_rate))
+
+        app.on_startup.append(start_load)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
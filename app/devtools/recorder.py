@@ -0,0 +1,43 @@
+"""
+Module that records raw websocket frames to append-only file.
+Every line is "<receive time in ms>\t<raw frame>", frames of binance user data stream have no new lines.
+"""
+__all__ = ["FrameRecorder", "read_frames", ]
+
+import os
+import threading
+import time
+from typing import Iterator
+
+
+class FrameRecorder:
+    """ Appends raw frames with receive time to file, buffer is flushed not more than once per flush_interval """
+
+    def __init__(self, path: str, flush_interval: float = 1.0) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8", buffering=1 << 16)
+        self._lock: threading.Lock = threading.Lock()
+        self._flush_interval: float = flush_interval
+        self._last_flush: float = time.monotonic()
+
+    def write(self, frame: str | bytes, received_at: float) -> None:
+        if isinstance(frame, bytes):
+            frame = frame.decode("utf-8")
+        with self._lock:
+            self._file.write(f"{int(received_at * 1000)}\t{frame}\n")
+            if time.monotonic() - self._last_flush > self._flush_interval:
+                self._file.flush()
+                self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def read_frames(path: str) -> Iterator[tuple[float, str]]:
+    """ Yields receive time in seconds and raw frame from recorded file """
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            received_at, _, frame = line.rstrip("\n").partition("\t")
+            if frame:
+                yield int(received_at) / 1000, frame
@@ -0,0 +1,156 @@
+"""
+Replay driver for recorded trader websocket frames.
+Feeds frames to BinanceTraderWebsocket.handle_websocket_message with mock client connector and reports
+throughput, handler latency percentiles and order actions, so changes can be compared on identical input.
+
+Usage:
+    MASTER_SERVER_HOST=localhost python -m app.devtools.replay frames.log --speed 10 --latency 0.05
+    --speed 1 - real time, N - N times faster, 0 - as fast as possible
+"""
+import argparse
+import json
+import time
+from collections import Counter
+from typing import Any, Optional
+
+from app.configuration import config
+from app.schemas.enums import Exchange, RequestPriority
+from app.schemas.models import TraderSettings, UserSettings
+from app.schemas.types import Order, Position
+from app.services.connectors import AbstractExchangeConnector
+from app.services.connectors.binance_conn import BinanceTraderWebsocket
+from app.services.connectors.binance_conn.events import OrderTradeUpdateEvent
+from .recorder import read_frames
+
+
+class MockConnector(AbstractExchangeConnector):
+    """ Connector without exchange: every order action is recorded and answered after latency seconds """
+
+    def __init__(self, latency: float = 0.0, api_key: str = "replay") -> None:
+        super().__init__(api_key=api_key, api_secret="replay")
+
+        self._latency: float = latency
+        self.actions: list[dict] = []
+
+    def _action(self, method: str, **kwargs) -> dict:
+        if self._latency:
+            time.sleep(self._latency)
+        action: dict = {"method": method, **{k: repr(v) for k, v in kwargs.items()}}
+        self.actions.append(action)
+        return action
+
+    def get_current_balance(self) -> float:
+        return 0.0
+
+    def get_all_open_positions(self, priority: Optional[RequestPriority] = None) -> list[Position]:
+        return []
+
+    def get_all_open_orders(self, priority: Optional[RequestPriority] = None) -> list[Order]:
+        return []
+
+    def copy_order(self, order: Order) -> dict:
+        return self._action("copy_order", order=order)
+
+    def copy_order_from_websocket_message(self, order: Any) -> dict:
+        return self._action("copy_order_from_websocket_message", order=order)
+
+    def close_position_from_websocket_message(self, position: Any) -> dict:
+        return self._action("close_position_from_websocket_message", position=position)
+
+    def close_position(self, position: Position, priority: Optional[RequestPriority] = None) -> dict:
+        return self._action("close_position", position=position)
+
+    def cancel_order(self, symbol: str, order_id: int | str) -> dict:
+        return self._action("cancel_order", symbol=symbol, order_id=order_id)
+
+    def cancel_order_by_client_order_id(self, symbol: str, client_order_id: str) -> dict:
+        return self._action("cancel_order_by_client_order_id", symbol=symbol, client_order_id=client_order_id)
+
+    def cancel_all_open_orders(self, symbol: str, priority: Optional[RequestPriority] = None) -> dict:
+        return self._action("cancel_all_open_orders", symbol=symbol)
+
+    def create_listen_key(self) -> str:
+        return "replay"
+
+
+class ReplayTraderWebsocket(BinanceTraderWebsocket):
+    """ Trader websocket, which keeps handler latency of every order action """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.latencies: list[float] = []
+
+    def _observe_copy_latency(self, event: OrderTradeUpdateEvent, received_at: float, started_at: float,
+                              action: str) -> None:
+        super()._observe_copy_latency(event, received_at, started_at, action)
+        self.latencies.append(time.time() - received_at)
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * percent / 100), len(values) - 1)]
+
+
+def replay(path: str, speed: float = 0.0, latency: float = 0.0, multiplier: float = 1.0) -> dict:
+    """ Replays recorded file and returns report """
+    connector: MockConnector = MockConnector(latency=latency)
+    websocket: ReplayTraderWebsocket = ReplayTraderWebsocket(
+        connector_factory=lambda which: connector,
+        user_settings=UserSettings(status=True, balance_threshold=0, multiplier=multiplier),
+        trader_settings=TraderSettings(status=True, api_key="replay", api_secret="replay", exchange=Exchange.BINANCE),
+        callback=lambda *args: None
+    )
+
+    frames: int = 0
+    first_received_at: Optional[float] = None
+    started_at: float = time.time()
+    for received_at, frame in read_frames(path):
+        if first_received_at is None:
+            first_received_at = received_at
+        if speed:
+            delay: float = started_at + (received_at - first_received_at) / speed - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        websocket.handle_websocket_message(None, frame)
+        frames += 1
+    fed_at: float = time.time()
+
+    # Wait until all lanes are empty and last tasks are finished
+    while websocket._lanes.qsize():  # noqa
+        time.sleep(0.01)
+    time.sleep(config.WEBSOCKET_REORDER_WINDOW + latency + 0.1)
+    websocket._lanes.shutdown()  # noqa
+
+    return {
+        "frames": frames,
+        "feed_seconds": round(fed_at - started_at, 3),
+        "frames_per_second": round(frames / max(fed_at - started_at, 1e-9), 1),
+        "actions": dict(Counter(a["method"] for a in connector.actions)),
+        "latency_ms": {
+            f"p{p}": round(_percentile(websocket.latencies, p) * 1000, 3) for p in (50, 90, 99, 100)
+        },
+        "action_log": connector.actions,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded trader websocket frames")
+    parser.add_argument("path", help="File recorded with WEBSOCKET_RECORD_PATH")
+    parser.add_argument("--speed", type=float, default=0.0, help="1 - real time, N - N times faster, 0 - max")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mock REST latency in seconds")
+    parser.add_argument("--multiplier", type=float, default=1.0, help="User settings multiplier")
+    parser.add_argument("--actions", help="File to write order actions to, for diff between runs")
+    args = parser.parse_args()
+
+    report: dict = replay(args.path, speed=args.speed, latency=args.latency, multiplier=args.multiplier)
+    action_log: list[dict] = report.pop("action_log")
+    if args.actions:
+        with open(args.actions, "w") as file:
+            json.dump(sorted(action_log, key=json.dumps), file, indent=1)  # lanes run in parallel
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
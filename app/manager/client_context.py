@@ -0,0 +1,225 @@
+__all__ = ["ClientContext", ]
+
+from typing import Callable, Literal, Optional
+
+from ..configuration import logger
+from ..database import Tenant
+from ..schemas.enums import BalanceStatus, Exchange
+from ..schemas.models import UserSettings, TraderSettings
+from ..schemas.types import Position, TenantServiceStatus
+from ..services import *
+from ..services.connectors import ClientSubscription
+
+
+class ClientContext:
+    """
+    Аккаунт клиента со всеми его сервисами: коннектор, настройки, вебсокет клиента, поллинг, баланс и warden.
+    Трейдер, его коннектор и вебсокет общие для всех клиентов процесса, поэтому передаются фабриками.
+    """
+
+    def __init__(
+            self,
+            client_id: str,
+            name: str,
+            exchange: Optional[Exchange],
+            api_key: Optional[str],
+            api_secret: Optional[str],
+            user_settings: UserSettings,
+            trader_settings: TraderSettings,
+            trader_connector_factory: Callable[[], Optional[AbstractExchangeConnector]],
+            trader_book_factory: Callable[[], Optional[AbstractAccountBook]],
+            balance_changed_callbacks: Optional[list[Callable[[float], None]]] = None,
+            shard: Optional[int] = None
+    ) -> None:
+        """
+        :param client_id: Уникальный id клиента в процессе, по нему разделяются очереди вебсокета трейдера.
+        :param trader_connector_factory: Возвращает общий коннектор трейдера.
+        :param trader_book_factory: Возвращает общую книгу трейдера из его вебсокета.
+        :param balance_changed_callbacks: Дополнительные получатели баланса клиента,
+            например, уведомление мастер-сервера.
+        :param shard: Номер процесса-шарда, в котором работает клиент, None - основной процесс.
+        """
+        self.client_id: str = client_id
+        self.name: str = name
+        self.shard: Optional[int] = shard
+
+        self._user_settings: UserSettings = user_settings
+        self._trader_connector_factory: Callable[[], Optional[AbstractExchangeConnector]] = trader_connector_factory
+        self._balance_status: BalanceStatus = BalanceStatus.NOT_DEFINED
+
+        self._client_connector: Optional[AbstractExchangeConnector] = None
+        self._keys: tuple[Optional[Exchange], Optional[str], Optional[str]] = (None, None, None)
+        self._init_client_connector(exchange, api_key, api_secret)
+
+        # Иницаилизируем и связываем сервисы клиента
+        self.client_stream_service: ClientStreamService = ClientStreamService(
+            connector_factory=self.connector_factory,
+            exchange=exchange
+        )
+        self.trader_polling_service: TraderPollingService = TraderPollingService(
+            connector_factory=self.connector_factory,
+            user_settings=user_settings,
+            trader_settings=trader_settings,
+            trader_book_factory=trader_book_factory,
+            client_book_factory=self.client_stream_service.get_client_book
+        )
+        self.balance_warden_service: BalanceWardenService = BalanceWardenService(
+            connector_factory=self.connector_factory,
+            balance_threshold=user_settings.balance_threshold,
+            balance_status_callbacks=[
+                self._on_balance_status_update,
+                self.trader_polling_service.on_balance_status_update
+            ]
+        )
+        self.balance_updater_service: BalanceUpdaterService = BalanceUpdaterService(
+            connector_factory=self.connector_factory,
+            balance_changed_callbacks=[
+                *(balance_changed_callbacks or []),
+                self.balance_warden_service.balance_update_event
+            ],
+            client_book_factory=self.client_stream_service.get_client_book
+        )
+
+        self.client_stream_service.add_balance_listener(self.balance_updater_service.on_balance_event)
+
+    @classmethod
+    def from_tenant(
+            cls,
+            tenant: Tenant,
+            trader_settings: TraderSettings,
+            trader_connector_factory: Callable[[], Optional[AbstractExchangeConnector]],
+            trader_book_factory: Callable[[], Optional[AbstractAccountBook]],
+            shard: Optional[int] = None
+    ) -> "ClientContext":
+        """ Создает контекст клиента из таблицы tenants. """
+        return cls(
+            client_id=f"tenant-{tenant.id}",
+            name=tenant.name,
+            exchange=tenant.exchange,
+            api_key=tenant.api_key,
+            api_secret=tenant.api_secret,
+            user_settings=tenant.get_user_settings(),
+            trader_settings=trader_settings,
+            trader_connector_factory=trader_connector_factory,
+            trader_book_factory=trader_book_factory,
+            shard=shard
+        )
+
+    def on_tenant_update(self, tenant: Tenant) -> None:
+        """ Обновляет имя, настройки и, если они изменились, ключи клиента из таблицы tenants. """
+        self.name = tenant.name
+        self.on_user_settings_update(tenant.get_user_settings())
+        if self._keys != (tenant.exchange, tenant.api_key, tenant.api_secret):
+            self.on_api_keys_update(tenant.exchange, tenant.api_key, tenant.api_secret)
+
+    @property
+    def exchange(self) -> Optional[Exchange]:
+        return self._keys[0]
+
+    def start(self) -> None:
+        """ Запускает сервисы клиента. """
+        self.client_stream_service.start()
+        self.balance_updater_service.start()
+        self.trader_polling_service.start()
+
+    def stop(self) -> None:
+        """ Останавливает сервисы клиента, перед этим клиента нужно отписать от вебсокета трейдера. """
+        self.trader_polling_service.stop()
+        self.balance_updater_service.stop()
+        self.client_stream_service.stop()
+        self._client_connector = None
+
+    def get_subscription(self) -> ClientSubscription:
+        """ Подписка клиента на события общего вебсокета трейдера. """
+        return ClientSubscription(
+            client_id=self.client_id,
+            connector_factory=self.connector_factory,
+            user_settings_factory=self.get_user_settings,
+            is_active=self.can_copy
+        )
+
+    def get_user_settings(self) -> UserSettings:
+        return self._user_settings
+
+    def get_client_connector(self) -> Optional[AbstractExchangeConnector]:
+        return self._client_connector
+
+    def can_copy(self) -> bool:
+        """ Можно ли копировать события трейдера в аккаунт клиента. """
+        return bool(self._client_connector) and self._user_settings.status and \
+            self._balance_status == BalanceStatus.CAN_TRADE
+
+    def get_status(self) -> TenantServiceStatus:
+        return TenantServiceStatus(
+            client_id=self.client_id,
+            name=self.name,
+            shard=self.shard,
+            trader_polling_status=self.trader_polling_service.get_status(),
+            client_stream_status=self.client_stream_service.get_status(),
+            balance_updater_status=self.balance_updater_service.get_status(),
+            balance_warden_status=self.balance_warden_service.get_status(),
+            rate_limit_status=self._client_connector.get_rate_limit_status() if self._client_connector else None
+        )
+
+    def on_user_settings_update(self, u: UserSettings) -> None:
+        logger.info(f"User settings update of client {self.client_id}: {u}")
+        self._user_settings = u
+        self.balance_warden_service.on_user_settings_update(u)
+        self.balance_updater_service.refresh()  # warden status is reset, so it is evaluated again right away
+        self.trader_polling_service.on_user_settings_update(u)
+
+    def on_trader_settings_update(self, u: TraderSettings) -> None:
+        self.trader_polling_service.on_trader_settings_update(u)
+
+    def on_api_keys_update(
+            self,
+            exchange: Optional[Exchange],
+            api_key: Optional[str],
+            api_secret: Optional[str]
+    ) -> None:
+        logger.info(f"Api keys update of client {self.client_id}")
+        self._init_client_connector(exchange, api_key, api_secret)
+        self.client_stream_service.on_api_keys_update(exchange)
+        self.balance_updater_service.refresh()
+
+    def connector_factory(self, which: Literal["trader", "client"]) -> Optional[AbstractExchangeConnector]:
+        """ Фабрика коннекторов для сервисов клиента: свой коннектор клиента и общий коннектор трейдера. """
+        if which == "client":
+            return self._client_connector
+        elif which == "trader":
+            return self._trader_connector_factory()
+        else:
+            raise ValueError("Wrong connector type!")
+
+    def _init_client_connector(
+            self,
+            exchange: Optional[Exchange],
+            api_key: Optional[str],
+            api_secret: Optional[str]
+    ) -> None:
+        """ Функция обновляет коннектор клиента. """
+        self._keys = (exchange, api_key, api_secret)
+        try:
+            if all(self._keys):
+                self._client_connector = EXCHANGE_TO_CONNECTOR[exchange](api_key=api_key, api_secret=api_secret)
+                self._client_connector.set_position_cache(self._client_position_cache)
+                logger.debug(f"Connector of client {self.client_id} updated")
+            else:
+                self._client_connector = None
+                logger.info(f"Keys of client {self.client_id} are not fully filled, can't init connector")
+        except Exception as e:
+            self._client_connector = None
+            logger.error(f"Error while init connector of client {self.client_id}: {e}")
+
+    def _client_position_cache(self, symbol: str, position_side: str) -> Optional[Position]:
+        """
+        Функция передается в коннектор клиента, чтобы он брал позиции из вебсокета клиента, а не через REST.
+        Сервис может быть еще не создан при инициализации коннектора, поэтому он берется при каждом вызове.
+        """
+        client_stream_service: Optional[ClientStreamService] = getattr(self, "client_stream_service", None)
+        if client_stream_service:
+            return client_stream_service.get_client_position(symbol, position_side)
+
+    def _on_balance_status_update(self, balance_status: BalanceStatus) -> None:
+        logger.info(f"Balance status update of client {self.client_id}: {balance_status}")
+        self._balance_status = balance_status
@@ -1,23 +1,37 @@
-from typing import Optional, Literal
-
-from ..configuration import logger
-from ..database import Keys, Database
+import threading
+from typing import Callable, Optional, Literal
+
+from .client_context import ClientContext
+from .shards import ShardSupervisor
+from ..configuration import config, logger
+from ..database import Keys, Tenant, Database
+from ..schemas.enums import Exchange
 from ..schemas.models import UserSettings, TraderSettings
-from ..schemas.types import UnifiedServiceStatus
+from ..schemas.types import ShardStatus, UnifiedServiceStatus
 from ..services import *
+from ..services.connectors import PRIMARY_CLIENT_ID
 from ..utils import request_model
 
 
 class ServiceManager:
+    """
+    Запускает и связывает сервисы процесса.
+    Основной клиент берет ключи из админки и настройки с мастер-сервера, дополнительные клиенты (tenants) -
+    из таблицы в админке. У каждого клиента свои коннектор, настройки и сервисы, трейдер и его вебсокет общие.
+    Если задан TENANT_WORKERS, дополнительные клиенты работают в процессах-шардах, а основной процесс
+    раздает им события трейдера.
+    """
     _running: bool = False
-    _client_connector: Optional[AbstractExchangeConnector] = None
     _trader_connector: Optional[AbstractExchangeConnector] = None
+    _trader_settings: TraderSettings
 
     _trader_websocket_service: TraderWebsocketService
-    _trader_polling_service: TraderPollingService
-    _balance_updater_service: BalanceUpdaterService
-    _balance_warden_service: BalanceWardenService
+    _trader_relay_service: Optional[TraderRelayService] = None
     _balance_notifyer_service: BalanceNotifyerService
+    _client_context: ClientContext
+    _tenant_contexts: dict[int, ClientContext] = {}
+    _tenants_lock: threading.Lock = threading.Lock()
+    _shard_supervisor: Optional[ShardSupervisor] = None
 
     @classmethod
     def run_services(cls) -> None:
@@ -34,90 +48,172 @@ class ServiceManager:
         logger.debug(f"Got user settings from master-server: {user_settings}")
         trader_settings: TraderSettings = request_model("trader_settings", TraderSettings)
         logger.debug(f"Got trader settings from master-server: {trader_settings}")
+        # В режиме шардов клиентов из таблицы загружают процессы-шарды
+        tenants: list[Tenant] = Database.tenants_repo.get_all() if not config.TENANT_WORKERS else []
+        logger.debug(f"Got {len(tenants)} tenants from database")
 
-        # Инициализируем коннекторы
-        cls._init_client_connector(keys)
+        # Инициализируем коннектор трейдера и общие сервисы
+        cls._trader_settings = trader_settings
         cls._init_trader_connector(trader_settings)
-
-        # Иницаилизируем и связываем сервисы
         cls._balance_notifyer_service = BalanceNotifyerService()
-        cls._trader_polling_service = TraderPollingService(
-            connector_factory=cls._connector_factory,
-            user_settings=user_settings,
-            trader_settings=trader_settings
-        )
         cls._trader_websocket_service = TraderWebsocketService(
             connector_factory=cls._connector_factory,
-            user_settings=user_settings,
             trader_settings=trader_settings
         )
-        cls._balance_warden_service = BalanceWardenService(
-            connector_factory=cls._connector_factory,
-            balance_threshold=user_settings.balance_threshold,
-            balance_status_callbacks=[
-                cls._trader_websocket_service.on_balance_status_update,
-                cls._trader_polling_service.on_balance_status_update
-            ]
-        )
-        cls._balance_updater_service = BalanceUpdaterService(
-            connector_factory=cls._connector_factory,
-            balance_changed_callbacks=[
-                cls._balance_notifyer_service.balance_update_event,
-                cls._balance_warden_service.balance_update_event
-            ]
+        if config.RELAY_SERVER_PORT:
+            # Узел раздает события трейдера другим узлам
+            cls._trader_relay_service = TraderRelayService(
+                trader_book_factory=cls._trader_websocket_service.get_trader_book
+            )
+            cls._trader_websocket_service.add_event_listener(cls._trader_relay_service.publish)
+        if config.TENANT_WORKERS:
+            cls._shard_supervisor = ShardSupervisor(
+                workers=config.TENANT_WORKERS,
+                trader_settings=trader_settings,
+                trader_book_factory=cls._trader_websocket_service.get_trader_book
+            )
+            cls._trader_websocket_service.add_event_listener(cls._shard_supervisor.publish)
+
+        # Иницаилизируем клиентов, мастер-сервер получает баланс только основного клиента
+        cls._client_context = cls._create_client_context(
+            client_id=PRIMARY_CLIENT_ID,
+            name=PRIMARY_CLIENT_ID,
+            exchange=keys.exchange,
+            api_key=keys.api_key,
+            api_secret=keys.api_secret,
+            user_settings=user_settings,
+            balance_changed_callbacks=[cls._balance_notifyer_service.balance_update_event]
         )
+        for tenant in tenants:
+            cls._tenant_contexts[tenant.id] = cls._create_tenant_context(tenant)
+        contexts: list[ClientContext] = [cls._client_context, *cls._tenant_contexts.values()]
+
+        # Ждем точности монет, без них ордера клиента будут отклонены биржей
+        for exchange in set(c.exchange for c in contexts if c.exchange):
+            cls._wait_exchange_info(exchange)
 
         # Запускаем сервисы
-        cls._balance_updater_service.start()
-        cls._trader_polling_service.start()
+        if cls._trader_relay_service:
+            cls._trader_relay_service.start()
+        if cls._shard_supervisor:
+            cls._shard_supervisor.start()
+        for context in contexts:
+            context.start()
+            cls._trader_websocket_service.add_client(context.get_subscription())
         cls._trader_websocket_service.start()
 
+    @classmethod
+    def stop_services(cls) -> None:
+        """ Останавливает сервисы, которые держат порты и процессы: relay и шарды. """
+        if cls._trader_relay_service:
+            cls._trader_relay_service.stop()
+        if cls._shard_supervisor:
+            cls._shard_supervisor.stop()
+
     @classmethod
     def get_service_statuses(cls) -> UnifiedServiceStatus:
         """ Возвращает словарь со статусами всех сервисов. """
+        client_connector: Optional[AbstractExchangeConnector] = cls._client_context.get_client_connector()
+        shard_statuses: list[ShardStatus] = cls._shard_supervisor.get_statuses() if cls._shard_supervisor else []
         return UnifiedServiceStatus(
             trader_websocket_status=cls._trader_websocket_service.get_status(),
-            trader_polling_status=cls._trader_polling_service.get_status(),
+            trader_polling_status=cls._client_context.trader_polling_service.get_status(),
+            client_stream_status=cls._client_context.client_stream_service.get_status(),
             balance_notifyer_status=cls._balance_notifyer_service.get_status(),
-            balance_updater_status=cls._balance_updater_service.get_status(),
-            balance_warden_status=cls._balance_warden_service.get_status()
+            balance_updater_status=cls._client_context.balance_updater_service.get_status(),
+            balance_warden_status=cls._client_context.balance_warden_service.get_status(),
+            rate_limit_status=client_connector.get_rate_limit_status() if client_connector else None,
+            tenant_statuses=[
+                *[c.get_status() for c in list(cls._tenant_contexts.values())],
+                *[t for s in shard_statuses for t in s["tenant_statuses"]]
+            ],
+            trader_relay_status=cls._trader_relay_service.get_status() if cls._trader_relay_service else None,
+            shard_statuses=shard_statuses
         )
 
     @classmethod
     def on_user_settings_update(cls, u: UserSettings) -> None:
         logger.info(f"User settings update: {u}")
-        cls._balance_warden_service.on_user_settings_update(u)
-        cls._trader_polling_service.on_user_settings_update(u)
-        cls._trader_websocket_service.on_user_settings_update(u)
+        cls._client_context.on_user_settings_update(u)
 
     @classmethod
     def on_trader_settings_update(cls, u: TraderSettings) -> None:
         logger.info(f"Trader settings update: {u}")
+        cls._trader_settings = u
         cls._init_trader_connector(u)  # ITS IMPORTANT TO DO IT BEFORE ALL OTHER ACTIONS
-        cls._trader_polling_service.on_trader_settings_update(u)
+        for context in [cls._client_context, *list(cls._tenant_contexts.values())]:
+            context.on_trader_settings_update(u)
         cls._trader_websocket_service.on_trader_settings_update(u)
+        if cls._shard_supervisor:
+            cls._shard_supervisor.on_trader_settings_update(u)
 
     @classmethod
     def on_api_keys_update(cls, u: Keys) -> None:
         logger.info(f"Api keys update: {u}")
-        cls._init_client_connector(u)
+        cls._client_context.on_api_keys_update(u.exchange, u.api_key, u.api_secret)
 
     @classmethod
-    def _init_client_connector(cls, keys: Keys) -> None:
-        """ Функция обновляет коннектор. """
-        try:
-            if keys.is_fully_filled():
-                cls._client_connector = EXCHANGE_TO_CONNECTOR[keys.exchange](
-                    api_key=keys.api_key,
-                    api_secret=keys.api_secret,
-                )
-                logger.debug(f"Connector updated")
-            else:
-                cls._client_connector = None
-                logger.info(f"Keys model is not fully filled, can't init connector")
-        except Exception as e:
-            cls._client_connector = None
-            logger.error(f"Error while init connector: {e}")
+    def on_tenant_update(cls, u: Tenant) -> None:
+        """ Запускает нового клиента или обновляет настройки и ключи существующего. """
+        logger.info(f"Tenant update: {u}")
+        if cls._shard_supervisor:
+            return cls._shard_supervisor.on_tenant_update(u.id)
+
+        with cls._tenants_lock:
+            context: Optional[ClientContext] = cls._tenant_contexts.get(u.id)
+            if context is None:
+                context = cls._tenant_contexts[u.id] = cls._create_tenant_context(u)
+                context.start()
+                cls._trader_websocket_service.add_client(context.get_subscription())
+                return
+
+            context.on_tenant_update(u)
+
+    @classmethod
+    def on_tenant_delete(cls, tenant_id: int) -> None:
+        """ Отписывает клиента от вебсокета трейдера и останавливает его сервисы. """
+        logger.info(f"Tenant delete: {tenant_id}")
+        if cls._shard_supervisor:
+            return cls._shard_supervisor.on_tenant_delete(tenant_id)
+
+        with cls._tenants_lock:
+            context: Optional[ClientContext] = cls._tenant_contexts.pop(tenant_id, None)
+            if context:
+                cls._trader_websocket_service.remove_client(context.client_id)
+                context.stop()
+
+    @classmethod
+    def _create_tenant_context(cls, tenant: Tenant) -> ClientContext:
+        return ClientContext.from_tenant(
+            tenant=tenant,
+            trader_settings=cls._trader_settings,
+            trader_connector_factory=lambda: cls._trader_connector,
+            trader_book_factory=cls._trader_websocket_service.get_trader_book
+        )
+
+    @classmethod
+    def _create_client_context(
+            cls,
+            client_id: str,
+            name: str,
+            exchange: Optional[Exchange],
+            api_key: Optional[str],
+            api_secret: Optional[str],
+            user_settings: UserSettings,
+            balance_changed_callbacks: Optional[list[Callable[[float], None]]] = None
+    ) -> ClientContext:
+        return ClientContext(
+            client_id=client_id,
+            name=name,
+            exchange=exchange,
+            api_key=api_key,
+            api_secret=api_secret,
+            user_settings=user_settings,
+            trader_settings=cls._trader_settings,
+            trader_connector_factory=lambda: cls._trader_connector,
+            trader_book_factory=cls._trader_websocket_service.get_trader_book,
+            balance_changed_callbacks=balance_changed_callbacks
+        )
 
     @classmethod
     def _init_trader_connector(cls, trader_settings: TraderSettings) -> None:
@@ -136,6 +232,13 @@ class ServiceManager:
             cls._trader_connector = None
             logger.error(f"Error while init trader connector: {e}")
 
+    @classmethod
+    def _wait_exchange_info(cls, exchange: Optional[Exchange]) -> None:
+        """ Функция ждет, пока загрузятся точности монет биржи клиента. """
+        if exchange and not EXCHANGE_TO_EXCHANGE_INFO[exchange].wait_ready(timeout=config.EXCHANGE_INFO_WAIT_TIMEOUT):
+            logger.error(f"Exchange info for {exchange} is not loaded in {config.EXCHANGE_INFO_WAIT_TIMEOUT}s, "
+                         f"starting services without it")
+
     @classmethod
     def _connector_factory(cls, which: Literal["trader", "client"]) -> AbstractExchangeConnector:
         """
@@ -144,7 +247,7 @@ class ServiceManager:
         :return:
         """
         if which == "client":
-            return cls._client_connector
+            return cls._client_context.get_client_connector()
         elif which == "trader":
             return cls._trader_connector
         else:
@@ -0,0 +1,230 @@
+"""
+Module with worker process of supervisor mode, which runs its part (shard) of tenants.
+Worker does not connect to trader stream: main process decodes every trader event once
+and sends it to all shards through pipe, see app.manager.shards.
+"""
+__all__ = ["ShardMessage", "ShardRuntime", "run_shard_worker", ]
+
+import os
+import pickle
+import threading
+import time
+from multiprocessing.connection import Connection
+from typing import Any, Optional
+
+from .client_context import ClientContext
+from ..configuration import config, logger
+from ..database import Database, Tenant
+from ..metrics import copy_latency
+from ..schemas.models import TraderSettings
+from ..schemas.types import Order, Position, ShardStatus
+from ..services.connectors import (AbstractAccountBook, AbstractExchangeConnector, AbstractTraderWebsocket,
+                                  EXCHANGE_TO_CONNECTOR, EXCHANGE_TO_WEBSOCKET)
+from ..utils import patches  # apply patches  # noqa
+
+
+class ShardMessage:
+    """ Messages between main process and shard: one byte tag and pickled payload """
+
+    EVENT: bytes = b"E"  # (send time, decoded trader event)
+    SNAPSHOT: bytes = b"B"  # (orders, positions, balance) of trader book
+    TRADER_SETTINGS: bytes = b"T"  # TraderSettings as dict
+    TENANT_UPDATE: bytes = b"U"  # tenant id, tenant is read from database by shard
+    TENANT_DELETE: bytes = b"D"  # tenant id
+    STOP: bytes = b"Q"  # None
+    STATUS: bytes = b"S"  # ShardStatus, from shard to main process
+
+    @staticmethod
+    def encode(tag: bytes, payload: Any = None) -> bytes:
+        return tag + pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def decode(data: bytes) -> tuple[bytes, Any]:
+        return data[:1], pickle.loads(memoryview(data)[1:])
+
+
+class ShardRuntime:
+    """
+    Клиенты одного шарда и вебсокет трейдера без подключения к бирже, в который передаются события
+    из основного процесса. Книга трейдера заполняется снапшотами из основного процесса.
+    """
+
+    IPC_LATENCY_SMOOTHING: float = 0.1  # weight of new value in moving average
+
+    def __init__(self, shard_id: int, workers: int, trader_settings: TraderSettings) -> None:
+        self._shard_id: int = shard_id
+        self._workers: int = workers
+        self._trader_settings: TraderSettings = trader_settings
+        self._trader_connector: Optional[AbstractExchangeConnector] = None
+        self._init_trader_connector()
+
+        self._contexts: dict[int, ClientContext] = {}
+        self._websocket: AbstractTraderWebsocket = self._create_websocket()
+
+        self._events: int = 0  # for status
+        self._ipc_latency: Optional[float] = None  # for status
+        self._copy_latency_totals: tuple[int, float] = (0, 0.0)  # for status, count and sum on previous report
+
+    def load_tenants(self) -> None:
+        """ Запускает всех клиентов шарда из базы данных. """
+        for tenant in Database.tenants_repo.get_all():
+            if tenant.id % self._workers == self._shard_id:
+                self._add_tenant(tenant)
+        logger.info(f"Shard {self._shard_id} started with {len(self._contexts)} tenants")
+
+    def handle_event(self, sent_at: float, msg: dict) -> None:
+        """ Передает событие трейдера в вебсокет шарда, если трейдер включен, иначе только обновляет книгу. """
+        self._events += 1
+        latency: float = time.time() - sent_at
+        self._ipc_latency = latency if self._ipc_latency is None else \
+            self._ipc_latency + (latency - self._ipc_latency) * self.IPC_LATENCY_SMOOTHING
+
+        if self._trader_settings.status and self._trader_connector:
+            self._websocket.handle_websocket_message(None, msg)
+        else:
+            self._websocket.handle_state_message(None, msg)
+
+    def load_snapshot(self, orders: list[Order], positions: list[Position], balance: Optional[float]) -> None:
+        book: Optional[AbstractAccountBook] = self._websocket.get_trader_book()
+        if book:
+            book.load_snapshot(orders, positions, balance)
+
+    def on_trader_settings_update(self, u: TraderSettings) -> None:
+        if u == self._trader_settings:
+            return
+        logger.info(f"Trader settings update in shard {self._shard_id}: {u}")
+        self._trader_settings = u
+        self._init_trader_connector()
+        for context in self._contexts.values():
+            context.on_trader_settings_update(u)
+
+        # Trader account may be changed, so its book and positions are dropped like on websocket restart
+        websocket, self._websocket = self._websocket, self._create_websocket()
+        websocket.stop_websocket()
+
+    def on_tenant_update(self, tenant_id: int) -> None:
+        """ Перечитывает клиента из базы: запускает нового, обновляет существующего или останавливает удаленного. """
+        tenant: Optional[Tenant] = Database.tenants_repo.get(tenant_id)
+        if not tenant:
+            return self.on_tenant_delete(tenant_id)
+
+        context: Optional[ClientContext] = self._contexts.get(tenant_id)
+        if context:
+            context.on_tenant_update(tenant)
+        else:
+            self._add_tenant(tenant)
+
+    def on_tenant_delete(self, tenant_id: int) -> None:
+        context: Optional[ClientContext] = self._contexts.pop(tenant_id, None)
+        if context:
+            self._websocket.remove_client(context.client_id)
+            context.stop()
+
+    def stop(self) -> None:
+        for tenant_id in list(self._contexts):
+            self.on_tenant_delete(tenant_id)
+        self._websocket.stop_websocket()
+
+    def get_status(self) -> ShardStatus:
+        count, total = copy_latency.totals(stage="total")
+        previous_count, previous_total = self._copy_latency_totals
+        self._copy_latency_totals = (count, total)
+        return ShardStatus(
+            status=True,
+            last_update_time="",  # is set by main process on receive
+            shard_id=self._shard_id,
+            pid=os.getpid(),
+            tenants=len(self._contexts),
+            events=self._events,
+            dropped_events=0,  # is counted by main process
+            ipc_latency=round(self._ipc_latency, 6) if self._ipc_latency is not None else None,
+            copy_latency=round((total - previous_total) / (count - previous_count), 6)
+            if count > previous_count else None,
+            tenant_statuses=[c.get_status() for c in self._contexts.values()]
+        )
+
+    def _add_tenant(self, tenant: Tenant) -> None:
+        context: ClientContext = ClientContext.from_tenant(
+            tenant=tenant,
+            trader_settings=self._trader_settings,
+            trader_connector_factory=lambda: self._trader_connector,
+            trader_book_factory=self._get_trader_book,
+            shard=self._shard_id
+        )
+        self._contexts[tenant.id] = context
+        context.start()
+        self._websocket.add_client(context.get_subscription())
+
+    def _create_websocket(self) -> AbstractTraderWebsocket:
+        """ Websocket is not started, events are passed to its handlers by main process """
+        return EXCHANGE_TO_WEBSOCKET[self._trader_settings.exchange](
+            connector_factory=self._connector_factory,
+            user_settings=None,
+            trader_settings=self._trader_settings,
+            callback=lambda *args: None,
+            clients=[c.get_subscription() for c in self._contexts.values()],
+        )
+
+    def _get_trader_book(self) -> Optional[AbstractAccountBook]:
+        book: Optional[AbstractAccountBook] = self._websocket.get_trader_book()
+        if book and book.is_ready():
+            return book
+
+    def _connector_factory(self, which: str) -> Optional[AbstractExchangeConnector]:
+        return self._trader_connector if which == "trader" else None
+
+    def _init_trader_connector(self) -> None:
+        try:
+            self._trader_connector = EXCHANGE_TO_CONNECTOR[self._trader_settings.exchange](
+                api_key=self._trader_settings.api_key,
+                api_secret=self._trader_settings.api_secret,
+            ) if self._trader_settings.is_fully_filled() else None
+        except Exception as e:
+            self._trader_connector = None
+            logger.error(f"Error while init trader connector in shard {self._shard_id}: {e}")
+
+
+def _status_thread(runtime: ShardRuntime, conn: Connection) -> None:
+    """ Sends status of shard to main process, it also works as heartbeat """
+    while True:
+        try:
+            conn.send_bytes(ShardMessage.encode(ShardMessage.STATUS, runtime.get_status()))
+        except (BrokenPipeError, EOFError, OSError):
+            return
+        except Exception as e:
+            logger.error(f"Error while sending shard status: {e}")
+        time.sleep(config.SHARD_STATUS_INTERVAL)
+
+
+def run_shard_worker(shard_id: int, workers: int, conn: Connection, trader_settings: dict) -> None:
+    """ Точка входа процесса шарда, работает, пока основной процесс не закроет pipe или не пришлет STOP. """
+    logger.info(f"Shard {shard_id} worker started, pid={os.getpid()}")
+    runtime: ShardRuntime = ShardRuntime(shard_id, workers, TraderSettings(**trader_settings))
+    runtime.load_tenants()
+    threading.Thread(target=_status_thread, args=(runtime, conn), daemon=True).start()
+
+    while True:
+        try:
+            tag, payload = ShardMessage.decode(conn.recv_bytes())
+        except (EOFError, OSError):
+            logger.warning(f"Shard {shard_id} lost connection with main process")
+            break
+
+        try:
+            if tag == ShardMessage.EVENT:
+                runtime.handle_event(*payload)
+            elif tag == ShardMessage.SNAPSHOT:
+                runtime.load_snapshot(*payload)
+            elif tag == ShardMessage.TRADER_SETTINGS:
+                runtime.on_trader_settings_update(TraderSettings(**payload))
+            elif tag == ShardMessage.TENANT_UPDATE:
+                runtime.on_tenant_update(payload)
+            elif tag == ShardMessage.TENANT_DELETE:
+                runtime.on_tenant_delete(payload)
+            elif tag == ShardMessage.STOP:
+                break
+        except Exception as e:
+            logger.error(f"Error while handling shard message {tag}: {e}")
+
+    runtime.stop()
+    logger.info(f"Shard {shard_id} worker stopped")
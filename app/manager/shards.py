@@ -0,0 +1,208 @@
+"""
+Module with supervisor of shard processes. Tenants are split between processes by id, so copying to many tenants
+is not limited by one GIL. Trader stream is still decoded once in main process, every decoded event is pickled once
+and written to pipes of all shards.
+"""
+__all__ = ["ShardSupervisor", ]
+
+import multiprocessing
+import queue
+import threading
+import time
+from datetime import datetime
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import Any, Callable, Optional
+
+from .shard_worker import ShardMessage, run_shard_worker
+from ..configuration import config, logger
+from ..schemas.models import TraderSettings
+from ..schemas.types import ShardStatus
+from ..services.connectors import AbstractAccountBook
+
+
+class _Shard:
+    """ Process of one shard: messages are queued and written by own thread, so slow shard does not block others """
+
+    def __init__(self, shard_id: int, queue_size: int) -> None:
+        self.shard_id: int = shard_id
+        self.dropped: int = 0
+        self.status: Optional[ShardStatus] = None
+        self.status_time: float = 0.0
+
+        self._queue_size: int = queue_size
+        self._queue: Optional[queue.Queue[bytes]] = None
+        self._process: Optional[BaseProcess] = None
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._process.pid if self._process else None
+
+    def is_alive(self) -> bool:
+        return bool(self._process) and self._process.is_alive()
+
+    def start(self, workers: int, trader_settings: TraderSettings) -> None:
+        """ Spawns process of shard, spawn is used, because main process already runs threads """
+        context = multiprocessing.get_context("spawn")
+        conn, child_conn = context.Pipe()
+        self._process = context.Process(
+            target=run_shard_worker,
+            args=(self.shard_id, workers, child_conn, trader_settings.model_dump()),
+            name=f"shard-{self.shard_id}",
+            daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+
+        # Threads of previous process exit with its pipe and queue
+        self._queue = queue.Queue(maxsize=self._queue_size)
+        threading.Thread(target=self._writer_thread, args=(conn, self._queue),
+                         name=f"shard-{self.shard_id}-writer", daemon=True).start()
+        threading.Thread(target=self._reader_thread, args=(conn,),
+                         name=f"shard-{self.shard_id}-reader", daemon=True).start()
+        logger.info(f"Shard {self.shard_id} process started, pid={self._process.pid}")
+
+    def stop(self) -> None:
+        if not self._process:
+            return
+        self.put(ShardMessage.encode(ShardMessage.STOP), block=True)
+        self._process.join(timeout=10)
+        if self._process.is_alive():
+            self._process.kill()
+
+    def put(self, data: bytes, block: bool = False) -> None:
+        """ Queues message, trader event is dropped if shard is too slow, control messages wait """
+        try:
+            self._queue.put(data, block=block, timeout=10 if block else None)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f"Shard {self.shard_id} is too slow, dropped {self.dropped} messages")
+
+    def _writer_thread(self, conn: Connection, q: queue.Queue[bytes]) -> None:
+        try:
+            while True:
+                conn.send_bytes(q.get())
+        except (BrokenPipeError, EOFError, OSError) as e:
+            logger.warning(f"Shard {self.shard_id} pipe is closed: {e}")
+
+    def _reader_thread(self, conn: Connection) -> None:
+        try:
+            while True:
+                tag, payload = ShardMessage.decode(conn.recv_bytes())
+                if tag == ShardMessage.STATUS:
+                    self.status, self.status_time = payload, time.time()
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+
+class ShardSupervisor:
+    """
+    Запускает процессы-шарды с клиентами из таблицы tenants, раздает им события и снапшоты трейдера,
+    перезапускает упавшие процессы и собирает их статусы.
+    Клиент попадает в шард tenant.id % workers, шард сам читает клиента из базы данных.
+    """
+
+    def __init__(
+            self,
+            workers: int,
+            trader_settings: TraderSettings,
+            trader_book_factory: Callable[[], Optional[AbstractAccountBook]],
+            snapshot_interval: int | float = config.SHARD_SNAPSHOT_INTERVAL,
+            queue_size: int = config.SHARD_QUEUE_SIZE
+    ) -> None:
+        """
+        :param trader_book_factory: Возвращает заполненную книгу трейдера, из нее берутся снапшоты для шардов.
+        """
+        self._workers: int = workers
+        self._trader_settings: TraderSettings = trader_settings
+        self._trader_book_factory: Callable[[], Optional[AbstractAccountBook]] = trader_book_factory
+        self._snapshot_interval: int | float = snapshot_interval
+        self._shards: list[_Shard] = [_Shard(i, queue_size) for i in range(workers)]
+        self._stopped: threading.Event = threading.Event()
+        # Snapshot after settings update is not sent yet, monitor sends it as soon as trader book is ready
+        self._snapshot_requested: bool = False
+
+    def start(self) -> None:
+        """ Запускает процессы шардов и поток, который следит за ними. """
+        for shard in self._shards:
+            shard.start(self._workers, self._trader_settings)
+        threading.Thread(target=self._monitor_thread, name="shard-monitor", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        for shard in self._shards:
+            shard.stop()
+
+    def publish(self, msg: dict) -> None:
+        """ Раздает событие трейдера всем шардам, передается в вебсокет трейдера как слушатель. """
+        data: bytes = ShardMessage.encode(ShardMessage.EVENT, (time.time(), msg))
+        for shard in self._shards:
+            shard.put(data)
+
+    def on_trader_settings_update(self, u: TraderSettings) -> None:
+        self._trader_settings = u
+        self._broadcast(ShardMessage.TRADER_SETTINGS, u.model_dump())
+        # Shards recreate trader book from settings, without snapshot it stays empty until next interval
+        self._snapshot_requested = not self._send_snapshot(self._shards)
+
+    def on_tenant_update(self, tenant_id: int) -> None:
+        self._shards[tenant_id % self._workers].put(ShardMessage.encode(ShardMessage.TENANT_UPDATE, tenant_id), True)
+
+    def on_tenant_delete(self, tenant_id: int) -> None:
+        self._shards[tenant_id % self._workers].put(ShardMessage.encode(ShardMessage.TENANT_DELETE, tenant_id), True)
+
+    def get_statuses(self) -> list[ShardStatus]:
+        """ Шард работает, если его процесс жив и недавно прислал статус. """
+        statuses: list[ShardStatus] = []
+        for shard in self._shards:
+            status: ShardStatus = shard.status or ShardStatus(
+                status=False, last_update_time="", shard_id=shard.shard_id, pid=None, tenants=0, events=0,
+                dropped_events=0, ipc_latency=None, copy_latency=None, tenant_statuses=[])
+            statuses.append(ShardStatus(**{
+                **status,
+                "status": shard.is_alive() and time.time() - shard.status_time < config.SHARD_STATUS_INTERVAL * 3,
+                "last_update_time": datetime.fromtimestamp(shard.status_time).isoformat(timespec='seconds'),
+                "pid": shard.pid,
+                "dropped_events": shard.dropped
+            }))
+        return statuses
+
+    def _broadcast(self, tag: bytes, payload: Any = None) -> None:
+        data: bytes = ShardMessage.encode(tag, payload)
+        for shard in self._shards:
+            shard.put(data, block=True)
+
+    def _send_snapshot(self, shards: list[_Shard]) -> bool:
+        """ Shards fill trader book only from snapshots, events keep it actual between them """
+        book: Optional[AbstractAccountBook] = self._trader_book_factory()
+        if not book:
+            return False
+        data: bytes = ShardMessage.encode(
+            ShardMessage.SNAPSHOT, (book.get_open_orders(), book.get_open_positions(), book.get_balance()))
+        for shard in shards:
+            shard.put(data, block=True)
+        return True
+
+    def _monitor_thread(self) -> None:
+        """ Restarts dead shards and sends trader book snapshots, first one as soon as trader book is ready """
+        snapshot_at: Optional[float] = None
+        while not self._stopped.wait(timeout=1):
+            try:
+                restarted: list[_Shard] = []
+                for shard in self._shards:
+                    if not shard.is_alive():
+                        logger.error(f"Shard {shard.shard_id} process is dead, restarting")
+                        shard.start(self._workers, self._trader_settings)
+                        restarted.append(shard)
+
+                if self._snapshot_requested or snapshot_at is None \
+                        or time.monotonic() - snapshot_at >= self._snapshot_interval:
+                    if self._send_snapshot(self._shards):
+                        snapshot_at, self._snapshot_requested = time.monotonic(), False
+                elif restarted:
+                    self._send_snapshot(restarted)
+            except Exception as e:
+                logger.error(f"Error in shard monitor thread: {e}")
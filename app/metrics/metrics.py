@@ -0,0 +1,77 @@
+"""
+Module with all metrics of application
+"""
+__all__ = ["copy_latency", "rest_latency", "executor_queue_depth", "polling_cycle_duration", "time_to_flat",
+           "deduplicated_actions", "relay_gaps", "relay_subscribers",
+           "master_server_requests", "websocket_gaps", "catchup_duration", ]
+
+from .registry import Counter, Gauge, Histogram, registry
+
+# Trader websocket event -> client order ack, stages:
+# exchange - from trader transaction time (T) to frame receive,
+# queue - from receive to handler start,
+# rest - from handler start to client REST ack,
+# total - from trader transaction time (T) to client REST ack.
+# Exchange and total stages depend on local clock offset.
+copy_latency: Histogram = registry.register(Histogram(
+    "copytrader_copy_latency_seconds",
+    "Latency of copying trader websocket event to client account by stage",
+    labels=("stage", "action"),
+))
+
+rest_latency: Histogram = registry.register(Histogram(
+    "copytrader_rest_latency_seconds",
+    "Latency of exchange REST requests",
+    labels=("method",),
+))
+
+executor_queue_depth: Gauge = registry.register(Gauge(
+    "copytrader_executor_queue_depth",
+    "Amount of tasks waiting in executor queue",
+    labels=("executor",),
+))
+
+polling_cycle_duration: Histogram = registry.register(Histogram(
+    "copytrader_polling_cycle_duration_seconds",
+    "Duration of trader polling cycle",
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+))
+
+time_to_flat: Gauge = registry.register(Gauge(
+    "copytrader_stop_trade_time_to_flat_seconds",
+    "Time to close all client positions and orders on last stop trading event",
+))
+
+deduplicated_actions: Counter = registry.register(Counter(
+    "copytrader_deduplicated_actions_total",
+    "Client actions skipped, because the same action was in flight or done recently by other path",
+    labels=("action", "path"),
+))
+
+relay_gaps: Counter = registry.register(Counter(
+    "copytrader_relay_gaps_total",
+    "Relay feed events missed by client node, detected by sequence number",
+))
+
+relay_subscribers: Gauge = registry.register(Gauge(
+    "copytrader_relay_subscribers",
+    "Amount of client nodes connected to relay node",
+))
+
+master_server_requests: Counter = registry.register(Counter(
+    "copytrader_master_server_requests_total",
+    "Requests to master-server by result: ok, error, rejected by open circuit breaker or dropped from full queue",
+    labels=("endpoint", "result"),
+))
+
+websocket_gaps: Counter = registry.register(Counter(
+    "copytrader_websocket_gaps_total",
+    "Trader websocket stream losses by reason: closed, dead reading thread or expired listen key",
+    labels=("reason",),
+))
+
+catchup_duration: Histogram = registry.register(Histogram(
+    "copytrader_websocket_catchup_duration_seconds",
+    "Duration of trader websocket catch-up from order and trade history after reconnect",
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+))
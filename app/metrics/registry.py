@@ -0,0 +1,162 @@
+"""
+Module with minimal prometheus-style metrics: counters, gauges and histograms rendered in text exposition format.
+Every metric keeps its values in dict by labels values under its own lock, so observing costs one dict lookup.
+"""
+__all__ = ["Counter", "Gauge", "Histogram", "MetricsRegistry", "registry", ]
+
+import threading
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+# Default buckets in seconds, from 1ms to 10s
+DEFAULT_BUCKETS: tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs: list[str] = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type: str = ""
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()) -> None:
+        self.name: str = name
+        self.documentation: str = documentation
+        self.label_names: tuple[str, ...] = tuple(labels)
+        self._lock: threading.Lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple([labels[name] for name in self.label_names]) if labels else ()
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"] + self._samples()
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type: str = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()) -> None:
+        super().__init__(name, documentation, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key: tuple[str, ...] = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values: list[tuple[tuple[str, ...], float]] = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, k)} {v}" for k, v in values]
+
+
+class Gauge(_Metric):
+    type: str = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()) -> None:
+        super().__init__(name, documentation, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._functions: dict[tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key: tuple[str, ...] = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function: Callable[[], float], **labels: str) -> None:
+        """ Value is taken from function only when metrics are rendered """
+        key: tuple[str, ...] = self._key(labels)
+        with self._lock:
+            self._functions[key] = function
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values: dict[tuple[str, ...], float] = dict(self._values)
+            functions: list[tuple[tuple[str, ...], Callable[[], float]]] = list(self._functions.items())
+        for key, function in functions:
+            try:
+                values[key] = function()
+            except Exception:  # noqa
+                continue
+        return [f"{self.name}{_format_labels(self.label_names, k)} {v}" for k, v in values.items()]
+
+
+class Histogram(_Metric):
+    type: str = "histogram"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labels: Iterable[str] = (),
+            buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self._buckets: tuple[float, ...] = tuple(sorted(buckets))
+        # labels values -> [counts per bucket (not cumulative) + inf bucket, sum]
+        self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key: tuple[str, ...] = self._key(labels)
+        index: int = bisect_left(self._buckets, value)
+        with self._lock:
+            state: tuple[list[int], list[float]] | None = self._values.get(key)
+            if state is None:
+                state = self._values[key] = ([0] * (len(self._buckets) + 1), [0.0])
+            state[0][index] += 1
+            state[1][0] += value
+
+    def totals(self, **labels: str) -> tuple[int, float]:
+        """ Returns count and sum of observations of all series, which have passed labels values """
+        indexes: list[tuple[int, str]] = [(self.label_names.index(k), v) for k, v in labels.items()]
+        count, total = 0, 0.0
+        with self._lock:
+            for key, (counts, value) in self._values.items():
+                if all(key[i] == v for i, v in indexes):
+                    count += sum(counts)
+                    total += value[0]
+        return count, total
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values: list[tuple[tuple[str, ...], list[int], float]] = [
+                (k, list(counts), total[0]) for k, (counts, total) in self._values.items()]
+
+        samples: list[str] = []
+        for key, counts, total in values:
+            cumulative: int = 0
+            for bound, count in zip(self._buckets + (float("inf"),), counts):
+                cumulative += count
+                le: str = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                samples.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            samples.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total}")
+            samples.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return samples
+
+
+class MetricsRegistry:
+    """ Keeps all metrics of process and renders them for /metrics endpoint """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in list(self._metrics.values()):
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
@@ -11,3 +11,23 @@ class BalanceStatus(Enum):
     CAN_TRADE: str = "CAN_TRADE"
     CANT_TRADE: str = "CANT_TRADE"
     NOT_DEFINED: str = "NOT_DEFINED"
+
+
+class RequestPriority(Enum):
+    CRITICAL: str = "CRITICAL"  # kill switch: closes and cancels of balance warden
+    HIGH: str = "HIGH"
+    LOW: str = "LOW"
+
+
+class ReconciliationActionKind(Enum):
+    CLOSE_POSITION: str = "CLOSE_POSITION"
+    CANCEL_ORDER: str = "CANCEL_ORDER"
+    COPY_ORDER: str = "COPY_ORDER"
+    SKIP: str = "SKIP"
+
+
+class SkipReason(Enum):
+    # Trader is in position, client is not: order would open position, which client must not have
+    CLIENT_HAS_NO_POSITION: str = "CLIENT_HAS_NO_POSITION"
+    # Client is in position, trader is not: client position is closed in the same cycle
+    TRADER_HAS_NO_POSITION: str = "TRADER_HAS_NO_POSITION"
@@ -6,12 +6,77 @@ class ServiceStatus(TypedDict):
     last_update_time: str
 
 
+class SuppressedActionStatus(TypedDict):
+    action: str
+    symbol: str
+    target: str
+    reason: str
+    message: str
+    failures: int
+    retry_at: str
+
+
+class PollingServiceStatus(ServiceStatus):
+    last_cycle_duration: float
+    suppressed_actions: list[SuppressedActionStatus]
+
+
+class ClientStreamServiceStatus(ServiceStatus):
+    drift_count: int
+
+
+class BalanceWardenServiceStatus(ServiceStatus):
+    time_to_flat: Optional[float]
+
+
+class RateLimitStatus(TypedDict):
+    used_weight: int
+    weight_limit: int
+    used_orders_10s: int
+    orders_10s_limit: int
+    used_orders_1m: int
+    orders_1m_limit: int
+    banned_until: Optional[str]
+
+
+class RelayServiceStatus(ServiceStatus):
+    subscribers: int
+    seq: int
+
+
+class TenantServiceStatus(TypedDict):
+    client_id: str
+    name: str
+    shard: Optional[int]
+    trader_polling_status: PollingServiceStatus
+    client_stream_status: ClientStreamServiceStatus
+    balance_updater_status: ServiceStatus
+    balance_warden_status: BalanceWardenServiceStatus
+    rate_limit_status: Optional[RateLimitStatus]
+
+
+class ShardStatus(ServiceStatus):
+    shard_id: int
+    pid: Optional[int]
+    tenants: int
+    events: int
+    dropped_events: int
+    ipc_latency: Optional[float]
+    copy_latency: Optional[float]
+    tenant_statuses: list[TenantServiceStatus]
+
+
 class UnifiedServiceStatus(TypedDict):
     trader_websocket_status: ServiceStatus
-    trader_polling_status: ServiceStatus
+    trader_polling_status: PollingServiceStatus
+    client_stream_status: ClientStreamServiceStatus
     balance_notifyer_status: ServiceStatus
     balance_updater_status: ServiceStatus
-    balance_warden_status: ServiceStatus
+    balance_warden_status: BalanceWardenServiceStatus
+    rate_limit_status: Optional[RateLimitStatus]
+    tenant_statuses: list[TenantServiceStatus]
+    trader_relay_status: Optional[RelayServiceStatus]
+    shard_statuses: list[ShardStatus]
 
 
 # TypeVar's
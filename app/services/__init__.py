@@ -1,6 +1,8 @@
 from .balance_notifyer import BalanceNotifyerService
 from .balance_updater import BalanceUpdaterService
 from .balance_warden import BalanceWardenService
-from .connectors import AbstractExchangeConnector, EXCHANGE_TO_CONNECTOR
+from .client_stream import ClientStreamService
+from .connectors import AbstractAccountBook, AbstractExchangeConnector, EXCHANGE_TO_CONNECTOR, EXCHANGE_TO_EXCHANGE_INFO
 from .trader_polling import TraderPollingService
+from .trader_relay import TraderRelayService
 from .trader_websocket import TraderWebsocketService
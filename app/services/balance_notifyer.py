@@ -1,13 +1,11 @@
 import time
 from datetime import datetime
 
-import requests
-
 from .abstract import AbstractService
 from ..configuration import config, logger
-from ..schemas.exceptions import MasterServerConnectionError
 from ..schemas.models import UserBalanceUpdate
 from ..schemas.types import ServiceStatus
+from ..utils.master_server import master_server
 
 
 class BalanceNotifyerService(AbstractService):
@@ -35,29 +33,22 @@ class BalanceNotifyerService(AbstractService):
 
     def balance_update_event(self, balance: float) -> None:
         """
-        Функция отлавливает текущий баланс и отправляет его на мастер-сервер.
+        Функция ставит текущий баланс в очередь отправки на мастер-сервер и сразу возвращается.
+        Баланс отправляется не чаще, чем раз в interval секунд, ждущий баланс заменяется новым.
         :param balance:
         :return:
         """
         try:
-            if self._last_notify_time + self._interval < time.time():
-                self._last_notify_time: float = time.time()
-                self._send_notify(balance=balance)
+            master_server.submit(
+                endpoint="balance",
+                data=UserBalanceUpdate(balance=balance).model_dump_json(),
+                key="balance",
+                min_interval=self._interval,
+                on_success=lambda: self._on_notify_sent(balance)
+            )
         except Exception as e:
             logger.error(f"Error while notify master-server about balance: {e}")
 
-    def _send_notify(self, balance: float, endpoint: str = "balance") -> None:
-        """
-        Function sends request to master server to update current user balance.
-        :param balance: Current user balance
-        :param endpoint: Endpoint to update balance
-        :return: None
-        """
-        response: requests.Response = requests.post(
-            url=f"http://{config.MASTER_SERVER_HOST}:{config.MASTER_SERVER_PORT}/{endpoint}",
-            data=UserBalanceUpdate(balance=balance).model_dump_json())
-
-        if response.status_code != 200:
-            raise MasterServerConnectionError(status_code=response.status_code, response_text=response.text)
-        else:
-            logger.debug(f"Balance update was sent to master-server: {response.status_code}. Balance={balance}")
+    def _on_notify_sent(self, balance: float) -> None:
+        self._last_notify_time: float = time.time()
+        logger.debug(f"Balance update was sent to master-server. Balance={balance}")
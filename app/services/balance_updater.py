@@ -1,10 +1,10 @@
 import time
 from datetime import datetime
-from threading import Thread
+from threading import Event, Thread
 from typing import Callable, Optional, Literal
 
 from .abstract import AbstractService
-from .connectors import AbstractExchangeConnector
+from .connectors import AbstractAccountBook, AbstractExchangeConnector
 from ..configuration import config, logger
 from ..schemas.types import ServiceStatus
 
@@ -15,11 +15,18 @@ class BalanceUpdaterService(AbstractService, Thread):
             self,
             connector_factory: Callable[[Literal["trader", "client"]], Optional[AbstractExchangeConnector]],
             balance_changed_callbacks: list[Callable[[float], None]],
-            interval: int | float = config.BALANCE_UPDATE_INTERVAL
+            client_book_factory: Callable[[], Optional[AbstractAccountBook]] = lambda: None,
+            mode: Literal["polling", "events"] = config.BALANCE_UPDATE_MODE,
+            interval: int | float = config.BALANCE_UPDATE_INTERVAL,
+            safety_interval: int | float = config.BALANCE_SAFETY_POLL_INTERVAL
     ) -> None:
         """
         :param connector_factory: Фабрика коннектора с биржей.
         :param balance_changed_callbacks: Куда передавать баланс при обновлении.
+        :param client_book_factory: Возвращает заполненную книгу клиента, баланс берется из нее вместо REST.
+        :param mode: polling - баланс запрашивается каждые interval секунд,
+            events - баланс приходит из вебсокета клиента через on_balance_event,
+            а REST опрашивается раз в safety_interval секунд на случай пропуска событий.
         """
         AbstractService.__init__(self)
         Thread.__init__(self, daemon=True)
@@ -27,10 +34,19 @@ class BalanceUpdaterService(AbstractService, Thread):
         self._connector_factory: Callable[[Literal["trader", "client"]], Optional[AbstractExchangeConnector]] \
             = connector_factory
         self._balance_changed_callbacks: list[callable] = balance_changed_callbacks
+        self._client_book_factory: Callable[[], Optional[AbstractAccountBook]] = client_book_factory
 
-        self._interval: int | float = interval
+        self._mode: Literal["polling", "events"] = mode
+        self._interval: int | float = interval if mode == "polling" else safety_interval
         self._last_update_time: int | float = 0.00  # for status
 
+        # Баланс из последнего события вебсокета и флаг, который будит поток сервиса
+        self._event_balance: Optional[float] = None
+        self._balance_event: Event = Event()
+        # Первый баланс запрашивается через REST сразу, а не после ожидания события
+        self._refresh_requested: bool = True
+        self._stopped: Event = Event()
+
     def get_status(self) -> ServiceStatus:
         return ServiceStatus(
             status=self._last_update_time + self._interval * 3 > time.time(),
@@ -39,26 +55,61 @@ class BalanceUpdaterService(AbstractService, Thread):
 
     get_status.__doc__ = AbstractService.get_status.__doc__
 
+    def on_balance_event(self, balance: float) -> None:
+        """ Принимает баланс из вебсокета клиента и будит поток сервиса. """
+        self._event_balance = balance
+        self._balance_event.set()
+
+    def refresh(self) -> None:
+        """ Просит поток сервиса сразу запросить баланс через REST, например после смены настроек клиента. """
+        self._refresh_requested = True
+        self._balance_event.set()
+
+    def _wait_balance_event(self) -> bool:
+        """ Ждет событие баланса не дольше интервала страховочного опроса. Возвращает True, если оно пришло. """
+        received: bool = self._balance_event.wait(timeout=self._interval)
+        self._balance_event.clear()
+        return received
+
+    def _get_balance(self, connector: AbstractExchangeConnector) -> float:
+        """ Берет баланс из книги клиента, если она заполнена, иначе через REST. """
+        if self._mode == "polling":
+            book: Optional[AbstractAccountBook] = self._client_book_factory()
+            if book and book.get_balance() is not None:
+                return book.get_balance()
+        return connector.get_current_balance()
+
+    def _send_balance(self, balance: float) -> None:
+        """ Передает баланс во все коллбэки. """
+        for callback in self._balance_changed_callbacks:
+            try:
+                self._last_update_time = time.time()
+                callback(balance)
+            except Exception as e:
+                logger.error(f"Error while called callback({callback.__name__}): {e}")
+
     def run(self) -> None:
         """ Точка запуска сервиса. """
         debug_log_sent: bool = False
-        while True:
+        while not self._stopped.is_set():
             try:
+                if self._mode == "events" and not self._refresh_requested:
+                    if self._wait_balance_event() and not self._stopped.is_set() and not self._refresh_requested:
+                        self._send_balance(self._event_balance)
+                        continue
+                self._refresh_requested = False
+
                 connector: AbstractExchangeConnector | None = self._connector_factory("client")
                 if connector:
                     debug_log_sent: bool = False
                     try:
-                        balance: float = connector.get_current_balance()
+                        balance: float = self._get_balance(connector)
                     except Exception as e:
                         logger.error(f"Error while gettings balance: {e}")
-                        time.sleep(self._interval * 10)
+                        self._stopped.wait(self._interval * 10 if self._mode == "polling" else self._interval)
+                        self._refresh_requested = self._mode == "events"  # retry REST instead of waiting events
                     else:
-                        for callback in self._balance_changed_callbacks:
-                            try:
-                                self._last_update_time = time.time()
-                                callback(balance)
-                            except Exception as e:
-                                logger.error(f"Error while called callback({callback.__name__}): {e}")
+                        self._send_balance(balance)
                 else:
                     if not debug_log_sent:
                         logger.debug("Can't send balance, becouse connector are not inited")
@@ -66,4 +117,10 @@ class BalanceUpdaterService(AbstractService, Thread):
             except Exception as e:
                 logger.error(f"Error while update balance: {e}")
             finally:
-                time.sleep(self._interval)
+                if self._mode == "polling":
+                    self._stopped.wait(self._interval)
+
+    def stop(self) -> None:
+        """ Останавливает поток сервиса. """
+        self._stopped.set()
+        self._balance_event.set()
@@ -1,13 +1,15 @@
 import time
+from concurrent.futures import Future, wait
 from datetime import datetime
 from typing import Callable, Literal, Optional
 
 from .abstract import AbstractService
 from .connectors import AbstractExchangeConnector
-from ..configuration import logger
-from ..schemas.enums import BalanceStatus
+from ..configuration import config, logger
+from ..metrics import time_to_flat
+from ..schemas.enums import BalanceStatus, RequestPriority
 from ..schemas.models import UserSettings
-from ..schemas.types import Order, Position, ServiceStatus
+from ..schemas.types import BalanceWardenServiceStatus, Order, Position
 
 
 class BalanceWardenService(AbstractService):
@@ -19,10 +21,12 @@ class BalanceWardenService(AbstractService):
             self,
             connector_factory: Callable[[Literal["trader", "client"]], Optional[AbstractExchangeConnector]],
             balance_threshold: float,
-            balance_status_callbacks: list[Callable[[BalanceStatus], None]]
+            balance_status_callbacks: list[Callable[[BalanceStatus], None]],
+            stop_trade_deadline: int | float = config.STOP_TRADE_DEADLINE
     ) -> None:
         """
         :param balance_threshold: Настройки пользователя
+        :param stop_trade_deadline: За сколько секунд нужно закрыть все позиции и ордера при остановке торговли.
         """
         AbstractService.__init__(self)
 
@@ -34,12 +38,16 @@ class BalanceWardenService(AbstractService):
         # Используется чтобы не вызывать функции много раз попусту
         self._balance_status: BalanceStatus = BalanceStatus.NOT_DEFINED
 
+        self._stop_trade_deadline: int | float = stop_trade_deadline
+
         self._last_update_time: int | float = 0.00  # for status
+        self._time_to_flat: Optional[float] = None  # for status, None if account was not flattened yet or failed
 
-    def get_status(self) -> ServiceStatus:
-        return ServiceStatus(
+    def get_status(self) -> BalanceWardenServiceStatus:
+        return BalanceWardenServiceStatus(
             status=self._balance_status == BalanceStatus.CAN_TRADE and self._last_update_time + 60 > time.time(),
-            last_update_time=datetime.fromtimestamp(self._last_update_time).isoformat(timespec='seconds')
+            last_update_time=datetime.fromtimestamp(self._last_update_time).isoformat(timespec='seconds'),
+            time_to_flat=self._time_to_flat
         )
 
     get_status.__doc__ = AbstractService.get_status.__doc__
@@ -69,41 +77,82 @@ class BalanceWardenService(AbstractService):
             logger.error(f"Error while change services balance status: {e}")
 
     def _stop_trade_event(self) -> None:
-        # Close all orders and positions
+        """
+        Закрывает все позиции и отменяет все ордера клиента одновременно.
+        Если после попытки что-то осталось открытым, попытка повторяется до истечения дедлайна.
+        """
         logger.warning("Stop trading event called!")
         connector: AbstractExchangeConnector | None = self._connector_factory("client")
-        if connector:
-            self._close_all_open_positions(connector)
-            self._cancel_all_open_orders(connector)
-        else:
+        if not connector:
             logger.critical("Can not get connector to call stop trading event.")
-
-    def _cancel_all_open_orders(self, connector: AbstractExchangeConnector) -> None:
-        """ Cancel all open orders in account """
-        try:
-            orders: list[Order] = connector.get_all_open_orders()
-            symbols: set[str] = set([o["symbol"] for o in orders])
-            for symbol in symbols:
-                try:
-                    result: dict = connector.cancel_all_open_orders(symbol=symbol)
-                    logger.info(f"Cancel all open orders on {symbol}: {result}")
-                except Exception as e:
-                    logger.error(f"Error while canceling all open orders on {symbol}: {e}")
-        except Exception as e:
-            logger.error(f"Error while canceling all open orders: {e}")
-
-    def _close_all_open_positions(self, connector: AbstractExchangeConnector) -> None:
-        """ Cancel all open positions in account """
-        try:
-            positions: list[Position] = connector.get_all_open_positions()
-            for position in positions:
-                try:
-                    result: dict = connector.close_position(position=position)
-                    logger.info(f"Closing position {position}: {result}")
-                except Exception as e:
-                    logger.error(f"Error while closing position {position}: {e}")
-        except Exception as e:
-            logger.error(f"Error while canceling all open positions: {e}")
+            return
+
+        started_at: float = time.monotonic()
+        deadline: float = started_at + self._stop_trade_deadline
+        self._time_to_flat = None
+
+        attempt: int = 0
+        while time.monotonic() < deadline:
+            attempt += 1
+            try:
+                positions, orders = self._get_open_positions_and_orders(connector, deadline)
+            except Exception as e:
+                logger.error(f"Error while getting open positions and orders (attempt {attempt}): {e}")
+            else:
+                if not positions and not orders:
+                    self._time_to_flat = round(time.monotonic() - started_at, 3)
+                    time_to_flat.set(self._time_to_flat)
+                    logger.success(f"Client account is flat after {self._time_to_flat}s ({attempt} attempts)")
+                    return
+
+                logger.info(f"Stop trading attempt {attempt}: {len(positions)} positions, {len(orders)} orders")
+                self._close_all(connector, positions, orders, deadline)
+
+            time.sleep(min(config.STOP_TRADE_RETRY_DELAY, max(deadline - time.monotonic(), 0)))
+
+        logger.critical(f"Client account is not flat after stop trading deadline({self._stop_trade_deadline}s)!")
+
+    @staticmethod
+    def _get_open_positions_and_orders(
+            connector: AbstractExchangeConnector,
+            deadline: float
+    ) -> tuple[list[Position], list[Order]]:
+        """ Requests open positions and orders concurrently, kill switch requests go first in rate limiter """
+        positions_future: Future = connector.submit("get_all_open_positions", priority=RequestPriority.CRITICAL)
+        orders_future: Future = connector.submit("get_all_open_orders", priority=RequestPriority.CRITICAL)
+        timeout: float = max(deadline - time.monotonic(), 0)
+        return positions_future.result(timeout=timeout), orders_future.result(timeout=timeout)
+
+    @staticmethod
+    def _close_all(
+            connector: AbstractExchangeConnector,
+            positions: list[Position],
+            orders: list[Order],
+            deadline: float
+    ) -> None:
+        """ Closes positions and cancels orders on every symbol concurrently, waits results until deadline """
+        futures: dict[Future, str] = {}
+        for position in positions:
+            try:
+                futures[connector.submit("close_position", position=position, priority=RequestPriority.CRITICAL)] = \
+                    f"Closing position {position}"
+            except Exception as e:
+                logger.error(f"Error while closing position {position}: {e}")
+        for symbol in set([o["symbol"] for o in orders]):
+            try:
+                futures[connector.submit("cancel_all_open_orders", symbol=symbol, priority=RequestPriority.CRITICAL)] \
+                    = f"Cancel all open orders on {symbol}"
+            except Exception as e:
+                logger.error(f"Error while canceling all open orders on {symbol}: {e}")
+
+        done, not_done = wait(futures, timeout=max(deadline - time.monotonic(), 0))
+        for future in done:
+            try:
+                logger.info(f"{futures[future]}: {future.result()}")
+            except Exception as e:
+                logger.error(f"{futures[future]} error: {e}")
+        for future in not_done:
+            logger.error(f"{futures[future]} is not finished before stop trading deadline")
 
     def on_user_settings_update(self, user_settings: UserSettings) -> None:
         """ Функция обновляет порог баланса. """
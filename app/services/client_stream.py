@@ -0,0 +1,146 @@
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Literal, Optional
+
+from .abstract import AbstractService
+from .connectors import AbstractAccountBook, AbstractClientStream, AbstractExchangeConnector, EXCHANGE_TO_CLIENT_STREAM
+from ..configuration import config, logger
+from ..schemas.enums import Exchange
+from ..schemas.types import ClientStreamServiceStatus, Position
+
+
+class ClientStreamService(AbstractService):
+    """
+    Сервис, который держит вебсокет аккаунта клиента и локальную копию его ордеров, позиций и баланса.
+    Периодически сверяет локальную копию с REST, чтобы найти расхождения.
+    """
+
+    def __init__(
+            self,
+            connector_factory: Callable[[Literal["trader", "client"]], Optional[AbstractExchangeConnector]],
+            exchange: Optional[Exchange],
+            checksum_interval: int | float = config.CLIENT_STATE_CHECKSUM_INTERVAL
+    ) -> None:
+        """
+        :param connector_factory: Фабрика коннектора с биржей.
+        :param exchange: Биржа, к которой подключен клиент.
+        :param checksum_interval: Как часто сверять локальную копию с REST.
+        """
+        super().__init__()
+
+        self._connector_factory: Callable[[Literal["trader", "client"]], Optional[AbstractExchangeConnector]] = \
+            connector_factory
+        self._exchange: Optional[Exchange] = exchange
+
+        self._balance_listeners: list[Callable[[float], None]] = []
+
+        self._stream: Optional[AbstractClientStream] = None
+        self._stream_lock: threading.Lock = threading.Lock()
+
+        self._checksum_interval: int | float = checksum_interval
+        self._last_checksum_time: int | float = 0.0  # for status
+        self._drift_count: int = 0  # for status
+        self._stopped: threading.Event = threading.Event()
+
+        # Launch checksum thread one time
+        threading.Thread(target=self._checksum_thread, daemon=True).start()
+
+    def get_status(self) -> ClientStreamServiceStatus:
+        return ClientStreamServiceStatus(
+            status=bool(self.get_client_book()) and
+            self._last_checksum_time + self._checksum_interval * 3 > time.time(),
+            last_update_time=datetime.fromtimestamp(self._last_checksum_time).isoformat(timespec='seconds'),
+            drift_count=self._drift_count
+        )
+
+    get_status.__doc__ = AbstractService.get_status.__doc__
+
+    def start(self) -> None:
+        """ Запуск вебсокета клиента. """
+        with self._stream_lock:
+            connector: Optional[AbstractExchangeConnector] = self._connector_factory("client")
+            if not connector or not self._exchange:
+                logger.info("Client connector is not inited, can't start client stream")
+                return
+
+            logger.info("Starting client stream")
+            self._stream = EXCHANGE_TO_CLIENT_STREAM[self._exchange](connector=connector)
+            self._stream.get_client_book().add_balance_listener(self._on_balance_event)
+            self._stream.start_stream()
+
+    def get_client_book(self) -> Optional[AbstractAccountBook]:
+        """ Возвращает книгу клиента, если вебсокет жив и книга заполнена. """
+        stream: Optional[AbstractClientStream] = self._stream
+        if stream and stream.is_alive():
+            book: AbstractAccountBook = stream.get_client_book()
+            if book.is_ready():
+                return book
+
+    def get_client_position(self, symbol: str, position_side: str) -> Optional[Position]:
+        """ Возвращает открытую позицию клиента из книги или None, если книга не готова или позиции в ней нет. """
+        book: Optional[AbstractAccountBook] = self.get_client_book()
+        if book:
+            return book.get_position(symbol, position_side)
+
+    def add_balance_listener(self, callback: Callable[[float], None]) -> None:
+        """ Добавляет коллбэк, в который передается баланс клиента при каждом его изменении в вебсокете. """
+        self._balance_listeners.append(callback)
+
+    def _on_balance_event(self, balance: float) -> None:
+        """ Передает баланс из книги текущего вебсокета всем слушателям. """
+        for callback in self._balance_listeners:
+            try:
+                callback(balance)
+            except Exception as e:
+                logger.error(f"Error while called balance listener({callback.__name__}): {e}")
+
+    def on_api_keys_update(self, exchange: Optional[Exchange]) -> None:
+        logger.info(f"Api keys update event: {exchange}")
+        self._exchange = exchange
+        self._restart()
+
+    def stop(self) -> None:
+        """ Останавливает вебсокет клиента и поток сверки. """
+        logger.info("Stopping client stream")
+        self._stopped.set()
+        stream, self._stream = self._stream, None
+        if stream:
+            try:
+                stream.stop_stream()
+            except Exception as e:
+                logger.error(f"Can not stop client stream: {e}")
+
+    def _restart(self) -> None:
+        """ Перезапуск вебсокета клиента. """
+        logger.info("Restarting client stream")
+        stream, self._stream = self._stream, None
+        if stream:
+            try:
+                stream.stop_stream()
+            except Exception as e:
+                logger.error(f"Can not stop previous client stream: {e}")
+
+        self.start()
+
+    def _checksum_thread(self) -> None:
+        """ Функция сверяет книгу клиента с REST и перезапускает упавший вебсокет. """
+        while not self._stopped.wait(self._checksum_interval):
+            try:
+                if not self._stream or not self._stream.is_alive():
+                    if self._connector_factory("client"):
+                        logger.warning("Client stream is not alive")
+                        self._restart()
+                    continue
+
+                book: AbstractAccountBook = self._stream.get_client_book()
+                if not book.is_ready():
+                    continue
+
+                drift: list[str] = book.resync(self._connector_factory("client"))
+                self._last_checksum_time = time.time()
+                if drift:
+                    self._drift_count += len(drift)
+                    logger.warning(f"Client state drift found and fixed: {drift}")
+            except Exception as e:
+                logger.error(f"Error in client stream checksum thread: {e}")
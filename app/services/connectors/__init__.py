@@ -1,17 +1,26 @@
 __all__ = [
+    "AbstractAccountBook",
     "EXCHANGE_TO_CONNECTOR", "AbstractExchangeConnector",
-    "EXCHANGE_TO_POLLING_SERVICE", "AbstractPollingService",
-    "EXCHANGE_TO_WEBSOCKET", "AbstractTraderWebsocket"
+    "EXCHANGE_TO_POLLING_SERVICE", "AbstractPollingService", "PollingState",
+    "EXCHANGE_TO_WEBSOCKET", "EXCHANGE_TO_RELAY_WEBSOCKET", "AbstractTraderWebsocket", "ClientSubscription",
+    "PRIMARY_CLIENT_ID",
+    "EXCHANGE_TO_CLIENT_STREAM", "AbstractClientStream",
+    "EXCHANGE_TO_EXCHANGE_INFO", "AbstractExchangeInfo",
+    "InflightRegistry", "inflight_actions",
 ]
 
+from app.configuration import config
 from app.schemas.enums import Exchange
 
 from .abstract import *
 from .binance_conn import *
 
+_BINANCE_CONNECTOR: type[AbstractExchangeConnector] = \
+    AsyncBinanceConnector if config.USE_ASYNC_CONNECTOR else BinanceConnector
+
 EXCHANGE_TO_CONNECTOR: dict[Exchange | str, type[AbstractExchangeConnector]] = {
-    Exchange.BINANCE: BinanceConnector,
-    Exchange.BINANCE.value: BinanceConnector,
+    Exchange.BINANCE: _BINANCE_CONNECTOR,
+    Exchange.BINANCE.value: _BINANCE_CONNECTOR,
 }
 
 EXCHANGE_TO_POLLING_SERVICE: dict[Exchange | str, type[AbstractPollingService]] = {
@@ -23,3 +32,18 @@ EXCHANGE_TO_WEBSOCKET: dict[Exchange | str, type[AbstractTraderWebsocket]] = {
     Exchange.BINANCE: BinanceTraderWebsocket,
     Exchange.BINANCE.value: BinanceTraderWebsocket,
 }
+
+EXCHANGE_TO_RELAY_WEBSOCKET: dict[Exchange | str, type[AbstractTraderWebsocket]] = {
+    Exchange.BINANCE: BinanceRelayTraderWebsocket,
+    Exchange.BINANCE.value: BinanceRelayTraderWebsocket,
+}
+
+EXCHANGE_TO_CLIENT_STREAM: dict[Exchange | str, type[AbstractClientStream]] = {
+    Exchange.BINANCE: BinanceClientStream,
+    Exchange.BINANCE.value: BinanceClientStream,
+}
+
+EXCHANGE_TO_EXCHANGE_INFO: dict[Exchange | str, AbstractExchangeInfo] = {
+    Exchange.BINANCE: binance_exchange_info,
+    Exchange.BINANCE.value: binance_exchange_info,
+}
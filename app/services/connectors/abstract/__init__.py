@@ -1,6 +1,15 @@
-__all__ = ["AbstractExchangeConnector", "AbstractExchangeInfo", "AbstractPollingService", "AbstractTraderWebsocket", ]
+__all__ = [
+    "AbstractAccountBook", "AbstractClientStream", "AbstractExchangeConnector", "AbstractExchangeInfo",
+    "AbstractPollingService", "AbstractTraderWebsocket", "PollingState",
+    "ClientSubscription", "PRIMARY_CLIENT_ID",
+    "InflightRegistry", "inflight_actions",
+]
 
+from .account_book import AbstractAccountBook
+from .client_stream import AbstractClientStream
 from .exchange_connector import AbstractExchangeConnector
 from .exchange_info import AbstractExchangeInfo
+from .inflight import InflightRegistry, inflight_actions
 from .polling_service import AbstractPollingService
-from .trader_websocket import AbstractTraderWebsocket
+from .polling_state import PollingState
+from .trader_websocket import AbstractTraderWebsocket, ClientSubscription, PRIMARY_CLIENT_ID
@@ -0,0 +1,65 @@
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+
+from app.schemas.types import Order, Position
+from .exchange_connector import AbstractExchangeConnector
+
+
+class AbstractAccountBook(ABC):
+    """
+    Класс хранит в памяти открытые ордера, позиции и баланс аккаунта, которые обновляются из вебсокета.
+    Один раз заполняется через REST, после чего изменяется только событиями с вебсокета.
+    """
+
+    @abstractmethod
+    def is_ready(self) -> bool:
+        """ Заполнена ли книга начальным состоянием с REST. """
+        raise NotImplementedError
+
+    @abstractmethod
+    def seed(self, connector: AbstractExchangeConnector) -> None:
+        """ Заполняет книгу текущим состоянием аккаунта через REST. """
+        raise NotImplementedError
+
+    @abstractmethod
+    def resync(self, connector: AbstractExchangeConnector) -> list[str]:
+        """ Сверяет книгу с REST, при расхождении заменяет ее состояние и возвращает описание расхождений. """
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_snapshot(self, orders: list[Order], positions: list[Position], balance: Optional[float]) -> list[str]:
+        """
+        Заменяет состояние книги снапшотом, который снят в том же потоке событий (например, в relay),
+        поэтому он полностью актуален на момент получения. Возвращает описание расхождений.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def handle_event(self, msg: dict) -> None:
+        """ Обновляет книгу событием с вебсокета. """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_open_orders(self) -> list[Order]:
+        """ Возвращает копию открытых ордеров в том же формате, что и коннектор. """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_open_positions(self) -> list[Position]:
+        """ Возвращает копию открытых позиций в том же формате, что и коннектор. """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_position(self, symbol: str, position_side: str) -> Optional[Position]:
+        """ Возвращает копию открытой позиции по монете и стороне, None, если позиция не открыта. """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_balance(self) -> Optional[float]:
+        """ Возвращает текущий баланс, если он известен. """
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_balance_listener(self, callback: Callable[[float], None]) -> None:
+        """ Добавляет коллбэк, в который передается баланс при каждом его изменении событием. """
+        raise NotImplementedError
@@ -0,0 +1,37 @@
+from abc import ABC, abstractmethod
+
+from .account_book import AbstractAccountBook
+from .exchange_connector import AbstractExchangeConnector
+
+
+class AbstractClientStream(ABC):
+    """ Класс подключается к вебсокету аккаунта клиента и ведет локальную копию его состояния """
+
+    def __init__(self, connector: AbstractExchangeConnector) -> None:
+        self._connector: AbstractExchangeConnector = connector
+
+    @abstractmethod
+    def start_stream(self) -> None:
+        """ Функция подключается к вебсокету клиента и заполняет книгу. """
+        raise NotImplementedError
+
+    @abstractmethod
+    def stop_stream(self) -> None:
+        """ Функция останавливает вебсокет клиента. """
+        raise NotImplementedError
+
+    @abstractmethod
+    def is_alive(self) -> bool:
+        """ Функция возвращает True, если соединение с вебсокетом живо. """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_client_book(self) -> AbstractAccountBook:
+        """ Функция возвращает книгу ордеров, позиций и баланса клиента. """
+        raise NotImplementedError
+
+    def __del__(self) -> None:
+        try:
+            self.stop_stream()
+        except:  # noqa
+            pass
@@ -1,9 +1,19 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
 
-from app.schemas.types import Order, Position
+from app.metrics import executor_queue_depth
+from app.schemas.enums import RequestPriority
+from app.schemas.types import Order, Position, RateLimitStatus
 
 
 class AbstractExchangeConnector(ABC):
+    # Max amount of orders in one batch request, 1 means exchange has no batch endpoints
+    MAX_BATCH_ORDERS: int = 1
+    MAX_BATCH_CANCEL: int = 1
+
+    # Shared pool for blocking connectors, used only in submit()
+    _executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=10, thread_name_prefix="connector")
 
     def __init__(
             self,
@@ -13,19 +23,27 @@ class AbstractExchangeConnector(ABC):
         self._api_key: str = api_key
         self._api_secret: str = api_secret
 
+        # Returns opened position by symbol and position side from local cache or None on cache miss
+        self._position_cache: Callable[[str, str], Optional[Position]] = lambda symbol, position_side: None
+
+    @property
+    def account_id(self) -> str:
+        """ Identifies exchange account of connector in shared registries """
+        return self._api_key
+
     @abstractmethod
     def get_current_balance(self) -> float:
         """ Returns current client balance """
         raise NotImplementedError
 
     @abstractmethod
-    def get_all_open_positions(self) -> list[dict]:
-        """ Returns list of opened positions """
+    def get_all_open_positions(self, priority: Optional[RequestPriority] = None) -> list[dict]:
+        """ Returns list of opened positions, priority is used by connectors with rate limiter """
         raise NotImplementedError
 
     @abstractmethod
-    def get_all_open_orders(self) -> list[dict]:
-        """ Returns list of opened orders """
+    def get_all_open_orders(self, priority: Optional[RequestPriority] = None) -> list[dict]:
+        """ Returns list of opened orders, priority is used by connectors with rate limiter """
         raise NotImplementedError
 
     @abstractmethod
@@ -34,18 +52,18 @@ class AbstractExchangeConnector(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def copy_order_from_websocket_message(self, order: dict) -> dict:
-        """ Copy order from trader websocket account message """
+    def copy_order_from_websocket_message(self, order: Any) -> dict:
+        """ Copy order from trader websocket account message, decoded by exchange websocket """
         raise NotImplementedError
 
     @abstractmethod
-    def close_position_from_websocket_message(self, position: dict) -> dict:
-        """ Closing position after websocket message """
+    def close_position_from_websocket_message(self, position: Any) -> dict:
+        """ Closing position after websocket message, decoded by exchange websocket """
         raise NotImplementedError
 
     @abstractmethod
-    def close_position(self, position: Position) -> dict:
-        """ Close current positions """
+    def close_position(self, position: Position, priority: Optional[RequestPriority] = None) -> dict:
+        """ Close current positions, priority is used by connectors with rate limiter """
         raise NotImplementedError
 
     @abstractmethod
@@ -59,8 +77,66 @@ class AbstractExchangeConnector(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def cancel_all_open_orders(self, symbol: str) -> dict:
-        """ Cancel all opened orders """
+    def cancel_all_open_orders(self, symbol: str, priority: Optional[RequestPriority] = None) -> dict:
+        """ Cancel all opened orders, priority is used by connectors with rate limiter """
+        raise NotImplementedError
+
+    def copy_orders(self, orders: list[Order]) -> list[dict]:
+        """ Copy several orders from trader account.
+        Returns result for every order in the same order, failed ones are {"code": ..., "msg": ...}
+        """
+        results: list[dict] = []
+        for order in orders:
+            try:
+                results.append(self.copy_order(order=order))
+            except Exception as e:
+                results.append({"code": getattr(e, "error_code", None), "msg": getattr(e, "error_message", str(e))})
+        return results
+
+    def cancel_orders(self, symbol: str, order_ids: list[int | str]) -> list[dict]:
+        """ Cancel several orders by id on one symbol.
+        Returns result for every order in the same order, failed ones are {"code": ..., "msg": ...}
+        """
+        results: list[dict] = []
+        for order_id in order_ids:
+            try:
+                results.append(self.cancel_order(symbol=symbol, order_id=order_id))
+            except Exception as e:
+                results.append({"code": getattr(e, "error_code", None), "msg": getattr(e, "error_message", str(e))})
+        return results
+
+    def set_position_cache(self, lookup: Callable[[str, str], Optional[Position]]) -> None:
+        """ Sets local cache of account positions, it is used instead of request to exchange when it is possible """
+        self._position_cache = lookup
+
+    def submit(self, method: str, *args, **kwargs) -> Future:
+        """ Schedules connector method call without blocking and returns future with its result.
+        Blocking connectors run it in the shared thread pool, asyncio connectors override it
+        to run the awaitable version of method in their event loop.
+        """
+        return self._executor.submit(getattr(self, method), *args, **kwargs)
+
+    def get_rate_limit_status(self) -> Optional[RateLimitStatus]:
+        """ Returns current usage of exchange request limits, if connector tracks them """
+        return None
+
+    def get_order_history(self, symbol: str, start_time: Optional[int] = None,
+                          order_id: Optional[int] = None) -> list[Order]:
+        """ Returns orders of symbol created after start_time or with id >= order_id, closed ones too
+         binance method
+         """
+        raise NotImplementedError
+
+    def get_trade_history(self, symbol: str, start_time: int) -> list[dict]:
+        """ Returns account trades of symbol after start_time
+         binance method
+         """
+        raise NotImplementedError
+
+    def get_income_history(self, start_time: int) -> list[dict]:
+        """ Returns income records (commissions, realized pnl, funding) of all symbols after start_time
+         binance method
+         """
         raise NotImplementedError
 
     def renew_listen_key(self, listen_key: str) -> None:
@@ -90,3 +166,6 @@ class AbstractExchangeConnector(ABC):
     # def create_order(self, order: Order) -> None:
     #     """ Create order """
     #     raise NotImplementedError
+
+
+executor_queue_depth.set_function(AbstractExchangeConnector._executor._work_queue.qsize, executor="connector")
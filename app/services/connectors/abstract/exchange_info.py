@@ -1,5 +1,6 @@
 from abc import abstractmethod, ABC
-from threading import Thread
+from threading import Event, Thread
+from typing import Optional
 
 
 class AbstractExchangeInfo(ABC, Thread):
@@ -11,6 +12,9 @@ class AbstractExchangeInfo(ABC, Thread):
     def __init__(self):
         Thread.__init__(self, daemon=True)
 
+        # Устанавливается, когда информация о монетах загружена из снапшота или с биржи
+        self._ready: Event = Event()
+
     @abstractmethod
     def run(self) -> None:
         pass
@@ -22,3 +26,21 @@ class AbstractExchangeInfo(ABC, Thread):
     @abstractmethod
     def round_quantity(self, symbol: str, quiantity: float) -> float:
         pass
+
+    @abstractmethod
+    def format_price(self, symbol: str, price: float) -> str:
+        """ Rounds price and formats it as exchange expects in requests """
+        pass
+
+    @abstractmethod
+    def format_quantity(self, symbol: str, quantity: float) -> str:
+        """ Rounds quantity and formats it as exchange expects in requests """
+        pass
+
+    def is_ready(self) -> bool:
+        """ Загружена ли информация о монетах. """
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """ Ждет загрузки информации о монетах, возвращает False, если она не загрузилась за timeout. """
+        return self._ready.wait(timeout=timeout)
@@ -0,0 +1,95 @@
+"""
+Module with registry of client account actions, which are in flight or were done recently.
+Trader websocket and polling service can decide to do the same action within one polling window,
+so both of them take action in registry before request and skip it, if it is already taken.
+"""
+__all__ = ["InflightRegistry", "inflight_actions", ]
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from app.configuration import config
+from app.metrics import deduplicated_actions
+
+# ("copy", trader order id), ("cancel", trader order id) or ("close", symbol, position side)
+ActionKey = tuple[str, ...]
+
+
+class InflightRegistry:
+    """
+    Action is in flight until it is completed or inflight_ttl passes, so lost action does not block forever.
+    Successful action stays in registry for completed_ttl, while account snapshots of other path may be stale.
+    Failed action is removed at once, so other path can retry it.
+    """
+
+    def __init__(self, inflight_ttl: float, completed_ttl: float) -> None:
+        self._inflight_ttl: float = inflight_ttl
+        self._completed_ttl: float = completed_ttl
+        self._lock: threading.Lock = threading.Lock()
+        self._entries: dict[tuple[str, ActionKey], float] = {}  # (account, key) -> expire time
+        self._purged_at: float = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def copy_key(order_id: int | str) -> ActionKey:
+        return "copy", str(order_id)
+
+    @staticmethod
+    def cancel_key(order_id: int | str) -> ActionKey:
+        return "cancel", str(order_id)
+
+    @staticmethod
+    def close_key(symbol: str, position_side: str) -> ActionKey:
+        return "close", symbol, position_side
+
+    def begin(self, account: str, key: ActionKey, path: str) -> bool:
+        """ Takes action, returns False if action is already in flight or done recently """
+        now: float = time.monotonic()
+        with self._lock:
+            expires_at: Optional[float] = self._entries.get((account, key))
+            if expires_at is None or expires_at <= now:
+                self._entries[(account, key)] = now + self._inflight_ttl
+                self._purge(now)
+                return True
+        deduplicated_actions.inc(action=key[0], path=path)
+        return False
+
+    def complete(self, account: str, key: ActionKey, success: bool) -> None:
+        with self._lock:
+            if success:
+                self._entries[(account, key)] = time.monotonic() + self._completed_ttl
+            else:
+                self._entries.pop((account, key), None)
+
+    def forget(self, account: str, key: ActionKey) -> None:
+        """ Allows action again, e.g. close of position, which was opened again """
+        with self._lock:
+            self._entries.pop((account, key), None)
+
+    @contextmanager
+    def take(self, account: str, key: ActionKey, path: str) -> Iterator[bool]:
+        """ Yields True if action is taken, it is completed as failed if body raises """
+        if not self.begin(account, key, path):
+            yield False
+            return
+        try:
+            yield True
+        except BaseException:
+            self.complete(account, key, success=False)
+            raise
+        self.complete(account, key, success=True)
+
+    def _purge(self, now: float) -> None:
+        """ Drops expired entries, called under lock not more often than completed_ttl """
+        if now - self._purged_at < self._completed_ttl:
+            return
+        self._purged_at = now
+        for entry in [e for e, expires_at in self._entries.items() if expires_at <= now]:
+            del self._entries[entry]
+
+
+inflight_actions = InflightRegistry(inflight_ttl=config.INFLIGHT_ACTION_TTL, completed_ttl=config.COMPLETED_ACTION_TTL)
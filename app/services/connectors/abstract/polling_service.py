@@ -2,7 +2,9 @@ from abc import ABC, abstractmethod
 from typing import Callable, Literal, Optional
 
 from app.schemas.models import UserSettings
+from .account_book import AbstractAccountBook
 from .exchange_connector import AbstractExchangeConnector
+from .polling_state import PollingState
 
 
 class AbstractPollingService(ABC):
@@ -15,7 +17,14 @@ class AbstractPollingService(ABC):
     def process(
             cls,
             connector_factory: Callable[[Literal["trader", "client"]], Optional[AbstractExchangeConnector]],
-            user_settings: UserSettings
+            user_settings: UserSettings,
+            trader_book: Optional[AbstractAccountBook] = None,
+            client_book: Optional[AbstractAccountBook] = None,
+            state: Optional[PollingState] = None
     ) -> None:
-        """ Проверка ордеров и позиций, выставление их и тд """
+        """ Проверка ордеров и позиций, выставление их и тд.
+        Если переданы книги трейдера или клиента, состояние аккаунта берется из них, а не через REST.
+        Если передано состояние сервиса, сверяются только изменившиеся символы, а неудавшиеся действия
+        не повторяются до истечения задержки в negative cache.
+        """
         raise NotImplementedError
@@ -0,0 +1,128 @@
+"""
+Module with state, which one polling service instance keeps between cycles:
+fingerprints of symbols, which were consistent after previous cycle, and negative cache of failed actions.
+"""
+__all__ = ["PollingState", "NegativeCache", "NegativeCacheEntry", ]
+
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from app.configuration import config
+from app.schemas.types import SuppressedActionStatus
+
+# (action kind, symbol, target id), target id is position side for positions and order id for orders
+ActionKey = tuple[str, str, str]
+
+
+@dataclass(slots=True)
+class NegativeCacheEntry:
+    key: ActionKey
+    reason: str  # exchange error code or exception type
+    message: str
+    failures: int
+    retry_at: float
+
+
+class NegativeCache:
+    """ Failed actions by key. Action is suppressed until retry_at, delay doubles with every failure """
+
+    def __init__(self, base_delay: float, max_delay: float) -> None:
+        self._base_delay: float = base_delay
+        self._max_delay: float = max_delay
+        self._entries: dict[ActionKey, NegativeCacheEntry] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def is_suppressed(self, key: ActionKey, now: Optional[float] = None) -> bool:
+        entry: Optional[NegativeCacheEntry] = self._entries.get(key)
+        return entry is not None and entry.retry_at > (now or time.time())
+
+    def add(self, key: ActionKey, reason: str, message: str, now: Optional[float] = None) -> NegativeCacheEntry:
+        entry: Optional[NegativeCacheEntry] = self._entries.get(key)
+        failures: int = entry.failures + 1 if entry else 1
+        delay: float = min(self._base_delay * 2 ** (failures - 1), self._max_delay)
+        entry = self._entries[key] = NegativeCacheEntry(key, reason, message, failures, (now or time.time()) + delay)
+        return entry
+
+    def keys(self) -> list[ActionKey]:
+        return list(self._entries)
+
+    def discard(self, key: ActionKey) -> None:
+        self._entries.pop(key, None)
+
+    def retain(self, symbols: set[str], keys: set[ActionKey]) -> None:
+        """ Drops entries of symbols, which were reconciled, if their action is not planned anymore """
+        for key in [k for k in self._entries if k[1] in symbols and k not in keys]:
+            del self._entries[key]
+
+    def due_symbols(self, now: Optional[float] = None) -> set[str]:
+        """ Symbols with actions, which can be retried """
+        now = now or time.time()
+        return {e.key[1] for e in self._entries.values() if e.retry_at <= now}
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def get_status(self) -> list[SuppressedActionStatus]:
+        return [
+            SuppressedActionStatus(
+                action=e.key[0],
+                symbol=e.key[1],
+                target=e.key[2],
+                reason=e.reason,
+                message=e.message,
+                failures=e.failures,
+                retry_at=datetime.fromtimestamp(e.retry_at).isoformat(timespec='seconds'),
+            ) for e in sorted(self._entries.values(), key=lambda e: e.retry_at)
+        ]
+
+
+class PollingState:
+    """
+    Состояние сервиса поллинга между циклами.
+    Символ, по которому после цикла не осталось выполненных действий, запоминается по отпечатку снапшотов
+    трейдера и клиента и в следующем цикле сверяется, только если отпечаток изменился
+    или подошло время повторить неудавшееся действие из negative cache.
+    """
+
+    def __init__(
+            self,
+            base_delay: float = config.POLLING_FAILED_ACTION_BACKOFF,
+            max_delay: float = config.POLLING_FAILED_ACTION_MAX_BACKOFF
+    ) -> None:
+        self.negative_cache: NegativeCache = NegativeCache(base_delay=base_delay, max_delay=max_delay)
+        self._fingerprints: dict[str, int] = {}
+        self._multiplier: Optional[float] = None
+
+    def dirty_symbols(self, fingerprints: dict[str, int], multiplier: float) -> set[str]:
+        """ Symbols to reconcile in this cycle, fingerprints are taken from current snapshots """
+        if multiplier != self._multiplier:
+            # Copied quantities change, so every symbol is checked and failed actions are tried again
+            self.reset()
+            self._multiplier = multiplier
+
+        # Symbol, which left both accounts, is reconciled once more to drop its failed actions
+        left: set[str] = {s for s in self._fingerprints if s not in fingerprints}
+        left |= {key[1] for key in self.negative_cache.keys() if key[1] not in fingerprints}
+        for symbol in left:
+            self._fingerprints.pop(symbol, None)
+        changed: set[str] = {s for s, f in fingerprints.items() if self._fingerprints.get(s) != f}
+        return changed | left | self.negative_cache.due_symbols()
+
+    def commit(self, fingerprints: dict[str, int], reconciled: set[str], executed: set[str]) -> None:
+        """
+        Remembers reconciled symbols as consistent, except symbols with executed actions:
+        they are checked again in next cycle to confirm that actions took effect.
+        """
+        for symbol in reconciled:
+            if symbol in executed or symbol not in fingerprints:
+                self._fingerprints.pop(symbol, None)
+            else:
+                self._fingerprints[symbol] = fingerprints[symbol]
+
+    def reset(self) -> None:
+        self._fingerprints.clear()
+        self.negative_cache.clear()
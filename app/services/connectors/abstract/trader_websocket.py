@@ -1,40 +1,108 @@
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
 from typing import Callable, Literal, Optional
 
+from app.configuration import logger
 from app.schemas.models import UserSettings, TraderSettings
+from .account_book import AbstractAccountBook
 from .exchange_connector import AbstractExchangeConnector
 
 
+PRIMARY_CLIENT_ID: str = "primary"
+
+
+@dataclass(frozen=True, slots=True)
+class ClientSubscription:
+    """ Client account, to which trader websocket copies events """
+    client_id: str
+    connector_factory: Callable[[Literal["trader", "client"]], Optional[AbstractExchangeConnector]]
+    user_settings_factory: Callable[[], UserSettings]
+    is_active: Callable[[], bool] = lambda: True  # events are not copied to inactive client
+
+
 class AbstractTraderWebsocket(ABC):
-    """ Класс обрабатывает сообщение с вебсокета """
+    """
+    Класс обрабатывает сообщение с вебсокета.
+    Один вебсокет трейдера копирует события во все подписанные аккаунты клиентов.
+    """
 
     def __init__(
             self,
             callback: Callable[[dict], None],
             connector_factory: Callable[[Literal["trader", "client"]], Optional[AbstractExchangeConnector]],
-            user_settings: UserSettings,
+            user_settings: Optional[UserSettings],
             trader_settings: TraderSettings,
+            clients: Optional[list[ClientSubscription]] = None,
     ) -> None:
+        """
+        :param clients: Подписанные клиенты. Если не переданы, события копируются в клиента из connector_factory
+            с настройками user_settings.
+        """
         self._callback: Callable[[dict], None] = callback
-        self._user_settings: UserSettings = user_settings
+        self._user_settings: Optional[UserSettings] = user_settings
         self._trader_settings: TraderSettings = trader_settings
         self._connector_factory: Callable[[Literal["trader", "client"]], Optional[AbstractExchangeConnector]] = \
             connector_factory
         self._ws = None
 
+        if clients is None:
+            clients = [ClientSubscription(PRIMARY_CLIENT_ID, connector_factory, lambda: self._user_settings)]
+        # Dict is replaced on change, so handler threads iterate over consistent snapshot without lock
+        self._clients: dict[str, ClientSubscription] = {c.client_id: c for c in clients}
+
+        self._event_listeners: list[Callable[[dict], None]] = []
+
+    def add_client(self, client: ClientSubscription) -> None:
+        """ Подписывает клиента на события трейдера, клиент с тем же id заменяется. """
+        self._clients = {**self._clients, client.client_id: client}
+
+    def remove_client(self, client_id: str) -> None:
+        """ Отписывает клиента от событий трейдера. """
+        self._clients = {k: v for k, v in self._clients.items() if k != client_id}
+
+    def add_event_listener(self, callback: Callable[[dict], None]) -> None:
+        """ Добавляет коллбэк, в который передается каждое декодированное событие трейдера, например, для relay. """
+        self._event_listeners.append(callback)
+
+    def _notify_event_listeners(self, msg: dict) -> None:
+        for callback in self._event_listeners:
+            try:
+                callback(msg)
+            except Exception as e:
+                logger.error(f"Error while called event listener({callback.__name__}): {e}")
+
     @abstractmethod
     def handle_websocket_message(self, *args, **kwargs) -> None:
         """ Функция принимает и обрабатывает сообщение с вебсокета. """
         raise NotImplementedError
 
+    def handle_state_message(self, *args, **kwargs) -> None:
+        """ Функция обновляет только локальное состояние трейдера, без копирования ордеров. """
+        pass
+
+    def get_trader_book(self) -> Optional[AbstractAccountBook]:
+        """ Функция возвращает книгу ордеров и позиций трейдера, если вебсокет ее ведет. """
+        return None
+
+    def wait_confirmed(self, timeout: float) -> bool:
+        """ Функция ждет первое сообщение запущенного вебсокета, возвращает False, если оно не пришло. """
+        return True
+
+    def take_over(self, previous: "AbstractTraderWebsocket") -> None:
+        """ Функция забирает состояние трейдера у прошлого вебсокета того же аккаунта при перезапуске. """
+        pass
+
     @abstractmethod
     def start_websocket(self) -> None:
         """ Функция создает и возвращает клиент вебсокета для конкретной биржи. """
         raise NotImplementedError
 
     @abstractmethod
-    def stop_websocket(self) -> None:
-        """ Функция останавливает вебсокет. """
+    def stop_websocket(self, close_listen_key: bool = True) -> None:
+        """
+        Функция останавливает вебсокет.
+        :param close_listen_key: False - ключ потока не закрывается, потому что его уже использует новый вебсокет.
+        """
         raise NotImplementedError
 
     def __del__(self) -> None:
@@ -1,6 +1,12 @@
-__all__ = ["BinanceConnector", "binance_exchange_info", "BinancePollingService", "BinanceTraderWebsocket", ]
+__all__ = [
+    "BinanceConnector", "AsyncBinanceConnector", "binance_exchange_info", "BinancePollingService",
+    "BinanceTraderWebsocket", "BinanceRelayTraderWebsocket", "BinanceClientStream",
+]
 
+from .async_exchange_connector import AsyncBinanceConnector
+from .client_stream import BinanceClientStream
 from .exchange_connector import BinanceConnector
 from .exchange_info import exchange_info as binance_exchange_info
 from .polling_service import BinancePollingService
+from .relay_websocket import BinanceRelayTraderWebsocket
 from .trader_websocket import BinanceTraderWebsocket
@@ -0,0 +1,236 @@
+"""
+In-memory book of account open orders, positions and balance, maintained from binance user data stream.
+"""
+__all__ = ["BinanceAccountBook", ]
+
+import sys
+import threading
+from typing import Callable, Optional
+
+import binance.lib.utils  # get_timestamp is monkey patched in app.utils.patches
+
+from app.configuration import logger
+from app.schemas.types import Order, Position
+from ..abstract import AbstractAccountBook, AbstractExchangeConnector
+
+
+class BinanceAccountBook(AbstractAccountBook):
+    """
+    Книга открытых ордеров (по orderId), позиций (по symbol и positionSide) и USDT баланса аккаунта.
+    Ордера и позиции хранятся в том же формате, в котором их возвращает REST, чтобы
+    сервисы могли использовать книгу вместо запросов к бирже.
+    """
+
+    OPEN_ORDER_STATUSES: tuple[str, ...] = ("NEW", "PARTIALLY_FILLED")
+    BALANCE_ASSET: str = "USDT"
+    BALANCE_TOLERANCE: float = 0.01
+
+    def __init__(self) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self._ready: bool = False
+
+        self._orders: dict[int, Order] = {}
+        self._positions: dict[tuple[str, str], Position] = {}
+        self._balance: Optional[float] = None
+        self._balance_update_time: int = 0
+
+        self._balance_listeners: list[Callable[[float], None]] = []
+
+        # Время (T) закрытия ордеров по событиям, чтобы REST снапшот, снятый раньше, не вернул их обратно
+        self._removed_orders: dict[int, int] = {}
+
+    def is_ready(self) -> bool:
+        return self._ready
+
+    is_ready.__doc__ = AbstractAccountBook.is_ready.__doc__
+
+    def seed(self, connector: AbstractExchangeConnector) -> None:
+        """ Заполняет книгу через REST. События, пришедшие во время запроса, считаются более свежими. """
+        self._apply_snapshot(*self._request_snapshot(connector))
+        self._ready = True
+
+        logger.info(f"Account book seeded: {len(self._orders)} orders, {len(self._positions)} positions, "
+                    f"balance={self._balance}")
+
+    def resync(self, connector: AbstractExchangeConnector) -> list[str]:
+        return self._apply_snapshot(*self._request_snapshot(connector))
+
+    resync.__doc__ = AbstractAccountBook.resync.__doc__
+
+    def load_snapshot(self, orders: list[Order], positions: list[Position], balance: Optional[float]) -> list[str]:
+        drift: list[str] = self._apply_snapshot(
+            orders, positions, self._balance if balance is None else balance, started_at=sys.maxsize)
+        self._ready = True
+        return drift
+
+    load_snapshot.__doc__ = AbstractAccountBook.load_snapshot.__doc__
+
+    def handle_event(self, msg: dict) -> None:
+        event_type: str = msg.get("e")
+        if event_type == "ORDER_TRADE_UPDATE":
+            self._order_trade_update(msg)
+        elif event_type == "ACCOUNT_UPDATE":
+            self._account_update(msg)
+
+    handle_event.__doc__ = AbstractAccountBook.handle_event.__doc__
+
+    def get_open_orders(self) -> list[Order]:
+        with self._lock:
+            return [dict(o) for o in self._orders.values()]
+
+    get_open_orders.__doc__ = AbstractAccountBook.get_open_orders.__doc__
+
+    def get_open_positions(self) -> list[Position]:
+        with self._lock:
+            return [dict(p) for p in self._positions.values() if float(p["positionAmt"]) != 0]
+
+    get_open_positions.__doc__ = AbstractAccountBook.get_open_positions.__doc__
+
+    def get_position(self, symbol: str, position_side: str) -> Optional[Position]:
+        with self._lock:
+            position: Position | None = self._positions.get((symbol, position_side))
+            if position and float(position["positionAmt"]) != 0:
+                return dict(position)
+
+    get_position.__doc__ = AbstractAccountBook.get_position.__doc__
+
+    def get_balance(self) -> Optional[float]:
+        return self._balance
+
+    get_balance.__doc__ = AbstractAccountBook.get_balance.__doc__
+
+    def add_balance_listener(self, callback: Callable[[float], None]) -> None:
+        self._balance_listeners.append(callback)
+
+    add_balance_listener.__doc__ = AbstractAccountBook.add_balance_listener.__doc__
+
+    @staticmethod
+    def _request_snapshot(connector: AbstractExchangeConnector) -> tuple[list[Order], list[Position], float, int]:
+        """ Requests orders, positions and balance, returns them with request start time """
+        started_at: int = binance.lib.utils.get_timestamp()
+        return (
+            connector.get_all_open_orders(),
+            connector.get_all_open_positions(),
+            connector.get_current_balance(),
+            started_at
+        )
+
+    def _apply_snapshot(
+            self,
+            orders: list[Order],
+            positions: list[Position],
+            balance: float,
+            started_at: int
+    ) -> list[str]:
+        """
+        Replaces book state with REST snapshot, but keeps everything that was updated by events
+        after snapshot request started. Returns list of found differences.
+        """
+        drift: list[str] = []
+        with self._lock:
+            rest_orders: dict[int, Order] = {
+                o["orderId"]: o for o in orders if self._removed_orders.get(o["orderId"], 0) < started_at}
+            for order_id, o in list(self._orders.items()):
+                if order_id not in rest_orders and o["updateTime"] < started_at:
+                    drift.append(f"order {order_id} is not opened on exchange")
+                    del self._orders[order_id]
+            for order_id, o in rest_orders.items():
+                if order_id not in self._orders:
+                    drift.append(f"order {order_id} is missing in book")
+                    self._orders[order_id] = o
+
+            rest_positions: dict[tuple[str, str], Position] = {(p["symbol"], p["positionSide"]): p for p in positions}
+            for key, p in list(self._positions.items()):
+                if p["updateTime"] >= started_at:
+                    continue
+                rest_position: Position | None = rest_positions.get(key)
+                rest_amount: float = float(rest_position["positionAmt"]) if rest_position else 0.0
+                if float(p["positionAmt"]) != rest_amount:
+                    drift.append(f"position {key} amount {p['positionAmt']} != {rest_amount}")
+                    if rest_position:
+                        self._positions[key] = rest_position
+                    else:
+                        del self._positions[key]
+            for key, p in rest_positions.items():
+                if key not in self._positions:
+                    drift.append(f"position {key} is missing in book")
+                    self._positions[key] = p
+
+            if self._balance_update_time < started_at:
+                if self._balance is not None and abs(self._balance - balance) > self.BALANCE_TOLERANCE:
+                    drift.append(f"balance {self._balance} != {balance}")
+                self._balance = balance
+
+            self._removed_orders = {k: v for k, v in self._removed_orders.items() if v >= started_at}
+
+        return drift
+
+    def _order_trade_update(self, msg: dict) -> None:
+        """ Adds, updates or removes order from ORDER_TRADE_UPDATE event """
+        o: dict = msg["o"]
+        order_id: int = o["i"]
+
+        with self._lock:
+            if o["X"] not in self.OPEN_ORDER_STATUSES:
+                self._orders.pop(order_id, None)
+                self._removed_orders[order_id] = msg["T"]
+                return
+
+            current: Order | None = self._orders.get(order_id)
+            if current and current["updateTime"] > msg["T"]:
+                return  # stale event
+
+            order: Order = {
+                "orderId": order_id,
+                "clientOrderId": o["c"],
+                "symbol": o["s"],
+                "side": o["S"],
+                "positionSide": o["ps"],
+                "type": o["o"],
+                "origType": o["ot"],
+                "status": o["X"],
+                "timeInForce": o["f"],
+                "origQty": o["q"],
+                "executedQty": o["z"],
+                "price": o["p"],
+                "avgPrice": o["ap"],
+                "stopPrice": o["sp"],
+                "closePosition": o.get("cp", False),
+                "reduceOnly": o.get("R", False),
+                "workingType": o.get("wt"),
+                "priceProtect": o.get("pP", False),
+                "updateTime": msg["T"],
+            }
+            if "AP" in o:
+                order["activatePrice"] = o["AP"]
+            if "cr" in o:
+                order["priceRate"] = o["cr"]
+            self._orders[order_id] = order
+
+    def _account_update(self, msg: dict) -> None:
+        """ Updates positions and balance from ACCOUNT_UPDATE event """
+        balance: Optional[float] = None
+        with self._lock:
+            for p in msg["a"]["P"]:
+                self._positions[(p["s"], p["ps"])] = {
+                    "symbol": p["s"],
+                    "positionSide": p["ps"],
+                    "positionAmt": p["pa"],
+                    "entryPrice": p["ep"],
+                    "breakEvenPrice": p.get("bep", "0"),
+                    "unRealizedProfit": p["up"],
+                    "marginType": p["mt"],
+                    "isolatedWallet": p["iw"],
+                    "updateTime": msg["T"],
+                }
+            for b in msg["a"].get("B", []):
+                if b["a"] == self.BALANCE_ASSET:
+                    balance = self._balance = float(b["wb"])
+                    self._balance_update_time = msg["T"]
+
+        if balance is not None:
+            for callback in self._balance_listeners:
+                try:
+                    callback(balance)
+                except Exception as e:
+                    logger.error(f"Error while called balance listener({callback.__name__}): {e}")
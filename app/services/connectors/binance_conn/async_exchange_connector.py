@@ -0,0 +1,389 @@
+"""
+Asyncio-native connector for binance usdⓈ-m futures.
+All instances share one event loop thread and one pooled keep-alive http session.
+"""
+__all__ = ["AsyncBinanceConnector", ]
+
+import asyncio
+import hashlib
+import hmac
+import json
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Coroutine, Literal, Optional
+
+import aiohttp
+import binance.lib.utils  # get_timestamp is monkey patched in app.utils.patches
+from binance.error import ClientError, ServerError
+from yarl import URL
+
+from app.configuration import config
+from app.metrics import rest_latency
+from app.schemas.enums import RequestPriority
+from app.schemas.types import Order, Position, RateLimitStatus
+from .events import OrderUpdate, PositionUpdate
+from .exchange_connector import BinanceConnector
+from .rate_limiter import rate_limiter
+from ..abstract import AbstractExchangeConnector
+
+
+class AsyncBinanceConnector(AbstractExchangeConnector):
+    base_url: str = config.BINANCE_REST_URL
+    recvWindow: dict = {"recvWindow": 20000}
+
+    MAX_BATCH_ORDERS: int = BinanceConnector.MAX_BATCH_ORDERS
+    MAX_BATCH_CANCEL: int = BinanceConnector.MAX_BATCH_CANCEL
+    HISTORY_LIMIT: int = BinanceConnector.HISTORY_LIMIT
+    INCOME_LIMIT: int = BinanceConnector.INCOME_LIMIT
+
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    _session: Optional[aiohttp.ClientSession] = None
+    _lock: threading.Lock = threading.Lock()
+
+    def __init__(self, api_key: str, api_secret: str) -> None:
+        super().__init__(api_key=api_key, api_secret=api_secret)
+
+        self._headers: dict = {"X-MBX-APIKEY": api_key}
+
+    # Order params are built the same way as in blocking connector
+    _create_order_kwargs = BinanceConnector._create_order_kwargs
+    _create_batch_order_kwargs = BinanceConnector._create_batch_order_kwargs
+    _find_position = BinanceConnector._find_position
+
+    def submit(self, method: str, *args, **kwargs) -> Future:
+        """ Schedules awaitable version of connector method in shared event loop. """
+        return asyncio.run_coroutine_threadsafe(getattr(self, f"{method}_async")(*args, **kwargs), self._get_loop())
+
+    def get_rate_limit_status(self) -> RateLimitStatus:
+        """ Returns current usage of binance request limits """
+        return rate_limiter.get_status(self._api_key)
+
+    # ----------  awaitable methods ---------- #
+
+    async def get_current_balance_async(self) -> float:
+        """ Returns current user balance. """
+        for asset in await self._request("GET", "/fapi/v2/balance", self.recvWindow):
+            if asset["asset"] == "USDT":
+                return float(asset["balance"])
+
+    async def get_all_open_positions_async(self, priority: Optional[RequestPriority] = None) -> list[dict]:
+        """ Returns list of opened positions """
+        return [p for p in await self._request("GET", "/fapi/v2/positionRisk", self.recvWindow, priority=priority)
+                if float(p["positionAmt"]) != 0]
+
+    async def get_all_open_orders_async(self, priority: Optional[RequestPriority] = None) -> list[dict]:
+        """ Returns list of opened orders """
+        return await self._request("GET", "/fapi/v1/openOrders", self.recvWindow, priority=priority)
+
+    async def get_order_history_async(self, symbol: str, start_time: Optional[int] = None,
+                                      order_id: Optional[int] = None) -> list[Order]:
+        """ Returns orders of symbol created after start_time or with id >= order_id, closed ones too """
+        orders: list[Order] = []
+        while True:
+            page: list[Order] = await self._request("GET", "/fapi/v1/allOrders", {
+                "symbol": symbol,
+                "startTime": start_time if order_id is None else None,
+                "orderId": order_id,
+                "limit": self.HISTORY_LIMIT,
+                **self.recvWindow
+            })
+            orders.extend(page)
+            if len(page) < self.HISTORY_LIMIT:
+                return orders
+            order_id = page[-1]["orderId"] + 1
+
+    async def get_trade_history_async(self, symbol: str, start_time: int) -> list[dict]:
+        """ Returns account trades of symbol after start_time """
+        return await self._request("GET", "/fapi/v1/userTrades", {
+            "symbol": symbol,
+            "startTime": start_time,
+            **self.recvWindow
+        })
+
+    async def get_income_history_async(self, start_time: int) -> list[dict]:
+        """ Returns income records (commissions, realized pnl, funding) of all symbols after start_time """
+        records: dict[tuple[int, str], dict] = {}
+        while True:
+            page: list[dict] = await self._request("GET", "/fapi/v1/income", {
+                "startTime": start_time,
+                "limit": self.INCOME_LIMIT,
+                **self.recvWindow
+            })
+            records.update(((r["tranId"], r["incomeType"]), r) for r in page)
+            # Page is requested from time of its last record, records of this time are deduplicated
+            if len(page) < self.INCOME_LIMIT or page[-1]["time"] == start_time:
+                return list(records.values())
+            start_time = page[-1]["time"]
+
+    async def copy_order_async(self, order: Order) -> dict:
+        """ Copy order from trader account """
+        return await self._request("POST", "/fapi/v1/order", {
+            **self._create_order_kwargs(
+                symbol=order["symbol"],
+                type=order["type"],
+                side=order["side"],
+                quantity=order["origQty"],
+                client_order_id=order["orderId"],
+                time_in_force=order["timeInForce"],
+                close_position=order["closePosition"],
+                position_side=order["positionSide"],
+                price=order["price"],
+                stop_price=order["stopPrice"],
+                callback_rate=float(order.get("priceRate", 0.0)),
+                activation_price=order.get("activatePrice", 0.0)
+            ),
+            **self.recvWindow
+        })
+
+    async def copy_order_from_websocket_message_async(self, order: OrderUpdate) -> dict:
+        """ Copy order from trader websocket account message """
+        return await self._request("POST", "/fapi/v1/order", {
+            **self._create_order_kwargs(
+                symbol=order.symbol,
+                type=order.orig_type,
+                client_order_id=str(order.order_id),
+                side=order.side,
+                position_side=order.position_side,
+                price=order.price,
+                quantity=order.quantity,
+                stop_price=order.stop_price,
+                close_position=order.close_position,
+            ),
+            **self.recvWindow
+        })
+
+    async def copy_orders_async(self, orders: list[Order]) -> list[dict]:
+        """ Copy several orders from trader account through /fapi/v1/batchOrders """
+        chunks: list[list[Order]] = [orders[i:i + self.MAX_BATCH_ORDERS]
+                                     for i in range(0, len(orders), self.MAX_BATCH_ORDERS)]
+        responses: list[list[dict]] = await asyncio.gather(*[self._request("POST", "/fapi/v1/batchOrders", {
+            "batchOrders": json.dumps([self._create_batch_order_kwargs(o) for o in chunk], separators=(",", ":")),
+            **self.recvWindow
+        }) for chunk in chunks])
+        return [result for response in responses for result in response]
+
+    async def cancel_orders_async(self, symbol: str, order_ids: list[int | str]) -> list[dict]:
+        """ Cancel several orders by id through /fapi/v1/batchOrders """
+        chunks: list[list[int | str]] = [order_ids[i:i + self.MAX_BATCH_CANCEL]
+                                         for i in range(0, len(order_ids), self.MAX_BATCH_CANCEL)]
+        responses: list[list[dict]] = await asyncio.gather(*[self._request("DELETE", "/fapi/v1/batchOrders", {
+            "symbol": symbol,
+            "orderIdList": json.dumps([int(order_id) for order_id in chunk], separators=(",", ":")),
+            **self.recvWindow
+        }) for chunk in chunks])
+        return [result for response in responses for result in response]
+
+    async def close_position_async(self, position: Position, priority: Optional[RequestPriority] = None) -> dict:
+        """ Close current open position """
+        position_amount: float = float(position["positionAmt"])
+        if position_amount == 0:
+            raise ValueError(f"Trying to close position with positionAmt={position_amount}")
+
+        return await self._request("POST", "/fapi/v1/order", {
+            **self._create_order_kwargs(
+                symbol=position["symbol"],
+                type="MARKET",
+                side="SELL" if position_amount > 0 else "BUY",
+                position_side=position["positionSide"],
+                quantity=position_amount,
+            ),
+            **self.recvWindow
+        }, priority=priority)
+
+    async def close_position_from_websocket_message_async(self, trader_position: PositionUpdate) -> dict:
+        """ Closing position after websocket message """
+        symbol: str = trader_position.symbol
+        position_side: Literal["SHORT", "LONG", "BOTH"] = trader_position.position_side
+
+        position: Optional[Position] = self._position_cache(symbol, position_side)
+        if not position:
+            position: Position = self._find_position(
+                await self._request("GET", "/fapi/v2/positionRisk", {"symbol": symbol, **self.recvWindow}),
+                position_side=position_side
+            )
+
+        return await self.close_position_async(position=position)
+
+    async def cancel_order_async(self, symbol: str, order_id: int | str) -> dict:
+        """ Cancel order by id """
+        return await self._request("DELETE", "/fapi/v1/order", {
+            "symbol": symbol, "orderId": order_id, **self.recvWindow})
+
+    async def cancel_order_by_client_order_id_async(self, symbol: str, client_order_id: str) -> dict:
+        """ Cancel order by client order id """
+        return await self._request("DELETE", "/fapi/v1/order", {
+            "symbol": symbol, "origClientOrderId": client_order_id, **self.recvWindow})
+
+    async def cancel_all_open_orders_async(self, symbol: str, priority: Optional[RequestPriority] = None) -> dict:
+        """ Cancel all opened orders """
+        return await self._request("DELETE", "/fapi/v1/allOpenOrders", {"symbol": symbol, **self.recvWindow},
+                                   priority=priority)
+
+    async def renew_listen_key_async(self, listen_key: str) -> None:
+        """ Renews listen key """
+        return await self._request("PUT", "/fapi/v1/listenKey", {"listenKey": listen_key}, signed=False)
+
+    async def create_listen_key_async(self) -> str:
+        """ Creates listen key """
+        return (await self._request("POST", "/fapi/v1/listenKey", signed=False)).get("listenKey")
+
+    async def close_listen_key_async(self, listen_key: str) -> None:
+        """ Closes listen key for user data stream """
+        return await self._request("DELETE", "/fapi/v1/listenKey", {"listenKey": listen_key}, signed=False)
+
+    # ----------  blocking methods ---------- #
+
+    def get_current_balance(self) -> float:
+        """ Returns current user balance. """
+        return self._run(self.get_current_balance_async())
+
+    def get_all_open_positions(self, priority: Optional[RequestPriority] = None) -> list[dict]:
+        """ Returns list of opened positions """
+        return self._run(self.get_all_open_positions_async(priority=priority))
+
+    def get_all_open_orders(self, priority: Optional[RequestPriority] = None) -> list[dict]:
+        """ Returns list of opened orders """
+        return self._run(self.get_all_open_orders_async(priority=priority))
+
+    def get_order_history(self, symbol: str, start_time: Optional[int] = None,
+                          order_id: Optional[int] = None) -> list[Order]:
+        """ Returns orders of symbol created after start_time or with id >= order_id, closed ones too """
+        return self._run(self.get_order_history_async(symbol=symbol, start_time=start_time, order_id=order_id))
+
+    def get_trade_history(self, symbol: str, start_time: int) -> list[dict]:
+        """ Returns account trades of symbol after start_time """
+        return self._run(self.get_trade_history_async(symbol=symbol, start_time=start_time))
+
+    def get_income_history(self, start_time: int) -> list[dict]:
+        """ Returns income records (commissions, realized pnl, funding) of all symbols after start_time """
+        return self._run(self.get_income_history_async(start_time=start_time))
+
+    def copy_order(self, order: Order) -> dict:
+        """ Copy order from trader account """
+        return self._run(self.copy_order_async(order=order))
+
+    def copy_order_from_websocket_message(self, order: OrderUpdate) -> dict:
+        """ Copy order from trader websocket account message """
+        return self._run(self.copy_order_from_websocket_message_async(order=order))
+
+    def copy_orders(self, orders: list[Order]) -> list[dict]:
+        """ Copy several orders from trader account through /fapi/v1/batchOrders """
+        return self._run(self.copy_orders_async(orders=orders))
+
+    def cancel_orders(self, symbol: str, order_ids: list[int | str]) -> list[dict]:
+        """ Cancel several orders by id through /fapi/v1/batchOrders """
+        return self._run(self.cancel_orders_async(symbol=symbol, order_ids=order_ids))
+
+    def close_position(self, position: Position, priority: Optional[RequestPriority] = None) -> dict:
+        """ Close current open position """
+        return self._run(self.close_position_async(position=position, priority=priority))
+
+    def close_position_from_websocket_message(self, trader_position: PositionUpdate) -> dict:
+        """ Closing position after websocket message """
+        return self._run(self.close_position_from_websocket_message_async(trader_position=trader_position))
+
+    def cancel_order(self, symbol: str, order_id: int | str) -> dict:
+        """ Cancel order by id """
+        return self._run(self.cancel_order_async(symbol=symbol, order_id=order_id))
+
+    def cancel_order_by_client_order_id(self, symbol: str, client_order_id: str) -> dict:
+        """ Cancel order by client order id """
+        return self._run(self.cancel_order_by_client_order_id_async(symbol=symbol, client_order_id=client_order_id))
+
+    def cancel_all_open_orders(self, symbol: str, priority: Optional[RequestPriority] = None) -> dict:
+        """ Cancel all opened orders """
+        return self._run(self.cancel_all_open_orders_async(symbol=symbol, priority=priority))
+
+    def renew_listen_key(self, listen_key: str) -> None:
+        """ Renews listen key """
+        return self._run(self.renew_listen_key_async(listen_key=listen_key))
+
+    def create_listen_key(self) -> str:
+        """ Creates listen key """
+        return self._run(self.create_listen_key_async())
+
+    def close_listen_key(self, listen_key: str) -> None:
+        """ Closes listen key for user data stream """
+        return self._run(self.close_listen_key_async(listen_key=listen_key))
+
+    # ----------  transport ---------- #
+
+    async def _request(
+            self,
+            http_method: Literal["GET", "POST", "PUT", "DELETE"],
+            url_path: str,
+            payload: Optional[dict] = None,
+            signed: bool = True,
+            special: bool = False,
+            priority: Optional[RequestPriority] = None
+    ) -> Any:
+        """
+        Sends request to exchange through shared session and rate limiter.
+        Raises binance errors like UMFutures does.
+        """
+        await rate_limiter.acquire_async(self._api_key, http_method, url_path, priority)
+
+        payload: dict = binance.lib.utils.cleanNoneValue(payload or {})
+        if signed:
+            payload["timestamp"] = binance.lib.utils.get_timestamp()
+        query: str = binance.lib.utils.encoded_string(payload, special)
+        if signed:
+            signature: str = hmac.new(self._api_secret.encode(), query.encode(), hashlib.sha256).hexdigest()
+            query = f"{query}&signature={signature}"
+
+        url: URL = URL(f"{self.base_url}{url_path}?{query}" if query else f"{self.base_url}{url_path}", encoded=True)
+        started_at: float = time.perf_counter()
+        async with self._get_session().request(http_method, url, headers=self._headers) as response:
+            text: str = await response.text()
+            rest_latency.observe(time.perf_counter() - started_at, method=f"{http_method} {url_path}")
+            rate_limiter.update_from_headers(self._api_key, response.headers)
+            rate_limiter.on_error(response.status, response.headers)
+            self._handle_exception(response, text)
+
+        try:
+            return json.loads(text)
+        except ValueError:
+            return text
+
+    @staticmethod
+    def _handle_exception(response: aiohttp.ClientResponse, text: str) -> None:
+        """ Same errors as binance.api.API._handle_exception raises """
+        if response.status < 400:
+            return
+        if 400 <= response.status < 500:
+            try:
+                err: dict = json.loads(text)
+            except ValueError:
+                raise ClientError(response.status, None, text, response.headers)
+            raise ClientError(response.status, err["code"], err["msg"], response.headers)
+        raise ServerError(response.status, text)
+
+    def _run(self, coro: Coroutine) -> Any:
+        """ Runs coroutine in shared event loop and blocks caller thread until result. """
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop()).result()
+
+    @classmethod
+    def _get_loop(cls) -> asyncio.AbstractEventLoop:
+        """ Returns shared event loop, starts it in background thread on first call. """
+        with cls._lock:
+            if cls._loop is None:
+                cls._loop = asyncio.new_event_loop()
+                threading.Thread(target=cls._loop.run_forever, name="async-connector", daemon=True).start()
+        return cls._loop
+
+    @classmethod
+    def _get_session(cls) -> aiohttp.ClientSession:
+        """ Returns shared session, must be called inside shared event loop. """
+        if cls._session is None or cls._session.closed:
+            cls._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=config.CONNECTOR_POOL_SIZE,
+                    limit_per_host=config.CONNECTOR_POOL_SIZE_PER_HOST,
+                    keepalive_timeout=config.CONNECTOR_KEEPALIVE_TIMEOUT,
+                    ttl_dns_cache=300,
+                ),
+                timeout=aiohttp.ClientTimeout(total=config.CONNECTOR_REQUEST_TIMEOUT),
+                headers={"Content-Type": "application/json;charset=utf-8"},
+            )
+        return cls._session
@@ -0,0 +1,106 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from binance.websocket.um_futures.websocket_client import UMFuturesWebsocketClient
+
+from app.configuration import config, logger
+from app.utils.fast_json import loads
+from .account_book import BinanceAccountBook
+from ..abstract import AbstractClientStream, AbstractExchangeConnector, AbstractAccountBook
+
+
+class BinanceClientStream(AbstractClientStream):
+    """ Класс слушает user data stream клиента и ведет по нему книгу клиента """
+
+    def __init__(self, connector: AbstractExchangeConnector) -> None:
+        super().__init__(connector=connector)
+
+        self._is_running: bool = False
+
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=3)
+
+        self._ws: UMFuturesWebsocketClient | None = None
+
+        self._listen_key: str | None = None
+
+        self._book: BinanceAccountBook = BinanceAccountBook()
+
+    def start_stream(self) -> None:
+        """ Функция подключается к вебсокету клиента и заполняет книгу. """
+        if self._is_running:
+            return
+
+        self._is_running: bool = True
+
+        self._ws: UMFuturesWebsocketClient = UMFuturesWebsocketClient(
+            stream_url=config.BINANCE_WS_URL,
+            on_message=self._handle_message,
+            on_open=lambda *args: logger.info(f"Client websocket opened: {args}"),
+            on_close=lambda *args: logger.info(f"Client websocket closed: {args}"),
+            on_error=lambda *args: logger.error(f"Client websocket error: {args}"),
+        )
+        self._listen_key: str = self._connector.create_listen_key()
+        self._ws.user_data(listen_key=self._listen_key)
+
+        self._executor.submit(self._listen_key_renew_thread)
+        self._executor.submit(self._ping_thread)
+        self._executor.submit(self._seed_book_thread)
+
+    def stop_stream(self) -> None:
+        """ Функция останавливает вебсокет клиента. """
+        self._is_running: bool = False
+        try:
+            if self._listen_key:
+                self._connector.close_listen_key(listen_key=self._listen_key)
+        except Exception as e:
+            logger.error(f"Error while closing client listen key on stop stream: {e}")
+        self._listen_key = None
+        if self._ws:
+            self._ws.stop()
+
+    def is_alive(self) -> bool:
+        """ Функция возвращает True, если поток чтения вебсокета еще работает. """
+        return self._is_running and bool(self._ws) and self._ws.socket_manager.is_alive()
+
+    def get_client_book(self) -> AbstractAccountBook:
+        """ Функция возвращает книгу ордеров, позиций и баланса клиента. """
+        return self._book
+
+    def _handle_message(self, *args) -> None:
+        """ Функция обновляет книгу клиента сообщением с вебсокета. """
+        try:
+            self._book.handle_event(loads(args[1]))
+        except Exception as e:
+            logger.error(f"Exception while handling client websocket message({args=}): {e}")
+
+    def _seed_book_thread(self) -> None:
+        """ Function fills client book from REST once, retries until success """
+        while self._is_running and not self._book.is_ready():
+            try:
+                self._book.seed(self._connector)
+            except Exception as e:
+                logger.error(f"Error while seeding client book: {e}")
+                time.sleep(5)
+
+    def _ping_thread(self) -> None:
+        """ Function pings binance.com """
+        while self._is_running:
+            time.sleep(60)  # every 60 sec
+            try:
+                if self._is_running:
+                    if self._ws:
+                        self._ws.ping()
+            except Exception as e:
+                logger.error(f"Error while ping client websocket: {e}")
+
+    def _listen_key_renew_thread(self) -> None:
+        """ Function renews client listen key """
+        while self._is_running:
+            time.sleep(60 * 20)  # every 20 min
+            try:
+                if self._is_running:  # After w8ting time.sleep() flag can changed
+                    if self._listen_key:
+                        self._connector.renew_listen_key(listen_key=self._listen_key)
+                        logger.debug("Client listen key renewed")
+            except Exception as e:
+                logger.error(f"Error while renew client listen key: {e}")
@@ -0,0 +1,143 @@
+"""
+Module that decodes binance user data stream frames to typed events.
+Frames are parsed with loads of app.utils.fast_json.
+Events are not frozen, because frozen dataclass init is twice slower, but they must not be mutated:
+use dataclasses.replace to get changed copy.
+"""
+__all__ = ["OrderUpdate", "OrderTradeUpdateEvent", "PositionUpdate", "BalanceUpdate",
+           "AccountUpdateEvent", ]
+
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(slots=True)
+class OrderUpdate:
+    """ Order from ORDER_TRADE_UPDATE event ("o" field) """
+    symbol: str  # s
+    client_order_id: str  # c
+    side: str  # S
+    type: str  # o
+    orig_type: str  # ot
+    time_in_force: str  # f
+    quantity: float  # q
+    price: float  # p
+    avg_price: float  # ap
+    stop_price: float  # sp
+    execution_type: str  # x
+    status: str  # X
+    order_id: int  # i
+    last_filled_quantity: float  # l
+    filled_quantity: float  # z
+    trade_time: int  # T
+    reduce_only: bool  # R
+    close_position: bool  # cp
+    position_side: str  # ps
+    realized_profit: float  # rp
+    activation_price: Optional[float]  # AP, only with TRAILING_STOP_MARKET
+    callback_rate: Optional[float]  # cr, only with TRAILING_STOP_MARKET
+
+    @classmethod
+    def from_dict(cls, o: dict) -> "OrderUpdate":
+        return cls(
+            symbol=o["s"],
+            client_order_id=o["c"],
+            side=o["S"],
+            type=o["o"],
+            orig_type=o["ot"],
+            time_in_force=o["f"],
+            quantity=float(o["q"]),
+            price=float(o["p"]),
+            avg_price=float(o["ap"]),
+            stop_price=float(o["sp"]),
+            execution_type=o["x"],
+            status=o["X"],
+            order_id=o["i"],
+            last_filled_quantity=float(o["l"]),
+            filled_quantity=float(o["z"]),
+            trade_time=o["T"],
+            reduce_only=o.get("R", False),
+            close_position=o.get("cp", False),
+            position_side=o["ps"],
+            realized_profit=float(o.get("rp", 0)),
+            activation_price=float(o["AP"]) if "AP" in o else None,
+            callback_rate=float(o["cr"]) if "cr" in o else None,
+        )
+
+
+@dataclass(slots=True)
+class OrderTradeUpdateEvent:
+    event_time: int  # E
+    transaction_time: int  # T
+    order: OrderUpdate  # o
+
+    @classmethod
+    def from_dict(cls, msg: dict) -> "OrderTradeUpdateEvent":
+        return cls(event_time=msg["E"], transaction_time=msg["T"], order=OrderUpdate.from_dict(msg["o"]))
+
+
+@dataclass(slots=True)
+class PositionUpdate:
+    """ Position from ACCOUNT_UPDATE event ("a"."P" field) """
+    symbol: str  # s
+    position_amount: float  # pa
+    entry_price: float  # ep
+    breakeven_price: float  # bep
+    accumulated_realized: float  # cr
+    unrealized_profit: float  # up
+    margin_type: str  # mt
+    isolated_wallet: float  # iw
+    position_side: str  # ps
+
+    @classmethod
+    def from_dict(cls, p: dict) -> "PositionUpdate":
+        return cls(
+            symbol=p["s"],
+            position_amount=float(p["pa"]),
+            entry_price=float(p["ep"]),
+            breakeven_price=float(p.get("bep", 0)),
+            accumulated_realized=float(p.get("cr", 0)),
+            unrealized_profit=float(p["up"]),
+            margin_type=p["mt"],
+            isolated_wallet=float(p["iw"]),
+            position_side=p["ps"],
+        )
+
+
+@dataclass(slots=True)
+class BalanceUpdate:
+    """ Balance from ACCOUNT_UPDATE event ("a"."B" field) """
+    asset: str  # a
+    wallet_balance: float  # wb
+    cross_wallet_balance: float  # cw
+    balance_change: float  # bc
+
+    @classmethod
+    def from_dict(cls, b: dict) -> "BalanceUpdate":
+        return cls(
+            asset=b["a"],
+            wallet_balance=float(b["wb"]),
+            cross_wallet_balance=float(b["cw"]),
+            balance_change=float(b.get("bc", 0)),
+        )
+
+
+@dataclass(slots=True)
+class AccountUpdateEvent:
+    event_time: int  # E
+    transaction_time: int  # T
+    reason: str  # a.m
+    balances: tuple[BalanceUpdate, ...]  # a.B
+    positions: tuple[PositionUpdate, ...]  # a.P
+
+    @classmethod
+    def from_dict(cls, msg: dict) -> "AccountUpdateEvent":
+        data: dict = msg["a"]
+        return cls(
+            event_time=msg["E"],
+            transaction_time=msg["T"],
+            reason=data.get("m", ""),
+            balances=tuple(BalanceUpdate.from_dict(b) for b in data.get("B", ())),
+            positions=tuple(PositionUpdate.from_dict(p) for p in data.get("P", ())),
+        )
+
@@ -1,45 +1,96 @@
-from typing import Optional, Literal
+import time
+from typing import Any, Callable, Optional, Literal
 
+from binance.error import ClientError
 from binance.um_futures import UMFutures
 
-from app.schemas.types import Order, Position
+from app.configuration import config
+from app.metrics import rest_latency
+from app.schemas.enums import RequestPriority
+from app.schemas.types import Order, Position, RateLimitStatus
+from .events import OrderUpdate, PositionUpdate
 from .exchange_info import exchange_info
+from .rate_limiter import rate_limiter
 from ..abstract import AbstractExchangeConnector
 
 
 class BinanceConnector(AbstractExchangeConnector):
     recvWindow: dict = {"recvWindow": 20000}
 
+    MAX_BATCH_ORDERS: int = 5
+    MAX_BATCH_CANCEL: int = 10
+    HISTORY_LIMIT: int = 500  # max rows of allOrders page
+    INCOME_LIMIT: int = 1000  # max rows of income page
+
     def __init__(self, api_key: str, api_secret: str) -> None:
         super().__init__(api_key=api_key, api_secret=api_secret)
 
-        self._client: UMFutures = UMFutures(key=api_key, secret=api_secret)
+        self._client: UMFutures = UMFutures(
+            key=api_key, secret=api_secret, base_url=config.BINANCE_REST_URL, show_limit_usage=True)
 
     def cancel_order(self, symbol: str, order_id: int | str) -> dict:
         """ Cancel order by id """
-        return self._client.cancel_order(symbol=symbol, orderId=order_id)  # noqa
+        return self._call("DELETE", "/fapi/v1/order", self._client.cancel_order,
+                          symbol=symbol, orderId=order_id, **self.recvWindow)
 
     def get_current_balance(self) -> float:
         """ Returns current user balance. """
-        for asset in self._client.balance(**self.recvWindow):  # noqa
+        for asset in self._call("GET", "/fapi/v2/balance", self._client.balance, **self.recvWindow):
             if asset["asset"] == "USDT":
                 return float(asset["balance"])
 
-    def get_all_open_positions(self) -> list[dict]:
+    def get_all_open_positions(self, priority: Optional[RequestPriority] = None) -> list[dict]:
         """ Returns list of opened positions """
         result: list[Position] = []
-        for p in self._client.get_position_risk(**self.recvWindow):  # noqa
+        for p in self._call("GET", "/fapi/v2/positionRisk", self._client.get_position_risk, priority=priority,
+                            **self.recvWindow):
             if float(p["positionAmt"]) != 0:
                 result.append(p)
         return result
 
-    def get_all_open_orders(self) -> list[dict]:
+    def get_all_open_orders(self, priority: Optional[RequestPriority] = None) -> list[dict]:
         """ Returns list of opened orders """
-        return self._client.get_orders(**self.recvWindow)  # noqa
+        return self._call("GET", "/fapi/v1/openOrders", self._client.get_orders, priority=priority, **self.recvWindow)
+
+    def get_order_history(self, symbol: str, start_time: Optional[int] = None,
+                          order_id: Optional[int] = None) -> list[Order]:
+        """ Returns orders of symbol created after start_time or with id >= order_id, closed ones too """
+        orders: list[Order] = []
+        while True:
+            page: list[Order] = self._call(
+                "GET", "/fapi/v1/allOrders", self._client.get_all_orders, symbol=symbol,
+                startTime=start_time if order_id is None else None, orderId=order_id, limit=self.HISTORY_LIMIT,
+                **self.recvWindow)
+            orders.extend(page)
+            if len(page) < self.HISTORY_LIMIT:
+                return orders
+            order_id = page[-1]["orderId"] + 1
+
+    def get_trade_history(self, symbol: str, start_time: int) -> list[dict]:
+        """ Returns account trades of symbol after start_time """
+        return self._call("GET", "/fapi/v1/userTrades", self._client.get_account_trades, symbol=symbol,
+                          startTime=start_time, **self.recvWindow)
+
+    def get_income_history(self, start_time: int) -> list[dict]:
+        """ Returns income records (commissions, realized pnl, funding) of all symbols after start_time """
+        records: dict[tuple[int, str], dict] = {}
+        while True:
+            page: list[dict] = self._call("GET", "/fapi/v1/income", self._client.get_income_history,
+                                          startTime=start_time, limit=self.INCOME_LIMIT, **self.recvWindow)
+            records.update(((r["tranId"], r["incomeType"]), r) for r in page)
+            # Page is requested from time of its last record, records of this time are deduplicated
+            if len(page) < self.INCOME_LIMIT or page[-1]["time"] == start_time:
+                return list(records.values())
+            start_time = page[-1]["time"]
+
+    def get_rate_limit_status(self) -> RateLimitStatus:
+        """ Returns current usage of binance request limits """
+        return rate_limiter.get_status(self._api_key)
 
     def copy_order(self, order: Order) -> dict:
         """ Copy order from trader account """
-        return self._client.new_order(
+        return self._call(
+            "POST", "/fapi/v1/order", self._client.new_order,
             **self._create_order_kwargs(
                 symbol=order["symbol"],
                 type=order["type"],
@@ -49,21 +100,45 @@ class BinanceConnector(AbstractExchangeConnector):
                 time_in_force=order["timeInForce"],
                 close_position=order["closePosition"],
                 position_side=order["positionSide"],
-                price=float(order["price"]),
-                stop_price=float(order["stopPrice"]),
+                price=order["price"],
+                stop_price=order["stopPrice"],
                 callback_rate=float(order.get("priceRate", 0.0)),
-                activation_price=float(order.get("activatePrice", 0.0))
+                activation_price=order.get("activatePrice", 0.0)
             ),
             **self.recvWindow
         )
 
-    def close_position(self, position: Position) -> dict:
+    def copy_orders(self, orders: list[Order]) -> list[dict]:
+        """ Copy several orders from trader account through /fapi/v1/batchOrders """
+        results: list[dict] = []
+        for i in range(0, len(orders), self.MAX_BATCH_ORDERS):
+            results += self._call(
+                "POST", "/fapi/v1/batchOrders", self._client.new_batch_order,
+                batchOrders=[self._create_batch_order_kwargs(o) for o in orders[i:i + self.MAX_BATCH_ORDERS]]
+            )
+        return results
+
+    def cancel_orders(self, symbol: str, order_ids: list[int | str]) -> list[dict]:
+        """ Cancel several orders by id through /fapi/v1/batchOrders """
+        results: list[dict] = []
+        for i in range(0, len(order_ids), self.MAX_BATCH_CANCEL):
+            results += self._call(
+                "DELETE", "/fapi/v1/batchOrders", self._client.cancel_batch_order,
+                symbol=symbol,
+                orderIdList=[int(order_id) for order_id in order_ids[i:i + self.MAX_BATCH_CANCEL]],
+                origClientOrderIdList=None,
+                **self.recvWindow
+            )
+        return results
+
+    def close_position(self, position: Position, priority: Optional[RequestPriority] = None) -> dict:
         """ Close current open position """
         position_amount: float = float(position["positionAmt"])
         if position_amount == 0:
             raise ValueError(f"Trying to close position with positionAmt={position_amount}")
 
-        return self._client.new_order(
+        return self._call(
+            "POST", "/fapi/v1/order", self._client.new_order, priority=priority,
             **self._create_order_kwargs(
                 symbol=position["symbol"],
                 type="MARKET",
@@ -74,16 +149,19 @@ class BinanceConnector(AbstractExchangeConnector):
             **self.recvWindow
         )
 
-    def cancel_all_open_orders(self, symbol: str) -> dict:
+    def cancel_all_open_orders(self, symbol: str, priority: Optional[RequestPriority] = None) -> dict:
         """ Cancel all opened orders """
-        return self._client.cancel_open_orders(symbol=symbol, **self.recvWindow)  # noqa
+        return self._call("DELETE", "/fapi/v1/allOpenOrders", self._client.cancel_open_orders, priority=priority,
+                          symbol=symbol, **self.recvWindow)
 
     def cancel_order_by_client_order_id(self, symbol: str, client_order_id: str) -> dict:
         """ Cancel order by client order id """
-        return self._client.cancel_order(symbol=symbol, origClientOrderId=client_order_id, **self.recvWindow)  # noqa
+        return self._call(
+            "DELETE", "/fapi/v1/order", self._client.cancel_order,
+            symbol=symbol, origClientOrderId=client_order_id, **self.recvWindow)
 
-    def close_position_from_websocket_message(self, trader_position: dict) -> dict:
-        """ Closing position after websocket message
+    def close_position_from_websocket_message(self, trader_position: PositionUpdate) -> dict:
+        """ Closing position after websocket message, position is decoded from ACCOUNT_UPDATE position
          {'bep': '0.150465195',
           'cr': '-0.06420997',
           'ep': '0.15039',
@@ -96,22 +174,29 @@ class BinanceConnector(AbstractExchangeConnector):
           'up': '-0.00113000'}
         """
         # position = trader position
-        symbol: str = trader_position["s"]
-        position_side: Literal["SHORT", "LONG"] = trader_position["ps"]
-
-        if position_side in ["LONG", "BOTH"]:
-            index: int = 0
-        elif position_side == "SHORT":
-            index: int = 1
-        else:
-            raise ValueError(f"Wrong position side: {position_side}")
+        symbol: str = trader_position.symbol
+        position_side: Literal["SHORT", "LONG", "BOTH"] = trader_position.position_side
 
-        position: Position = self._client.get_position_risk(symbol=symbol, **self.recvWindow)[index]  # noqa
+        position: Optional[Position] = self._position_cache(symbol, position_side)
+        if not position:
+            position: Position = self._find_position(
+                self._call("GET", "/fapi/v2/positionRisk", self._client.get_position_risk,
+                           symbol=symbol, **self.recvWindow),
+                position_side=position_side
+            )
 
         return self.close_position(position=position)
 
-    def copy_order_from_websocket_message(self, order: dict) -> dict:
-        """ Copy order from trader websocket account message
+    @staticmethod
+    def _find_position(positions: list[Position], position_side: str) -> Position:
+        """ Finds position by side in positionRisk response, in one-way mode there is only BOTH position """
+        for position in positions:
+            if position["positionSide"] == position_side:
+                return position
+        raise ValueError(f"Position with side {position_side} not found: {positions}")
+
+    def copy_order_from_websocket_message(self, order: OrderUpdate) -> dict:
+        """ Copy order from trader websocket account message, order is decoded from ORDER_TRADE_UPDATE "o" field
         {
             "s":"BTCUSDT",			         // Symbol
             "c":"TEST",				           // Client Order Id
@@ -155,32 +240,73 @@ class BinanceConnector(AbstractExchangeConnector):
             "gtd":0                      // TIF GTD order auto cancel time
           }
         """
-        return self._client.new_order(
+        return self._call(
+            "POST", "/fapi/v1/order", self._client.new_order,
             **self._create_order_kwargs(
-                symbol=order["s"],
-                type=order["ot"],
-                client_order_id=str(order["i"]),
-                side=order["S"],
-                position_side=order["ps"],
-                price=float(order["p"]),
-                quantity=float(order["q"]),
-                stop_price=float(order["sp"]),
-                close_position=order.get("cp", False),
+                symbol=order.symbol,
+                type=order.orig_type,
+                client_order_id=str(order.order_id),
+                side=order.side,
+                position_side=order.position_side,
+                price=order.price,
+                quantity=order.quantity,
+                stop_price=order.stop_price,
+                close_position=order.close_position,
             ),
             **self.recvWindow
         )
 
     def renew_listen_key(self, listen_key: str) -> None:
         """ Renews listen key """
-        return self._client.renew_listen_key(listenKey=listen_key)  # noqa
+        return self._call("PUT", "/fapi/v1/listenKey", self._client.renew_listen_key, listenKey=listen_key)
 
     def create_listen_key(self) -> str:
         """ Creates listen key """
-        return self._client.new_listen_key().get("listenKey")  # noqa
+        return self._call("POST", "/fapi/v1/listenKey", self._client.new_listen_key).get("listenKey")
 
     def close_listen_key(self, listen_key: str) -> None:
         """ Closes listen key for user data stream """
-        return self._client.close_listen_key(listenKey=listen_key)  # noqa
+        return self._call("DELETE", "/fapi/v1/listenKey", self._client.close_listen_key, listenKey=listen_key)
+
+    def _call(self, http_method: str, url_path: str, method: Callable[..., dict],
+              priority: Optional[RequestPriority] = None, **kwargs) -> Any:
+        """
+        Calls UMFutures method through rate limiter.
+        :param http_method: Http method of endpoint, used to find its weight
+        :param url_path: Url path of endpoint, used to find its weight
+        :param method: UMFutures method
+        :param priority: Priority in rate limiter, by default it depends on http method
+        :return: Response data
+        """
+        rate_limiter.acquire(self._api_key, http_method, url_path, priority)
+        started_at: float = time.perf_counter()
+        try:
+            response: dict = method(**kwargs)
+        except ClientError as e:
+            rate_limiter.update_from_headers(self._api_key, e.header or {})
+            rate_limiter.on_error(e.status_code, e.header or {})
+            raise
+        finally:
+            rest_latency.observe(time.perf_counter() - started_at, method=f"{http_method} {url_path}")
+        rate_limiter.update_from_headers(self._api_key, response["limit_usage"])
+        return response["data"]
+
+    def _create_batch_order_kwargs(self, order: Order) -> dict:
+        """ Order params for batch request, all values in batch have to be strings """
+        return {k: str(v) for k, v in self._create_order_kwargs(
+            symbol=order["symbol"],
+            type=order["type"],
+            side=order["side"],
+            quantity=order["origQty"],
+            client_order_id=order["orderId"],
+            time_in_force=order["timeInForce"],
+            close_position=order["closePosition"],
+            position_side=order["positionSide"],
+            price=order["price"],
+            stop_price=order["stopPrice"],
+            callback_rate=float(order.get("priceRate", 0.0)),
+            activation_price=order.get("activatePrice", 0.0)
+        ).items() if v is not None}
 
     def _create_order_kwargs(
             self,
@@ -188,15 +314,16 @@ class BinanceConnector(AbstractExchangeConnector):
             type: str,  # noqa
             side: str,
             position_side: str,
-            quantity: Optional[float] = 0,
+            quantity: Optional[float | str] = 0,
             close_position: Optional[bool] = False,
-            price: Optional[float] = 0,
-            stop_price: Optional[float] = 0,
+            price: Optional[float | str] = 0,
+            stop_price: Optional[float | str] = 0,
             time_in_force: Optional[str] = "GTC",
             callback_rate: Optional[float] = 0.0,
             client_order_id: Optional[str] = None,
-            activation_price: Optional[float] = 0.0
+            activation_price: Optional[float | str] = 0.0
     ) -> dict:
+        """ Float values are rounded here, str values are already formatted by ExchangeInfo.round_orders """
         kwargs = {
             'symbol': symbol,
             'type': type,
@@ -208,12 +335,12 @@ class BinanceConnector(AbstractExchangeConnector):
             kwargs['newClientOrderId'] = client_order_id
 
         # Here will be one place where price and qty rounds
-        if quantity:
-            quantity = abs(exchange_info.round_quantity(symbol, quantity))
-        if price:
-            price = exchange_info.round_price(symbol, price)
-        if stop_price:
-            stop_price = exchange_info.round_price(symbol, stop_price)
+        if quantity and not isinstance(quantity, str):
+            quantity = exchange_info.format_quantity(symbol, abs(quantity))
+        if price and not isinstance(price, str):
+            price = exchange_info.format_price(symbol, price)
+        if stop_price and not isinstance(stop_price, str):
+            stop_price = exchange_info.format_price(symbol, stop_price)
 
         if type == "MARKET":
             kwargs['quantity'] = str(quantity)
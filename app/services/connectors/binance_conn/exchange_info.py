@@ -3,50 +3,61 @@ Module that rounds prices and quantities for symbols
 """
 __all__ = ["exchange_info", ]
 
-import re
+import json
+import os
 import time
+from typing import Optional
 
 import requests
 
-from app.configuration import logger
+from app.configuration import config, logger
+from app.schemas.types import Order
+from .quantizer import SymbolQuantizer
 from ..abstract import AbstractExchangeInfo
 
 
 class ExchangeInfo(AbstractExchangeInfo):
-    precisions: dict[str: list[int, int]] = {}
+    """
+    Точности монет загружаются синхронно из снапшота на диске при создании объекта,
+    после чего фоновый поток обновляет их с биржи и перезаписывает снапшот.
+    Для каждой монеты один раз на обновление строится SymbolQuantizer.
+    """
 
-    @classmethod
-    def run(cls) -> None:
+    quantizers: dict[str, SymbolQuantizer] = {}
+
+    # Order fields, which are snapped in round_orders
+    ORDER_PRICE_FIELDS: tuple[str, ...] = ("price", "stopPrice", "activatePrice")
+
+    # Filters, which are kept in snapshot
+    SNAPSHOT_FILTERS: tuple[str, ...] = ("PRICE_FILTER", "LOT_SIZE", "MARKET_LOT_SIZE")
+
+    def __init__(self, snapshot_path: str = f"{config.paths.EXCHANGE_INFO_FOLDER_PATH}/binance.json") -> None:
+        super().__init__()
+
+        self._snapshot_path: str = snapshot_path
+        self._load_snapshot()
+
+    def run(self) -> None:
         while True:
             try:
-                response: requests.Response = requests.get(url="https://fapi.binance.com/fapi/v1/exchangeInfo")
+                response: requests.Response = requests.get(url=f"{config.BINANCE_REST_URL}/fapi/v1/exchangeInfo")
                 exchange_info_dict: dict = response.json()
-                for i in exchange_info_dict['symbols']:
-                    filters = i['filters']
-                    tick_size, step_size = None, None
-                    for f in filters:
-                        if f['filterType'] == 'PRICE_FILTER':
-                            tick_size = f['tickSize']
-                            tick_size = list(re.sub('0+$', '', tick_size))
-                            if len(tick_size) == 1:
-                                tick_size = 1
-                            else:
-                                tick_size = len(tick_size) - 2
-                        if f['filterType'] == 'MARKET_LOT_SIZE':
-                            step_size = f['stepSize']
-                            step_size = list(re.sub('0+$', '', step_size))
-                            if len(step_size) == 1:
-                                step_size = 0
-                            else:
-                                step_size = len(step_size) - 2
-                        cls.precisions[i['symbol'].upper()] = {
-                            "price": tick_size,
-                            "quantity": step_size
-                        }
-
+                filters: dict[str, dict[str, dict]] = {
+                    i['symbol'].upper(): {f['filterType']: f for f in i['filters']
+                                          if f['filterType'] in self.SNAPSHOT_FILTERS}
+                    for i in exchange_info_dict['symbols']
+                }
+                self._apply_filters(filters)
+                self._save_snapshot(filters)
             except Exception as e:
                 logger.error(f"Preisions error: {e}")
-            time.sleep(60 * 60)
+            time.sleep(config.EXCHANGE_INFO_UPDATE_INTERVAL)
+
+    @classmethod
+    def get_quantizer(cls, symbol: str) -> Optional[SymbolQuantizer]:
+        """ Returns quantizer of symbol, None if symbol is unknown """
+        quantizer: Optional[SymbolQuantizer] = cls.quantizers.get(symbol)
+        return quantizer if quantizer else cls.quantizers.get(symbol.upper())
 
     @classmethod
     def round_price(cls, symbol: str, price: float) -> float:
@@ -56,10 +67,11 @@ class ExchangeInfo(AbstractExchangeInfo):
         :param price:
         :return:
         """
-        try:
-            return round(price, cls.precisions[symbol.upper()]["price"])
-        except KeyError as e:
-            logger.error(f"KeyError while rounding price {symbol}: {e}")
+        quantizer: Optional[SymbolQuantizer] = cls.get_quantizer(symbol)
+        if not quantizer:
+            logger.error(f"Unknown symbol while rounding price {symbol}")
+            return price
+        return quantizer.round_price(price)
 
     @classmethod
     def round_quantity(cls, symbol: str, quantity: float) -> float:
@@ -69,11 +81,96 @@ class ExchangeInfo(AbstractExchangeInfo):
         :param quantity:
         :return:
         """
-        try:
-            return round(quantity, cls.precisions[symbol.upper()]["quantity"])
-        except KeyError as e:
-            logger.error(f"KeyError while rounding quantity {symbol}: {e}")
+        quantizer: Optional[SymbolQuantizer] = cls.get_quantizer(symbol)
+        if not quantizer:
+            logger.error(f"Unknown symbol while rounding quantity {symbol}")
             return quantity
+        return quantizer.round_quantity(quantity)
+
+    @classmethod
+    def format_price(cls, symbol: str, price: float) -> str:
+        """ Rounds price and formats it as exchange expects in requests """
+        quantizer: Optional[SymbolQuantizer] = cls.get_quantizer(symbol)
+        if not quantizer:
+            logger.error(f"Unknown symbol while formatting price {symbol}")
+            return str(price)
+        return quantizer.format_price(price)
+
+    @classmethod
+    def format_quantity(cls, symbol: str, quantity: float) -> str:
+        """ Rounds quantity and formats it as exchange expects in requests """
+        quantizer: Optional[SymbolQuantizer] = cls.get_quantizer(symbol)
+        if not quantizer:
+            logger.error(f"Unknown symbol while formatting quantity {symbol}")
+            return str(quantity)
+        return quantizer.format_quantity(quantity)
+
+    @classmethod
+    def round_orders(cls, orders: list[Order]) -> list[Order]:
+        """
+        Returns copies of orders with origQty and prices snapped and formatted as strings.
+        Quantizer is taken once per symbol, values of one symbol are formatted in one batch.
+        """
+        by_symbol: dict[str, list[int]] = {}
+        for i, o in enumerate(orders):
+            by_symbol.setdefault(o["symbol"], []).append(i)
+
+        result: list[Order] = [dict(o) for o in orders]
+        for symbol, indexes in by_symbol.items():
+            quantizer: Optional[SymbolQuantizer] = cls.get_quantizer(symbol)
+            if not quantizer:
+                logger.error(f"Unknown symbol while rounding orders {symbol}")
+                continue
+
+            quantities: list[str] = quantizer.format_quantities(abs(float(result[i]["origQty"])) for i in indexes)
+            for i, quantity in zip(indexes, quantities):
+                result[i]["origQty"] = quantity
+            for field in cls.ORDER_PRICE_FIELDS:
+                with_field: list[int] = [i for i in indexes if float(result[i].get(field) or 0)]
+                prices: list[str] = quantizer.format_prices(float(result[i][field]) for i in with_field)
+                for i, price in zip(with_field, prices):
+                    result[i][field] = price
+        return result
+
+    def _apply_filters(self, filters: dict[str, dict[str, dict]]) -> None:
+        """ Builds new quantizers table from symbols filters and swaps it with current one """
+        quantizers: dict[str, SymbolQuantizer] = {}
+        for symbol, symbol_filters in filters.items():
+            try:
+                lot_size: dict = symbol_filters.get("MARKET_LOT_SIZE") or symbol_filters["LOT_SIZE"]
+                quantizers[symbol] = SymbolQuantizer.from_filters(
+                    tick_size=symbol_filters["PRICE_FILTER"]["tickSize"],
+                    step_size=lot_size["stepSize"]
+                )
+            except (KeyError, ArithmeticError) as e:
+                logger.debug(f"Can not build quantizer for {symbol}: {e}")
+
+        ExchangeInfo.quantizers = quantizers  # one assignment, readers see either old or new table
+        self._ready.set()
+
+    def _load_snapshot(self) -> None:
+        """ Loads symbols filters from snapshot file, if it exists """
+        try:
+            with open(self._snapshot_path, "r") as file:
+                snapshot: dict = json.load(file)
+            self._apply_filters(snapshot["symbols"])
+            logger.debug(f"Exchange info snapshot loaded: {len(snapshot['symbols'])} symbols, "
+                         f"updated at {snapshot['updated_at']}")
+        except FileNotFoundError:
+            logger.info(f"Exchange info snapshot {self._snapshot_path} not found, waiting for exchange")
+        except Exception as e:
+            logger.error(f"Error while loading exchange info snapshot: {e}")
+
+    def _save_snapshot(self, filters: dict[str, dict[str, dict]]) -> None:
+        """ Writes symbols filters to temporary file and replaces snapshot with it """
+        try:
+            os.makedirs(os.path.dirname(self._snapshot_path) or ".", exist_ok=True)
+            tmp_path: str = f"{self._snapshot_path}.tmp"
+            with open(tmp_path, "w") as file:
+                json.dump({"updated_at": int(time.time()), "symbols": filters}, file)
+            os.replace(tmp_path, self._snapshot_path)
+        except Exception as e:
+            logger.error(f"Error while saving exchange info snapshot: {e}")
 
 
 exchange_info = ExchangeInfo()
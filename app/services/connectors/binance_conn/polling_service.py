@@ -1,11 +1,17 @@
+import threading
+from concurrent.futures import Future, wait
 from typing import Callable, Literal, Optional
 
-from app.configuration import logger
-from app.schemas.enums import Exchange
+from binance.error import ClientError
+
+from app.configuration import logger, config
+from app.schemas.enums import ReconciliationActionKind
 from app.schemas.models import UserSettings
 from app.schemas.types import Position, Order
-from app.utils import find_trader_unique_orders, find_client_unique_orders, find_unique_positions
-from ..abstract import AbstractPollingService, AbstractExchangeConnector
+from .exchange_info import exchange_info
+from .reconciliation import ReconciliationAction, ReconciliationPlan, fingerprint_symbols, reconcile
+from ..abstract import AbstractPollingService, AbstractExchangeConnector, AbstractAccountBook, PollingState, \
+    inflight_actions
 
 
 class BinancePollingService(AbstractPollingService):
@@ -18,70 +24,92 @@ class BinancePollingService(AbstractPollingService):
             cls,
             connector_factory: Callable[[Literal["trader", "client"]], Optional[AbstractExchangeConnector]],
             user_settings: UserSettings,
+            trader_book: Optional[AbstractAccountBook] = None,
+            client_book: Optional[AbstractAccountBook] = None,
+            state: Optional[PollingState] = None
     ) -> None:
-        """ Проверка ордеров и позиций, выставление их и тд """
+        """ Проверка ордеров и позиций, выставление их и тд.
+        Если переданы книги трейдера или клиента, состояние аккаунта берется из них, а не через REST.
+        Если передано состояние сервиса, сверяются только изменившиеся символы, а неудавшиеся действия
+        не повторяются до истечения задержки в negative cache.
+        """
 
         client_connector: AbstractExchangeConnector = connector_factory("client")
         trader_connector: AbstractExchangeConnector = connector_factory("trader")
 
         # find positions and order for both accounts
-        client_positions, trader_positions = cls._positions_finder(
-            client_connector=client_connector, trader_connector=trader_connector)
-        client_orders, trader_orders = cls._orders_finder(
-            client_connector=client_connector, trader_connector=trader_connector)
-
-        # if client_positions:
-        #     logger.debug(f"{client_positions=}")
-        # if trader_positions:
-        #     logger.debug(f"{trader_positions=}")
-        # if client_orders:
-        #     logger.debug(f"{client_orders=}")
-        # if trader_orders:
-        #     logger.debug(f"{trader_orders=}")
-
-        # find unique orders and posiitons
-        client_unique_positions, trader_unique_positions = cls._unique_positions_finder(
+        client_positions, trader_positions, client_orders, trader_orders = cls._snapshots_finder(
+            client_connector=client_connector, trader_connector=trader_connector,
+            trader_book=trader_book, client_book=client_book)
+
+        # only symbols, which changed since previous cycle or have failed actions to retry, are reconciled
+        fingerprints: dict[str, int] = {}
+        symbols: Optional[set[str]] = None
+        if state is not None:
+            fingerprints = fingerprint_symbols(trader_positions, client_positions, trader_orders, client_orders)
+            symbols = state.dirty_symbols(fingerprints, user_settings.multiplier)
+            if not symbols:
+                return
+
+        # build one plan of closes, cancels and copies by indexes of both accounts
+        plan: ReconciliationPlan = reconcile(
+            trader_positions=trader_positions,
             client_positions=client_positions,
-            trader_positions=trader_positions)
-        client_unique_orders, trader_unique_orders = cls._unique_orders_finder(
+            trader_orders=trader_orders,
             client_orders=client_orders,
-            trader_orders=trader_orders)
+            multiplier=user_settings.multiplier,
+            symbols=symbols)
+
+        for a in plan.skipped:
+            logger.debug(f"Trader order is not copied ({a.reason.value}): {a.target}")
 
-        if client_unique_positions:
-            logger.debug(f"{client_unique_positions=}")
-        if trader_unique_positions:
-            logger.debug(f"{trader_unique_positions=}")
-        if client_unique_orders:
-            logger.debug(f"{client_unique_orders=}")
-        if trader_unique_orders:
-            logger.debug(f"{trader_unique_orders=}")
+        if state is not None:
+            state.negative_cache.retain(symbols, {a.key for a in plan})
+            plan.close_positions = cls._not_suppressed(state, plan.close_positions)
+            plan.cancel_orders = cls._not_suppressed(state, plan.cancel_orders)
+            plan.copy_orders = cls._not_suppressed(state, plan.copy_orders)
+
+        # actions, which trader websocket is doing or did recently, are skipped
+        account: str = client_connector.account_id
+        deduplicated: set[str] = set()
+        plan.close_positions = cls._begin_actions(account, plan.close_positions, deduplicated)
+        plan.cancel_orders = cls._begin_actions(account, plan.cancel_orders, deduplicated)
+        plan.copy_orders = cls._begin_actions(account, plan.copy_orders, deduplicated)
 
         # close client unique orders and positions
-        cls._close_client_unique_positions(
+        results: list[dict | Exception] = cls._close_client_unique_positions(
             client_connector=client_connector,
-            client_unique_positions=client_unique_positions)
-        cls._close_client_unique_orders(
+            client_unique_positions=[a.target for a in plan.close_positions])
+        results += cls._close_client_unique_orders(
             client_connector=client_connector,
-            client_unique_orders=client_unique_orders)
+            client_unique_orders=[a.target for a in plan.cancel_orders])
 
         # copy unique trader orders
-        cls._copy_trader_orders(
+        results += cls._copy_trader_orders(
             client_connector=client_connector,
-            trader_unique_orders=trader_unique_orders,
-            trader_positions=trader_positions,
-            client_positions=client_positions,
-            user_settings=user_settings
-        )
+            orders_to_copy=[a.target for a in plan.copy_orders])
+
+        # symbols with executed or deduplicated actions are checked again in next cycle
+        executed: set[str] = deduplicated
+        for a, result in zip(plan.close_positions + plan.cancel_orders + plan.copy_orders, results):
+            failed: bool = isinstance(result, Exception)
+            inflight_actions.complete(account, cls._inflight_key(a), success=not failed)
+            if state is None:
+                continue
+            if failed:
+                state.negative_cache.add(a.key, *cls._error_reason(result))
+            else:
+                state.negative_cache.discard(a.key)
+                executed.add(a.symbol)
+        if state is not None:
+            state.commit(fingerprints, symbols, executed)
 
     @classmethod
     def _copy_trader_orders(
             cls,
             client_connector: AbstractExchangeConnector,
-            trader_unique_orders: list[Order],
-            trader_positions: list[Position],
-            client_positions: list[Position],
-            user_settings: UserSettings
-    ) -> None:
+            orders_to_copy: list[Order]
+    ) -> list[dict | Exception]:
         """ Copy trader orders to client account
 
         По сути есть три правила у программы 2:
@@ -89,120 +117,213 @@ class BinancePollingService(AbstractPollingService):
         - Не выставлять ничего если у клиента нет позиций, а у трейдера есть.
         - Если у клиента есть позиция а у трейдера нет - закрыть позицию клиента.
         - Если трейдер без позиции, но выставлена лимитка - выставить лимитку у клиента
+        Ордера уже отобраны по этим правилам в reconcile, количество умножено на multiplier.
+        Возвращает результат или ошибку для каждого ордера в том же порядке.
         """
-        trader_positions_t: list[tuple] = [(p["symbol"], p["positionSide"]) for p in trader_positions]
-        client_positions_t: list[tuple] = [(p["symbol"], p["positionSide"]) for p in client_positions]
+        for o in orders_to_copy:
+            logger.debug(f"Place order: {o}")
 
-        for o in trader_unique_orders:
-            try:
-                order_t: tuple = (o["symbol"], o["positionSide"])
-
-                # Имеют одинаковые позиции, ордер нужно открыть
-                if order_t in trader_positions_t and order_t in client_positions_t:
-                    o["origQty"] = float(o["origQty"]) * user_settings.multiplier
-                    logger.debug(f"Both accounts in positions, place order: {o}")
-                    result: dict = client_connector.copy_order(order=o)
-                    logger.info(f"Order copied: {result}")
-                    continue
-
-                # Позиция есть у трейдера, но нет у клиента
-                if order_t in trader_positions_t and order_t not in client_positions_t:
-                    logger.debug(f"Client has no position on {order_t} so order do not need to be opened: {o}")
-                    continue
-
-                # У обоих нет позиции, ордер нужно открыть
-                if order_t not in trader_positions_t and order_t not in client_positions_t:
-                    o["origQty"] = float(o["origQty"]) * user_settings.multiplier
-                    logger.debug(f"Both accounts not in positions, place order: {o}")
-                    result: dict = client_connector.copy_order(order=o)
-                    logger.info(f"Order copied: {result}")
-                    continue
+        # Round all orders of cycle at once, quantizer is taken one time per symbol, connector sends them as is
+        orders_to_copy = exchange_info.round_orders(orders_to_copy)
 
+        results: list[dict | Exception] = []
+        if len(orders_to_copy) > 1:
+            chunks: list[list[Order]] = cls._chunks(orders_to_copy, client_connector.MAX_BATCH_ORDERS)
+            futures: list[Future] = cls._fan_out(client_connector, [("copy_orders", dict(orders=c)) for c in chunks])
+            for chunk, f in zip(chunks, futures):
+                for o, result in cls._batch_results(chunk, f):
+                    if isinstance(result, Exception):
+                        logger.error(f"Error while copying trader unique order({o}): {result}")
+                    else:
+                        logger.info(f"Order copied: {result}")
+                    results.append(result)
+            return results
+
+        futures: list[Future] = cls._fan_out(client_connector, [("copy_order", dict(order=o)) for o in orders_to_copy])
+        for o, f in zip(orders_to_copy, futures):
+            try:
+                results.append(f.result())
+                logger.info(f"Order copied: {results[-1]}")
             except Exception as e:
                 logger.error(f"Error while copying trader unique order({o}): {e}")
+                results.append(e)
+        return results
 
     @classmethod
     def _close_client_unique_positions(
             cls,
             client_connector: AbstractExchangeConnector,
             client_unique_positions: list[Position]
-    ) -> None:
-        """ Close client unique positions """
+    ) -> list[dict | Exception]:
+        """ Close client unique positions, returns result or error for every position """
         for p in client_unique_positions:
+            logger.debug(f"Close unique client position: {p}")
+
+        results: list[dict | Exception] = []
+        futures: list[Future] = cls._fan_out(
+            client_connector, [("close_position", dict(position=p)) for p in client_unique_positions])
+        for p, f in zip(client_unique_positions, futures):
             try:
-                logger.debug(f"Close unique client position: {p}")
-                result: dict = client_connector.close_position(position=p)
-                logger.info(f"Unique position closed: {result}")
+                results.append(f.result())
+                logger.info(f"Unique position closed: {results[-1]}")
             except Exception as e:
                 logger.error(f"Error while closing client unique position({p}): {e}")
+                results.append(e)
+        return results
 
     @classmethod
     def _close_client_unique_orders(
             cls,
             client_connector: AbstractExchangeConnector,
             client_unique_orders: list[Order]
-    ) -> None:
-        """ Close client unique orders """
+    ) -> list[dict | Exception]:
+        """ Close client unique orders, returns result or error for every order in the same order """
         for o in client_unique_orders:
+            logger.debug(f"Close unique client order: {o}")
+
+        results: list[dict | Exception] = [None] * len(client_unique_orders)
+        if len(client_unique_orders) > 1:
+            by_symbol: dict[str, list[int]] = {}
+            for i, o in enumerate(client_unique_orders):
+                by_symbol.setdefault(o["symbol"], []).append(i)
+            chunks: list[list[int]] = [chunk for indexes in by_symbol.values()
+                                       for chunk in cls._chunks(indexes, client_connector.MAX_BATCH_CANCEL)]
+            futures: list[Future] = cls._fan_out(client_connector, [
+                ("cancel_orders", dict(symbol=client_unique_orders[c[0]]["symbol"],
+                                       order_ids=[client_unique_orders[i]["orderId"] for i in c])) for c in chunks])
+            for chunk, f in zip(chunks, futures):
+                for i, result in cls._batch_results(chunk, f):
+                    if isinstance(result, Exception):
+                        logger.error(f"Error while canceling client unique order({client_unique_orders[i]}): {result}")
+                    else:
+                        logger.info(f"Unique order canceled: {result}")
+                    results[i] = result
+            return results
+
+        futures: list[Future] = cls._fan_out(
+            client_connector,
+            [("cancel_order", dict(symbol=o["symbol"], order_id=o["orderId"])) for o in client_unique_orders])
+        for i, (o, f) in enumerate(zip(client_unique_orders, futures)):
             try:
-                logger.debug(f"Close unique client order: {o}")
-                result: dict = client_connector.cancel_order(symbol=o["symbol"], order_id=o["orderId"])
-                logger.info(f"Unique order canceled: {result}")
+                results[i] = f.result()
+                logger.info(f"Unique order canceled: {results[i]}")
             except Exception as e:
                 logger.error(f"Error while canceling client unique order({o}): {e}")
+                results[i] = e
+        return results
+
+    @staticmethod
+    def _not_suppressed(state: PollingState, actions: list[ReconciliationAction]) -> list[ReconciliationAction]:
+        """ Drops actions, which failed recently and wait in negative cache """
+        result: list[ReconciliationAction] = []
+        for a in actions:
+            if state.negative_cache.is_suppressed(a.key):
+                logger.debug(f"Action {a.kind.value} is suppressed after failure: {a.target}")
+            else:
+                result.append(a)
+        return result
 
     @classmethod
-    def _positions_finder(
+    def _begin_actions(
             cls,
-            client_connector: AbstractExchangeConnector,
-            trader_connector: AbstractExchangeConnector
-    ) -> tuple[list[Position], list[Position]]:
-        """
-        Client unique positions returned first.
-        """
-        client_positions: list[Position] = client_connector.get_all_open_positions()
-        trader_positions: list[Position] = trader_connector.get_all_open_positions()
+            account: str,
+            actions: list[ReconciliationAction],
+            deduplicated: set[str]
+    ) -> list[ReconciliationAction]:
+        """ Takes actions in in-flight registry, drops actions taken by trader websocket and adds their symbols """
+        result: list[ReconciliationAction] = []
+        for a in actions:
+            if inflight_actions.begin(account, cls._inflight_key(a), path="polling"):
+                result.append(a)
+            else:
+                logger.debug(f"Action {a.kind.value} is already in flight: {a.target}")
+                deduplicated.add(a.symbol)
+        return result
 
-        return client_positions, trader_positions
+    @staticmethod
+    def _inflight_key(action: ReconciliationAction) -> tuple[str, ...]:
+        """ Key of action in in-flight registry, client orders are keyed by trader order id in clientOrderId """
+        if action.kind == ReconciliationActionKind.CLOSE_POSITION:
+            return inflight_actions.close_key(action.symbol, action.position_side)
+        if action.kind == ReconciliationActionKind.CANCEL_ORDER:
+            return inflight_actions.cancel_key(action.target["clientOrderId"])
+        return inflight_actions.copy_key(action.target["orderId"])
+
+    @staticmethod
+    def _error_reason(error: Exception) -> tuple[str, str]:
+        """ Returns reason code and message of failed action: binance error code or exception type """
+        if isinstance(error, ClientError):
+            return str(error.error_code), str(error.error_message)
+        return type(error).__name__, str(error)
 
     @classmethod
-    def _orders_finder(
+    def _snapshots_finder(
             cls,
             client_connector: AbstractExchangeConnector,
-            trader_connector: AbstractExchangeConnector
-    ) -> tuple[list[Order], list[Order]]:
+            trader_connector: AbstractExchangeConnector,
+            trader_book: Optional[AbstractAccountBook] = None,
+            client_book: Optional[AbstractAccountBook] = None
+    ) -> tuple[list[Position], list[Position], list[Order], list[Order]]:
         """
-        Client orders returned first.
+        Requests all snapshots concurrently, account snapshots are taken from its book if it passed.
+        Returns client positions, trader positions, client orders and trader orders.
         """
-        client_orders: list[Order] = client_connector.get_all_open_orders()
-        trader_orders: list[Order] = trader_connector.get_all_open_orders()
+        client_futures: list[Future] = [] if client_book else [
+            client_connector.submit("get_all_open_positions"),
+            client_connector.submit("get_all_open_orders"),
+        ]
+        trader_futures: list[Future] = [] if trader_book else [
+            trader_connector.submit("get_all_open_positions"),
+            trader_connector.submit("get_all_open_orders"),
+        ]
+        wait(client_futures + trader_futures)
 
-        return client_orders, trader_orders
+        if client_book:
+            client_positions, client_orders = client_book.get_open_positions(), client_book.get_open_orders()
+        else:
+            client_positions, client_orders = [f.result() for f in client_futures]
+        if trader_book:
+            trader_positions, trader_orders = trader_book.get_open_positions(), trader_book.get_open_orders()
+        else:
+            trader_positions, trader_orders = [f.result() for f in trader_futures]
+        return client_positions, trader_positions, client_orders, trader_orders
 
     @classmethod
-    def _unique_positions_finder(
-            cls,
-            client_positions: list[Position],
-            trader_positions: list[Position]
-    ) -> tuple[list[Position], list[Position]]:
+    def _fan_out(cls, connector: AbstractExchangeConnector, calls: list[tuple[str, dict]]) -> list[Future]:
         """
-        Client unique positions returned first.
+        Runs connector calls concurrently, but not more than POLLING_MAX_CONCURRENCY at once per account.
+        Returns futures in the same order as calls, all of them are done.
         """
-        client_unique: list[Position] = find_unique_positions(client_positions, trader_positions, Exchange.BINANCE)
-        trader_unique: list[Position] = find_unique_positions(trader_positions, client_positions, Exchange.BINANCE)
+        semaphore: threading.BoundedSemaphore = threading.BoundedSemaphore(config.POLLING_MAX_CONCURRENCY)
+        futures: list[Future] = []
+        for method, kwargs in calls:
+            semaphore.acquire()
+            try:
+                future: Future = connector.submit(method, **kwargs)
+            except Exception as e:
+                semaphore.release()
+                future: Future = Future()
+                future.set_exception(e)
+            else:
+                future.add_done_callback(lambda _: semaphore.release())
+            futures.append(future)
+        wait(futures)
+        return futures
 
-        return client_unique, trader_unique
+    @staticmethod
+    def _chunks(items: list, size: int) -> list[list]:
+        """ Splits items to lists with length not more than size """
+        return [items[i:i + size] for i in range(0, len(items), size)]
 
-    @classmethod
-    def _unique_orders_finder(
-            cls,
-            client_orders: list[Order],
-            trader_orders: list[Order]
-    ) -> tuple[list[Order], list[Order]]:
+    @staticmethod
+    def _batch_results(items: list, future: Future) -> list[tuple[object, dict | Exception]]:
         """
-        Client unique orders returned first.
+        Maps batch request results back to items. Failed items and whole failed request get exception,
+        so every item can be logged separately.
         """
-        client_unique: list[Order] = find_client_unique_orders(client_orders, trader_orders)  # close this
-        trader_unique: list[Order] = find_trader_unique_orders(trader_orders, client_orders)  # open this
-
-        return client_unique, trader_unique
+        try:
+            results: list[dict] = future.result()
+        except Exception as e:
+            return [(item, e) for item in items]
+        return [(item, ClientError(400, r["code"], r["msg"], None) if "code" in r and "msg" in r else r)
+                for item, r in zip(items, results)]
@@ -0,0 +1,73 @@
+"""
+Module that snaps prices and quantities of one symbol to exchange tick and step sizes
+"""
+__all__ = ["SymbolQuantizer", ]
+
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Iterable
+
+
+def _to_units(size: str) -> tuple[int, int]:
+    """ Returns amount of decimals in size and size in units of 10 ** -decimals: "0.0050" -> (3, 5), "5" -> (0, 5) """
+    value: Decimal = Decimal(size).normalize()
+    decimals: int = max(-value.as_tuple().exponent, 0)
+    return decimals, int(value.scaleb(decimals))
+
+
+@dataclass(frozen=True, slots=True)
+class SymbolQuantizer:
+    """
+    Prices and quantities are snapped in integer units of 10 ** -decimals,
+    so tick sizes like 0.5 or 5 are handled exactly, and formatted with prebuilt format strings.
+    """
+    price_scale: int
+    price_tick: int  # tick size in price units
+    price_format: str
+    quantity_scale: int
+    quantity_step: int  # step size in quantity units
+    quantity_format: str
+
+    @classmethod
+    def from_filters(cls, tick_size: str, step_size: str) -> "SymbolQuantizer":
+        """ Builds quantizer from PRICE_FILTER tickSize and LOT_SIZE stepSize strings """
+        price_decimals, price_tick = _to_units(tick_size)
+        quantity_decimals, quantity_step = _to_units(step_size)
+        return cls(
+            price_scale=10 ** price_decimals,
+            price_tick=price_tick,
+            price_format=f"{{:.{price_decimals}f}}",
+            quantity_scale=10 ** quantity_decimals,
+            quantity_step=quantity_step,
+            quantity_format=f"{{:.{quantity_decimals}f}}",
+        )
+
+    def price_units(self, price: float) -> int:
+        """ Price snapped to nearest tick in units of 10 ** -decimals """
+        return round(price * self.price_scale / self.price_tick) * self.price_tick
+
+    def quantity_units(self, quantity: float) -> int:
+        """ Quantity snapped to nearest step in units of 10 ** -decimals """
+        return round(quantity * self.quantity_scale / self.quantity_step) * self.quantity_step
+
+    def round_price(self, price: float) -> float:
+        return self.price_units(price) / self.price_scale
+
+    def round_quantity(self, quantity: float) -> float:
+        return self.quantity_units(quantity) / self.quantity_scale
+
+    def format_price(self, price: float) -> str:
+        return self.price_format.format(self.price_units(price) / self.price_scale)
+
+    def format_quantity(self, quantity: float) -> str:
+        return self.quantity_format.format(self.quantity_units(quantity) / self.quantity_scale)
+
+    def format_prices(self, prices: Iterable[float]) -> list[str]:
+        """ Batch version of format_price """
+        scale, tick, fmt = self.price_scale, self.price_tick, self.price_format
+        return [fmt.format(round(p * scale / tick) * tick / scale) for p in prices]
+
+    def format_quantities(self, quantities: Iterable[float]) -> list[str]:
+        """ Batch version of format_quantity """
+        scale, step, fmt = self.quantity_scale, self.quantity_step, self.quantity_format
+        return [fmt.format(round(q * scale / step) * step / scale) for q in quantities]
@@ -0,0 +1,200 @@
+"""
+Module that keeps binance request weight and order count limits for all connectors in process
+"""
+__all__ = ["rate_limiter", ]
+
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, Mapping, Optional
+
+from app.configuration import logger
+from app.schemas.enums import RequestPriority
+from app.schemas.types import RateLimitStatus
+
+
+class TokenBucket:
+    """ Token bucket, which refills linearly to capacity during interval """
+
+    def __init__(self, capacity: int, interval: int | float) -> None:
+        self.capacity: int = capacity
+        self._rate: float = capacity / interval
+        self._tokens: float = float(capacity)
+        self._updated: float = time.monotonic()
+
+    @property
+    def used(self) -> int:
+        self._refill()
+        return round(self.capacity - self._tokens)
+
+    def wait_time(self, amount: int, reserve: float = 0) -> float:
+        """ Returns seconds to wait until amount of tokens is available, keeping reserve untouched """
+        self._refill()
+        lack: float = amount + reserve - self._tokens
+        return 0.0 if lack <= 0 else lack / self._rate
+
+    def take(self, amount: int) -> None:
+        self._tokens -= amount
+
+    def sync(self, used: int) -> None:
+        """ Syncs bucket with usage reported by exchange """
+        self._refill()
+        self._tokens = min(self._tokens, float(self.capacity - used))
+
+    def _refill(self) -> None:
+        now: float = time.monotonic()
+        self._tokens = min(float(self.capacity), self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+
+class BinanceRateLimiter:
+    """
+    Класс, через который проходят все запросы коннекторов к binance.
+    Вес запросов считается на весь процесс (лимит на IP), количество ордеров - на каждый аккаунт.
+    Фоновые запросы на чтение не могут занять резерв, который остается для ордеров и закрытий позиций,
+    а ордера копирования - резерв экстренных закрытий. Пока ждет экстренный запрос, остальные не проходят.
+    Состояние корректируется по заголовкам X-MBX-USED-WEIGHT-* и X-MBX-ORDER-COUNT-* в ответах.
+    """
+
+    # Limits are set a bit lower than exchange ones
+    REQUEST_WEIGHT_LIMIT: int = 2200  # per 1 minute
+    ORDERS_10S_LIMIT: int = 280  # per 10 seconds
+    ORDERS_1M_LIMIT: int = 1100  # per 1 minute
+
+    # Part of every bucket, that can be used only by requests of higher priority
+    RESERVES: dict[RequestPriority, float] = {
+        RequestPriority.CRITICAL: 0.0,
+        RequestPriority.HIGH: 0.05,
+        RequestPriority.LOW: 0.2,
+    }
+    BLOCKED_WAIT: float = 0.05  # seconds, wait of request blocked by waiting critical one
+
+    # (method, path) -> (request weight, orders count)
+    COSTS: dict[tuple[str, str], tuple[int, int]] = {
+        ("GET", "/fapi/v2/balance"): (5, 0),
+        ("GET", "/fapi/v2/positionRisk"): (5, 0),
+        ("GET", "/fapi/v1/openOrders"): (40, 0),  # without symbol
+        ("GET", "/fapi/v1/allOrders"): (5, 0),
+        ("GET", "/fapi/v1/userTrades"): (5, 0),
+        ("GET", "/fapi/v1/income"): (30, 0),
+        ("POST", "/fapi/v1/order"): (0, 1),
+        ("DELETE", "/fapi/v1/order"): (1, 0),
+        ("DELETE", "/fapi/v1/allOpenOrders"): (1, 0),
+        ("POST", "/fapi/v1/batchOrders"): (5, 5),
+        ("DELETE", "/fapi/v1/batchOrders"): (1, 0),
+        ("POST", "/fapi/v1/listenKey"): (1, 0),
+        ("PUT", "/fapi/v1/listenKey"): (1, 0),
+        ("DELETE", "/fapi/v1/listenKey"): (1, 0),
+    }
+
+    def __init__(self) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self._weight: TokenBucket = TokenBucket(self.REQUEST_WEIGHT_LIMIT, 60)
+        self._orders: dict[str, tuple[TokenBucket, TokenBucket]] = {}
+        self._banned_until: float = 0.0
+        self._critical_waiting: int = 0
+
+    def acquire(self, api_key: str, http_method: str, url_path: str,
+                priority: Optional[RequestPriority] = None) -> None:
+        """
+        Blocks until request can be sent.
+        :param priority: By default GET requests are LOW and others are HIGH
+        """
+        priority = priority or self._default_priority(http_method)
+        with self._waiting(priority):
+            while (wait := self._try_acquire(api_key, http_method, url_path, priority)) > 0:
+                time.sleep(min(wait, 1))
+
+    async def acquire_async(self, api_key: str, http_method: str, url_path: str,
+                            priority: Optional[RequestPriority] = None) -> None:
+        """ Waits without blocking event loop until request can be sent """
+        priority = priority or self._default_priority(http_method)
+        with self._waiting(priority):
+            while (wait := self._try_acquire(api_key, http_method, url_path, priority)) > 0:
+                await asyncio.sleep(min(wait, 1))
+
+    def update_from_headers(self, api_key: str, headers: Mapping[str, str]) -> None:
+        """ Syncs buckets with usage from response headers """
+        with self._lock:
+            for key, value in headers.items():
+                key = key.lower()
+                if key == "x-mbx-used-weight-1m":
+                    self._weight.sync(int(value))
+                elif key == "x-mbx-order-count-10s":
+                    self._order_buckets(api_key)[0].sync(int(value))
+                elif key == "x-mbx-order-count-1m":
+                    self._order_buckets(api_key)[1].sync(int(value))
+
+    def on_error(self, status_code: int, headers: Mapping[str, str]) -> None:
+        """ Stops all requests on 429 (too many requests) and 418 (ip ban) for Retry-After seconds """
+        if status_code not in (418, 429):
+            return
+        retry_after: int = int((headers or {}).get("Retry-After", 60))
+        with self._lock:
+            self._banned_until = max(self._banned_until, time.time() + retry_after)
+        logger.critical(f"Binance rate limit exceeded ({status_code}), requests are stopped for {retry_after}s")
+
+    def get_status(self, api_key: str) -> RateLimitStatus:
+        """ Returns current budget usage for account """
+        with self._lock:
+            orders_10s, orders_1m = self._order_buckets(api_key)
+            return RateLimitStatus(
+                used_weight=self._weight.used,
+                weight_limit=self._weight.capacity,
+                used_orders_10s=orders_10s.used,
+                orders_10s_limit=orders_10s.capacity,
+                used_orders_1m=orders_1m.used,
+                orders_1m_limit=orders_1m.capacity,
+                banned_until=datetime.fromtimestamp(self._banned_until).isoformat(timespec='seconds')
+                if self._banned_until > time.time() else None
+            )
+
+    @staticmethod
+    def _default_priority(http_method: str) -> RequestPriority:
+        return RequestPriority.LOW if http_method == "GET" else RequestPriority.HIGH
+
+    @contextmanager
+    def _waiting(self, priority: RequestPriority) -> Iterator[None]:
+        """ Counts waiting critical requests, others are not served until they are sent """
+        if priority != RequestPriority.CRITICAL:
+            yield
+            return
+        with self._lock:
+            self._critical_waiting += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._critical_waiting -= 1
+
+    def _try_acquire(self, api_key: str, http_method: str, url_path: str, priority: RequestPriority) -> float:
+        """ Takes tokens if all buckets have them, otherwise returns seconds to wait """
+        weight, orders = self.COSTS.get((http_method, url_path), (1, 0))
+        reserve: float = self.RESERVES[priority]
+
+        with self._lock:
+            if self._critical_waiting and priority != RequestPriority.CRITICAL:
+                return self.BLOCKED_WAIT
+            costs: list[tuple[TokenBucket, int]] = [(self._weight, weight)]
+            if orders:
+                costs += [(bucket, orders) for bucket in self._order_buckets(api_key)]
+
+            wait: float = max(self._banned_until - time.time(), 0.0)
+            for bucket, amount in costs:
+                if amount:
+                    wait = max(wait, bucket.wait_time(amount, bucket.capacity * reserve))
+            if wait <= 0:
+                for bucket, amount in costs:
+                    bucket.take(amount)
+            return wait
+
+    def _order_buckets(self, api_key: str) -> tuple[TokenBucket, TokenBucket]:
+        """ Returns 10s and 1m order buckets of account, must be called under lock """
+        if api_key not in self._orders:
+            self._orders[api_key] = (TokenBucket(self.ORDERS_10S_LIMIT, 10), TokenBucket(self.ORDERS_1M_LIMIT, 60))
+        return self._orders[api_key]
+
+
+rate_limiter = BinanceRateLimiter()
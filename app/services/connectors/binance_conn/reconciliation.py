@@ -0,0 +1,124 @@
+"""
+Module that reconciles client account with trader account and returns typed action plan.
+Both accounts are indexed once: positions by (symbol, positionSide), orders by trader orderId
+(client orders carry it in clientOrderId), so plan is built in one pass in O(n + m).
+"""
+__all__ = ["ReconciliationAction", "ReconciliationPlan", "reconcile", "fingerprint_symbols", ]
+
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+from app.schemas.enums import ReconciliationActionKind, SkipReason
+from app.schemas.types import Order, Position
+
+
+@dataclass(slots=True)
+class ReconciliationAction:
+    kind: ReconciliationActionKind
+    symbol: str
+    position_side: str
+    target: Position | Order  # client position to close, client order to cancel or trader order to copy
+    reason: Optional[SkipReason] = None  # only for SKIP
+
+    @property
+    def key(self) -> tuple[str, str, str]:
+        """ (kind, symbol, target id), target id is position side for positions and order id for orders """
+        if self.kind == ReconciliationActionKind.CLOSE_POSITION:
+            return self.kind.value, self.symbol, self.position_side
+        return self.kind.value, self.symbol, str(self.target["orderId"])
+
+
+@dataclass(slots=True)
+class ReconciliationPlan:
+    close_positions: list[ReconciliationAction] = field(default_factory=list)
+    cancel_orders: list[ReconciliationAction] = field(default_factory=list)
+    copy_orders: list[ReconciliationAction] = field(default_factory=list)
+    skipped: list[ReconciliationAction] = field(default_factory=list)
+
+    def __iter__(self) -> Iterator[ReconciliationAction]:
+        """ Actions in order of execution: closes, cancels, copies, then skipped """
+        yield from self.close_positions
+        yield from self.cancel_orders
+        yield from self.copy_orders
+        yield from self.skipped
+
+    def __len__(self) -> int:
+        return len(self.close_positions) + len(self.cancel_orders) + len(self.copy_orders) + len(self.skipped)
+
+
+def reconcile(
+        trader_positions: list[Position],
+        client_positions: list[Position],
+        trader_orders: list[Order],
+        client_orders: list[Order],
+        multiplier: float = 1.0,
+        symbols: Optional[set[str]] = None
+) -> ReconciliationPlan:
+    """
+    Builds plan, which makes client account follow trader account:
+    - client position without trader position is closed;
+    - client order without trader order is canceled;
+    - trader order without client copy is copied with quantity multiplied, if both accounts are in position
+      or both are not, otherwise it is skipped with reason.
+    Input lists are not changed, copied orders are new dicts.
+    If symbols are passed, only they are reconciled.
+    """
+    if symbols is not None:
+        trader_positions = [p for p in trader_positions if p["symbol"] in symbols]
+        client_positions = [p for p in client_positions if p["symbol"] in symbols]
+        trader_orders = [o for o in trader_orders if o["symbol"] in symbols]
+        client_orders = [o for o in client_orders if o["symbol"] in symbols]
+
+    trader_position_keys: set[tuple[str, str]] = {(p["symbol"], p["positionSide"]) for p in trader_positions}
+    client_position_keys: set[tuple[str, str]] = {(p["symbol"], p["positionSide"]) for p in client_positions}
+    trader_order_ids: set[str] = {str(o["orderId"]) for o in trader_orders}
+    client_order_ids: set[str] = {o["clientOrderId"] for o in client_orders}
+
+    plan: ReconciliationPlan = ReconciliationPlan()
+    for p in client_positions:
+        if (p["symbol"], p["positionSide"]) not in trader_position_keys:
+            plan.close_positions.append(ReconciliationAction(
+                ReconciliationActionKind.CLOSE_POSITION, p["symbol"], p["positionSide"], p))
+
+    for o in client_orders:
+        if o["clientOrderId"] not in trader_order_ids:
+            plan.cancel_orders.append(ReconciliationAction(
+                ReconciliationActionKind.CANCEL_ORDER, o["symbol"], o["positionSide"], o))
+
+    for o in trader_orders:
+        if str(o["orderId"]) in client_order_ids:
+            continue  # already copied
+
+        key: tuple[str, str] = (o["symbol"], o["positionSide"])
+        trader_in_position: bool = key in trader_position_keys
+        client_in_position: bool = key in client_position_keys
+        if trader_in_position == client_in_position:
+            plan.copy_orders.append(ReconciliationAction(
+                ReconciliationActionKind.COPY_ORDER, key[0], key[1],
+                {**o, "origQty": float(o["origQty"]) * multiplier}))
+        else:
+            plan.skipped.append(ReconciliationAction(
+                ReconciliationActionKind.SKIP, key[0], key[1], o,
+                SkipReason.CLIENT_HAS_NO_POSITION if trader_in_position else SkipReason.TRADER_HAS_NO_POSITION))
+    return plan
+
+
+def fingerprint_symbols(
+        trader_positions: list[Position],
+        client_positions: list[Position],
+        trader_orders: list[Order],
+        client_orders: list[Order]
+) -> dict[str, int]:
+    """
+    Returns hash of everything reconcile looks at by symbol: position sides and order ids of both accounts.
+    Equal fingerprints give equal plans, so unchanged symbol does not need to be reconciled again.
+    """
+    parts: dict[str, tuple[list, list, list, list]] = {}
+    for i, items in enumerate((trader_positions, client_positions)):
+        for p in items:
+            parts.setdefault(p["symbol"], ([], [], [], []))[i].append(p["positionSide"])
+    for o in trader_orders:
+        parts.setdefault(o["symbol"], ([], [], [], []))[2].append((str(o["orderId"]), o["positionSide"]))
+    for o in client_orders:
+        parts.setdefault(o["symbol"], ([], [], [], []))[3].append(o["clientOrderId"])
+    return {symbol: hash(tuple(frozenset(part) for part in symbol_parts)) for symbol, symbol_parts in parts.items()}
@@ -0,0 +1,104 @@
+"""
+Module with trader websocket of client node, which takes trader events and book snapshots from relay node
+(see app.services.trader_relay) instead of binance user data stream.
+"""
+__all__ = ["BinanceRelayTraderWebsocket", ]
+
+import socket
+import time
+from typing import Optional
+
+from app.configuration import config, logger
+from app.metrics import relay_gaps
+from app.utils.fast_json import dumps, loads
+from .trader_websocket import BinanceTraderWebsocket
+
+
+class BinanceRelayTraderWebsocket(BinanceTraderWebsocket):
+    """
+    Events of relay are handled by the same handlers as events of binance, trader book is filled by relay snapshots,
+    so node needs neither listen key nor REST of trader account.
+    Gap in sequence numbers means lost events: node reconnects and gets fresh snapshot, polling copies the rest.
+    """
+
+    def __init__(self, *args, relay_url: str = config.RELAY_URL, relay_token: str = config.RELAY_TOKEN,
+                 silence_timeout: float = config.RELAY_SNAPSHOT_INTERVAL * 3, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        host, _, port = relay_url.rpartition(":")
+        self._relay_address: tuple[str, int] = (host, int(port))
+        self._relay_token: str = relay_token
+        self._silence_timeout: float = silence_timeout
+
+        self._sock: Optional[socket.socket] = None
+        self._last_seq: Optional[int] = None
+
+    def start_websocket(self) -> None:
+        """ Функция подключается к relay узлу. """
+        if self._is_running:
+            return
+
+        self._is_running: bool = True
+        self._executor.submit(self._relay_thread)
+
+    def stop_websocket(self, close_listen_key: bool = True) -> None:
+        """ Функция отключается от relay узла. """
+        self._is_running: bool = False
+        sock, self._sock = self._sock, None
+        if sock:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self._lanes.shutdown()
+
+    def _relay_thread(self) -> None:
+        """ Function reads relay feed and reconnects with backoff, when connection is lost """
+        delay: float = 1
+        while self._is_running:
+            try:
+                if self._read_relay():
+                    continue  # gap, reconnect at once for fresh snapshot
+                delay = 1
+            except Exception as e:
+                logger.error(f"Relay {self._relay_address} connection error: {e}")
+            if self._is_running:
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+
+    def _read_relay(self) -> bool:
+        """ Reads relay feed until connection is closed, returns True if it is closed because of gap """
+        with socket.create_connection(self._relay_address, timeout=self._silence_timeout) as sock:
+            self._sock = sock
+            self._last_seq = None
+            sock.sendall(dumps({"token": self._relay_token}) + b"\n")
+            logger.info(f"Trader relay {self._relay_address} connected")
+
+            for line in sock.makefile("rb"):
+                if not self._is_running:
+                    return False
+                if not self._handle_relay_message(loads(line)):
+                    return True
+        logger.info(f"Trader relay {self._relay_address} closed connection")
+        return False
+
+    def _handle_relay_message(self, msg: dict) -> bool:
+        """ Handles one relay message, returns False if events were lost """
+        self._confirmed.set()
+        message_type: str = msg.get("type")
+        if message_type == "snapshot":
+            drift: list[str] = self._book.load_snapshot(msg["orders"], msg["positions"], msg["balance"])
+            if drift and self._last_seq is not None:
+                logger.warning(f"Trader book drift found by relay snapshot: {drift}")
+            self._last_seq = msg["seq"]
+        elif message_type == "event":
+            seq: int = msg["seq"]
+            if self._last_seq is not None and seq <= self._last_seq:
+                return True  # event is already in snapshot
+            in_sync: bool = self._last_seq is None or seq == self._last_seq + 1
+            if not in_sync:
+                relay_gaps.inc(seq - self._last_seq - 1)
+                logger.warning(f"Trader relay gap: got seq {seq} after {self._last_seq}")
+            self._last_seq = seq
+            self._callback(None, msg["data"])
+            return in_sync
+        return True
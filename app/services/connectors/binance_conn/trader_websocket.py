@@ -1,57 +1,84 @@
-import json
+import threading
 import time
 from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
 from typing import Callable, Literal, Optional
 
+import binance.lib.utils  # get_timestamp is monkey patched in app.utils.patches
 from binance.websocket.um_futures.websocket_client import UMFuturesWebsocketClient
 
-from app.configuration import logger
+from app.configuration import config, logger
+from app.metrics import catchup_duration, copy_latency, executor_queue_depth, websocket_gaps
 from app.schemas.models import UserSettings, TraderSettings
-from ..abstract import AbstractTraderWebsocket, AbstractExchangeConnector
+from app.schemas.types import Order
+from app.utils import LanesExecutor
+from app.utils.fast_json import loads
+from .account_book import BinanceAccountBook
+from .events import AccountUpdateEvent, OrderTradeUpdateEvent, OrderUpdate, PositionUpdate
+from ..abstract import (AbstractTraderWebsocket, AbstractExchangeConnector, AbstractAccountBook, ClientSubscription,
+                        inflight_actions)
 
 
 class BinanceTraderWebsocket(AbstractTraderWebsocket):
-    """ Класс обрабатывает сообщение с вебсокета """
+    """
+    Класс обрабатывает сообщение с вебсокета.
+    Если поток закрылся или его поток чтения умер, вебсокет переподключается и догоняет пропущенные события:
+    история ордеров и сделок затронутых символов с времени последнего события передается в обработчики
+    как события потока.
+    """
+
+    # Execution type (x) of ORDER_TRADE_UPDATE built from REST order with status (X)
+    EXECUTION_TYPES: dict[str, str] = {"PARTIALLY_FILLED": "TRADE", "FILLED": "TRADE"}
+    # Income types of trades, their symbols are caught up after gap
+    TRADE_INCOME_TYPES: frozenset[str] = frozenset({"COMMISSION", "REALIZED_PNL"})
 
     def __init__(
             self,
             connector_factory: Callable[[Literal["trader", "client"]], Optional[AbstractExchangeConnector]],
-            user_settings: UserSettings,
+            user_settings: Optional[UserSettings],
             trader_settings: TraderSettings,
             callback: Callable[[dict], None],
-            max_workers: int = 5
+            clients: Optional[list[ClientSubscription]] = None,
+            max_workers: int = config.WEBSOCKET_LANES
     ) -> None:
         super().__init__(
             callback=callback,
             connector_factory=connector_factory,
             user_settings=user_settings,
-            trader_settings=trader_settings
+            trader_settings=trader_settings,
+            clients=clients
         )
 
         self._is_running: bool = False
+        self._confirmed: threading.Event = threading.Event()  # first frame is received
+        self._last_event_time: int = 0  # exchange time (E) of last event or of stream start, ms
+        self._gap_reason: Optional[str] = None  # is set when stream is lost, watchdog reconnects it
+        self._gap_event: threading.Event = threading.Event()  # wakes watchdog
 
         # Its important to fix connector here
         self._trader_connector: AbstractExchangeConnector = self._connector_factory("trader")
 
-        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=max_workers)
+        # Background threads: listen key renew, ping, book seed and watchdog
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=4)
+
+        # Events are handled in serial lane of their client and symbol, so events of one symbol can not be reordered
+        # for one client, while different clients are copied concurrently
+        self._lanes: LanesExecutor = LanesExecutor(
+            lanes=max_workers, reorder_window=config.WEBSOCKET_REORDER_WINDOW, name="trader-ws-lane")
+        executor_queue_depth.set_function(self._lanes.qsize, executor="trader_websocket")
 
         self._ws: UMFuturesWebsocketClient | None = None
 
         self._listen_key: str | None = None
 
-        self._positions: dict[str, dict[Literal["LONG", "SHORT", "BOTH"], dict]] = {}
-        # {'TRXUSDT':
-        #      {'LONG':
-        #           {'bep': '0.150465195',
-        #            'cr': '-0.06420997',
-        #            'ep': '0.15039',
-        #            'iw': '0',
-        #            'ma': 'USDT',
-        #            'mt': 'cross',
-        #            'pa': '113',
-        #            'ps': 'LONG',
-        #            's': 'TRXUSDT',
-        #            'up': '-0.00113000'}}}
+        # Open orders and positions of trader, polling service uses it instead of trader REST
+        self._book: BinanceAccountBook = BinanceAccountBook()
+
+        # Trader positions as seen by lane of each client, so order handler gets position of the same transaction
+        self._positions: dict[str, dict[str, dict[Literal["LONG", "SHORT", "BOTH"], PositionUpdate]]] = {}
+        # {'primary':
+        #      {'TRXUSDT':
+        #           {'LONG': PositionUpdate(symbol='TRXUSDT', position_amount=113.0, entry_price=0.15039, ...)}}}
 
     def start_websocket(self) -> None:
         """ Функция создает и возвращает клиент вебсокета для конкретной биржи. """
@@ -59,47 +86,283 @@ class BinanceTraderWebsocket(AbstractTraderWebsocket):
             return  # Если вебсокет уже запущен, не перезапускаем его
 
         self._is_running: bool = True
-
-        self._ws: UMFuturesWebsocketClient = UMFuturesWebsocketClient(
-            on_message=self._callback,
-            on_open=lambda *args: logger.info(f"Trader websocket opened: {args}"),
-            on_close=lambda *args: logger.info(f"Trader websocket closed: {args}"),
-            # on_ping=lambda *args: logger.debug(f"Trader websocket ping: {args}"),
-            on_error=lambda *args: logger.error(f"Trader websocket error: {args}"),
-            # on_pong=lambda *args: logger.debug(f"Trader websocket pong: {args}"),
-        )
-        self._listen_key: str = self._trader_connector.create_listen_key()
-        self._ws.user_data(listen_key=self._listen_key)
+        self._connect()
 
         self._executor.submit(self._listen_key_renew_thread)
         self._executor.submit(self._ping_thread)
+        self._executor.submit(self._seed_book_thread)
+        self._executor.submit(self._watchdog_thread)
 
-    def stop_websocket(self) -> None:
+    def stop_websocket(self, close_listen_key: bool = True) -> None:
         """ Функция останавливает вебсокет. """
         self._is_running: bool = False
+        self._gap_event.set()
         try:
-            if self._listen_key:
+            if self._listen_key and close_listen_key:
                 self._trader_connector.close_listen_key(listen_key=self._listen_key)
         except Exception as e:
             logger.error(f"Error while closing listen key on stop websocket: {e}")
         self._listen_key = None
-        self._ws.stop()
+        self._lanes.shutdown()
+        if self._ws:  # websocket of shard is never started
+            self._ws.stop()
 
     def handle_websocket_message(self, *args, **kwargs) -> None:
         """ Функция принимает и обрабатывает сообщение с вебсокета. """
-        msg: str = args[1]
-        msg: dict = json.loads(msg)
+        received_at: float = time.time()
+        msg: dict = self._decode(args[1])
+        self._on_event(msg)
+
+        # Book is updated synchronously to keep events order
+        self._book.handle_event(msg)
+        self._notify_event_listeners(msg)
 
+        # Event is decoded once here and fanned out to lanes of all clients, handlers get the same typed struct
+        # Within one transaction time position update goes before order update, which may need this position
+        # Positions are updated for inactive clients too, so they have actual trader positions, when they are back
         event_type: str = msg.get("e")
         if event_type == "ORDER_TRADE_UPDATE":
-            self._executor.submit(self._order_trade_update, msg)
+            event: OrderTradeUpdateEvent = OrderTradeUpdateEvent.from_dict(msg)
+            for client in self._clients.values():
+                if client.is_active():
+                    self._lanes.submit(f"{client.client_id}:{event.order.symbol}", (event.transaction_time, 1),
+                                       self._order_trade_update, client, event, received_at)
         elif event_type == "ACCOUNT_CONFIG_UPDATE":
             pass  # self._executor.submit(self._account_config_update, msg)
         elif event_type == "ACCOUNT_UPDATE":
-            self._executor.submit(self._account_update, msg)
+            event: AccountUpdateEvent = AccountUpdateEvent.from_dict(msg)
+            for symbol in set(p.symbol for p in event.positions):
+                symbol_event: AccountUpdateEvent = replace(
+                    event, positions=tuple(p for p in event.positions if p.symbol == symbol))
+                for client in self._clients.values():
+                    self._lanes.submit(f"{client.client_id}:{symbol}", (event.transaction_time, 0),
+                                       self._account_update, client, symbol_event)
         else:
             logger.debug(f"Unhandled event type {event_type}: {msg}")
 
+    def handle_state_message(self, *args, **kwargs) -> None:
+        """ Функция обновляет только книгу трейдера, без копирования ордеров. """
+        msg: dict = self._decode(args[1])
+        self._on_event(msg)
+        self._book.handle_event(msg)
+        self._notify_event_listeners(msg)
+
+    def get_trader_book(self) -> AbstractAccountBook:
+        """ Функция возвращает книгу ордеров и позиций трейдера. """
+        return self._book
+
+    def wait_confirmed(self, timeout: float) -> bool:
+        """ Функция ждет первое сообщение потока, для binance это ответ на подписку listen key. """
+        return self._confirmed.wait(timeout=timeout)
+
+    def take_over(self, previous: AbstractTraderWebsocket) -> None:
+        """ Функция забирает позиции трейдера и его книгу, чтобы копирование не ждало заполнения книги через REST. """
+        if not isinstance(previous, BinanceTraderWebsocket):
+            return
+        self._positions = {client_id: {symbol: dict(sides) for symbol, sides in positions.items()}
+                           for client_id, positions in previous._positions.items()}
+        book: AbstractAccountBook = previous.get_trader_book()
+        if book.is_ready() and not self._book.is_ready():
+            self._book.load_snapshot(book.get_open_orders(), book.get_open_positions(), book.get_balance())
+
+    def _on_message(self, *args) -> None:
+        self._confirmed.set()
+        self._callback(*args)
+
+    def _on_close(self, *args) -> None:
+        """ Close of current stream is a gap, close of replaced one is not """
+        logger.info(f"Trader websocket closed: {args}")
+        if self._is_running and self._ws and args and args[0] is self._ws.socket_manager:
+            self._on_gap("closed")
+
+    def _on_event(self, msg: dict) -> None:
+        event_type: Optional[str] = msg.get("e")
+        if not event_type:
+            return  # subscription result
+        self._last_event_time = max(self._last_event_time, msg.get("E", 0))
+        if event_type == "listenKeyExpired":
+            self._on_gap("expired")
+
+    def _on_gap(self, reason: str) -> None:
+        self._gap_reason = reason
+        self._gap_event.set()
+
+    def _connect(self) -> None:
+        """ Function opens user data stream, events after this moment are delivered by it """
+        self._last_event_time = max(self._last_event_time, binance.lib.utils.get_timestamp())
+        self._ws: UMFuturesWebsocketClient = UMFuturesWebsocketClient(
+            stream_url=config.BINANCE_WS_URL,
+            on_message=self._on_message,
+            on_open=lambda *args: logger.info(f"Trader websocket opened: {args}"),
+            on_close=self._on_close,
+            # on_ping=lambda *args: logger.debug(f"Trader websocket ping: {args}"),
+            on_error=lambda *args: logger.error(f"Trader websocket error: {args}"),
+            # on_pong=lambda *args: logger.debug(f"Trader websocket pong: {args}"),
+        )
+        self._listen_key: str = self._trader_connector.create_listen_key()
+        self._ws.user_data(listen_key=self._listen_key)
+
+    def _watchdog_thread(self) -> None:
+        """
+        Function reconnects stream, when it is closed, its listen key is expired or its reading thread is dead
+        (connector does not call on_close, if connection is lost), then catches up missed events.
+        """
+        while self._is_running:
+            self._gap_event.wait(timeout=config.WEBSOCKET_WATCHDOG_INTERVAL)
+            self._gap_event.clear()
+            if not self._is_running:
+                return
+
+            reason: Optional[str] = self._gap_reason
+            if not reason and self._ws and not self._ws.socket_manager.is_alive():
+                reason = "dead"
+            if not reason:
+                continue
+
+            since: int = self._last_event_time
+            websocket_gaps.inc(reason=reason)
+            logger.warning(f"Trader websocket gap ({reason}), last event time {since}, reconnecting")
+            try:
+                ws, self._ws, self._gap_reason = self._ws, None, None
+                if ws:
+                    ws.socket_manager.close()  # without join, reading thread may hang on dead connection
+                self._connect()
+                self._catch_up(since)
+            except Exception as e:
+                self._gap_reason = reason  # retry on next check
+                logger.error(f"Error while reconnecting trader websocket: {e}")
+
+    def _catch_up(self, since: int) -> None:
+        """
+        Function requests order and trade history of symbols touched since last event: symbols with trades
+        (income records) after it and symbols, which open orders or positions differ from trader book.
+        Orders updated after last event are passed to handlers as stream events after position update with
+        current positions of their symbols, so market orders are handled with position after gap, like in stream.
+        Actions, which were done before gap by websocket or polling, are skipped by inflight registry.
+        """
+        if not self._book.is_ready():
+            return  # book seed is not finished, polling copies trader state
+
+        started_at: float = time.perf_counter()
+        try:
+            book_orders: list[Order] = self._book.get_open_orders()
+            book_positions: dict[tuple[str, str], dict] = {
+                (p["symbol"], p["positionSide"]): p for p in self._book.get_open_positions()}
+            rest_orders: list[Order] = self._trader_connector.get_all_open_orders()
+            rest_positions: dict[tuple[str, str], dict] = {
+                (p["symbol"], p["positionSide"]): p for p in self._trader_connector.get_all_open_positions()}
+
+            symbols: set[str] = {r["symbol"] for r in self._trader_connector.get_income_history(since)
+                                 if r["symbol"] and r["incomeType"] in self.TRADE_INCOME_TYPES}
+            book_order_ids: set[int] = {o["orderId"] for o in book_orders}
+            rest_order_ids: set[int] = {o["orderId"] for o in rest_orders}
+            symbols |= {o["symbol"] for o in book_orders if o["orderId"] not in rest_order_ids}
+            symbols |= {o["symbol"] for o in rest_orders if o["orderId"] not in book_order_ids}
+            symbols |= {key[0] for key in {*book_positions, *rest_positions}
+                        if not book_positions.get(key) or not rest_positions.get(key)
+                        or float(book_positions[key]["positionAmt"]) != float(rest_positions[key]["positionAmt"])}
+
+            events: list[dict] = []
+            for symbol in symbols:
+                # Orders of book could be created long before gap, so history starts from the first of them
+                first_order_id: Optional[int] = min(
+                    (o["orderId"] for o in book_orders if o["symbol"] == symbol), default=None)
+                orders: list[Order] = [
+                    o for o in self._trader_connector.get_order_history(symbol, since, first_order_id)
+                    if o["updateTime"] > since]
+                trades: list[dict] = self._trader_connector.get_trade_history(symbol, since) \
+                    if any(float(o["executedQty"]) for o in orders) else []
+                events.extend(self._order_event(o, trades) for o in orders)
+
+                # Positions after gap go before the first order, position closed in gap is passed as empty one
+                keys: set[tuple[str, str]] = {k for k in [*book_positions, *rest_positions] if k[0] == symbol} | \
+                    {(symbol, o["positionSide"]) for o in orders}
+                positions: list[dict] = [rest_positions.get(key) or self._flat_position(*key) for key in keys]
+                if positions:
+                    events.append(self._account_event(
+                        positions, min((o["updateTime"] for o in orders), default=since + 1)))
+
+            # Within one transaction time position update goes before order update, like in stream
+            events.sort(key=lambda m: (m["T"], m["e"] != "ACCOUNT_UPDATE"))
+            for msg in events:
+                self._callback(None, msg)
+            logger.info(f"Trader websocket caught up {len(events)} events of {len(symbols)} symbols")
+        finally:
+            catchup_duration.observe(time.perf_counter() - started_at)
+
+    @staticmethod
+    def _flat_position(symbol: str, position_side: str) -> dict:
+        """ REST position with zero amount, REST does not return closed positions """
+        return {"symbol": symbol, "positionSide": position_side, "positionAmt": "0", "entryPrice": "0",
+                "breakEvenPrice": "0", "unRealizedProfit": "0", "marginType": "cross", "isolatedWallet": "0"}
+
+    @classmethod
+    def _order_event(cls, order: Order, trades: list[dict]) -> dict:
+        """ Builds ORDER_TRADE_UPDATE event from REST order, last fill is taken from account trades """
+        fills: list[dict] = [t for t in trades if t["orderId"] == order["orderId"]]
+        last_fill: dict = fills[-1] if fills else {}
+        o: dict = {
+            "s": order["symbol"],
+            "c": order["clientOrderId"],
+            "S": order["side"],
+            "o": order["type"],
+            "ot": order["origType"],
+            "f": order["timeInForce"],
+            "q": order["origQty"],
+            "p": order["price"],
+            "ap": order["avgPrice"],
+            "sp": order["stopPrice"],
+            "x": cls.EXECUTION_TYPES.get(order["status"], order["status"]),
+            "X": order["status"],
+            "i": order["orderId"],
+            "l": last_fill.get("qty", "0"),
+            "z": order["executedQty"],
+            "L": last_fill.get("price", "0"),
+            "T": order["updateTime"],
+            "t": last_fill.get("id", 0),
+            "R": order.get("reduceOnly", False),
+            "cp": order.get("closePosition", False),
+            "wt": order.get("workingType"),
+            "pP": order.get("priceProtect", False),
+            "ps": order["positionSide"],
+            "rp": str(sum(float(t["realizedPnl"]) for t in fills)),
+        }
+        if "activatePrice" in order:
+            o["AP"] = order["activatePrice"]
+        if "priceRate" in order:
+            o["cr"] = order["priceRate"]
+        return {"e": "ORDER_TRADE_UPDATE", "E": order["updateTime"], "T": order["updateTime"], "o": o}
+
+    @staticmethod
+    def _account_event(positions: list[dict], transaction_time: int) -> dict:
+        """ Builds ACCOUNT_UPDATE event from REST positions """
+        return {"e": "ACCOUNT_UPDATE", "E": transaction_time, "T": transaction_time, "a": {"m": "CATCH_UP", "B": [],
+                "P": [{
+                    "s": p["symbol"],
+                    "pa": p["positionAmt"],
+                    "ep": p["entryPrice"],
+                    "bep": p.get("breakEvenPrice", "0"),
+                    "cr": "0",
+                    "up": p["unRealizedProfit"],
+                    "mt": p["marginType"],
+                    "iw": p["isolatedWallet"],
+                    "ps": p["positionSide"],
+                } for p in positions]}}
+
+    @staticmethod
+    def _decode(frame: str | bytes | dict) -> dict:
+        """ Decodes raw frame, relay passes event already decoded """
+        return frame if isinstance(frame, dict) else loads(frame)
+
+    def _seed_book_thread(self) -> None:
+        """ Function fills trader book from REST once, retries until success """
+        while self._is_running and not self._book.is_ready():
+            try:
+                self._book.seed(self._trader_connector)
+            except Exception as e:
+                logger.error(f"Error while seeding trader book: {e}")
+                time.sleep(5)
+
     def _ping_thread(self) -> None:
         """ Function pings binance.com """
         while self._is_running:
@@ -127,8 +390,20 @@ class BinanceTraderWebsocket(AbstractTraderWebsocket):
             except Exception as e:
                 logger.error(f"Error while renew listen key: {e}")
 
-    def _order_trade_update(self, msg: dict) -> None:
+    @staticmethod
+    def _observe_copy_latency(event: OrderTradeUpdateEvent, received_at: float, started_at: float, action: str) -> None:
+        """ Observes copy latency stages after client REST ack """
+        acked_at: float = time.time()
+        transaction_time: float = event.transaction_time / 1000
+        copy_latency.observe(received_at - transaction_time, stage="exchange", action=action)
+        copy_latency.observe(started_at - received_at, stage="queue", action=action)
+        copy_latency.observe(acked_at - started_at, stage="rest", action=action)
+        copy_latency.observe(acked_at - transaction_time, stage="total", action=action)
+
+    def _order_trade_update(self, subscription: ClientSubscription, event: OrderTradeUpdateEvent,
+                            received_at: float) -> None:
         """
+        Event is decoded from:
                 {
           "e":"ORDER_TRADE_UPDATE",		   // Event Type
           "E":1568879465651,			       // Event Time
@@ -177,51 +452,72 @@ class BinanceTraderWebsocket(AbstractTraderWebsocket):
           }
         }
         """
+        started_at: float = time.time()
         try:
-            order: dict = msg["o"]
-            order_id: str = str(order["i"])
-            symbol: str = order["s"]
-            order_type: str = order["o"]
-            order_status: str = order["X"]
-            position_side: Literal["LONG", "SHORT", "BOTH"] = order["ps"]
-            # order_status_2: str = order["x"]
+            order: OrderUpdate = event.order
+            client: Optional[AbstractExchangeConnector] = subscription.connector_factory("client")
+            if not client:
+                return logger.debug(f"Client {subscription.client_id} connector is not inited, skip {order}")
+            multiplier: float = subscription.user_settings_factory().multiplier
 
             # Market order need to be placed other scenario
-            if order_type == "MARKET":
-                if order_status == "FILLED":
+            if order.type == "MARKET":
+                if order.status == "FILLED":
                     try:
-                        position: dict = self._positions[symbol][position_side]
+                        position: PositionUpdate = \
+                            self._positions[subscription.client_id][order.symbol][order.position_side]
                     except KeyError:
-                        return logger.error(f"Key error while update: {msg}")
-                    if float(position["pa"]) == 0:
-                        logger.debug(f"Closing position after market order: {order}")
-                        result: dict = self._connector_factory("client").close_position_from_websocket_message(position)
+                        return logger.error(f"Key error while update: {event}")
+                    if position.position_amount == 0:
+                        with inflight_actions.take(client.account_id, inflight_actions.close_key(
+                                order.symbol, order.position_side), path="websocket") as taken:
+                            if not taken:
+                                return logger.info(f"Position is already being closed: {order}")
+                            logger.debug(f"Closing position after market order: {order}")
+                            result: dict = client.close_position_from_websocket_message(position)
+                        self._observe_copy_latency(event, received_at, started_at, "close")
                         return logger.info(f"Closing position after market order result: {result}")
                     else:
-                        logger.debug(f"Open order after market order: {order}")
-                        order["q"] = float(order["q"]) * self._user_settings.multiplier
-                        result: dict = self._connector_factory("client").copy_order_from_websocket_message(order)
+                        with inflight_actions.take(client.account_id, inflight_actions.copy_key(order.order_id),
+                                                   path="websocket") as taken:
+                            if not taken:
+                                return logger.info(f"Order is already being copied: {order}")
+                            logger.debug(f"Open order after market order: {order}")
+                            order = replace(order, quantity=order.quantity * multiplier)
+                            result: dict = client.copy_order_from_websocket_message(order)
+                        self._observe_copy_latency(event, received_at, started_at, "copy")
                         return logger.info(f"Open order after market order result: {result}")
 
             # Limit orders / take profit orders / stop loss orders
             else:
-                if order_status == "CANCELED" or order_status == "EXPIRED":
-                    logger.debug(f"Canceling order {order}")
-                    result: dict = self._connector_factory("client").cancel_order_by_client_order_id(
-                        symbol=symbol, client_order_id=order_id)
+                if order.status == "CANCELED" or order.status == "EXPIRED":
+                    with inflight_actions.take(client.account_id, inflight_actions.cancel_key(order.order_id),
+                                               path="websocket") as taken:
+                        if not taken:
+                            return logger.info(f"Order is already being canceled: {order}")
+                        logger.debug(f"Canceling order {order}")
+                        result: dict = client.cancel_order_by_client_order_id(
+                            symbol=order.symbol, client_order_id=str(order.order_id))
+                    self._observe_copy_latency(event, received_at, started_at, "cancel")
                     return logger.info(f"Copy cancel order result: {result}")
 
-                if order_status == "NEW":
-                    logger.debug(f"Copying order {order}")
-                    order["q"] = float(order["q"]) * self._user_settings.multiplier
-                    result: dict = self._connector_factory("client").copy_order_from_websocket_message(order)
+                if order.status == "NEW":
+                    with inflight_actions.take(client.account_id, inflight_actions.copy_key(order.order_id),
+                                               path="websocket") as taken:
+                        if not taken:
+                            return logger.info(f"Order is already being copied: {order}")
+                        logger.debug(f"Copying order {order}")
+                        order = replace(order, quantity=order.quantity * multiplier)
+                        result: dict = client.copy_order_from_websocket_message(order)
+                    self._observe_copy_latency(event, received_at, started_at, "copy")
                     return logger.info(f"Copy order result: {result}")
 
         except Exception as e:
-            logger.error(f"Error while _order_trade_update: {e}")
+            logger.error(f"Error while _order_trade_update of client {subscription.client_id}: {e}")
 
-    def _account_update(self, msg: dict) -> None:
+    def _account_update(self, subscription: ClientSubscription, event: AccountUpdateEvent) -> None:
         """
+        Event is decoded from:
         {
           "e": "ACCOUNT_UPDATE",				// Event Type
           "E": 1564745798939,            		// Event Time
@@ -282,11 +578,13 @@ class BinanceTraderWebsocket(AbstractTraderWebsocket):
         }
         """
         try:
-            for position in msg["a"]["P"]:
-                if position["s"] not in self._positions:
-                    self._positions[position["s"]] = {}
-                self._positions[position["s"]][position["ps"]] = position
-            # from pprint import pprint
-            # pprint(self._positions)
+            client: Optional[AbstractExchangeConnector] = subscription.connector_factory("client")
+            positions: dict = self._positions.setdefault(subscription.client_id, {})
+            for position in event.positions:
+                positions.setdefault(position.symbol, {})[position.position_side] = position
+                if position.position_amount != 0 and client:
+                    # Position is opened again, so next close must not be deduplicated with previous one
+                    inflight_actions.forget(
+                        client.account_id, inflight_actions.close_key(position.symbol, position.position_side))
         except Exception as e:
-            logger.error(f"Error while _account_update: {e}")
+            logger.error(f"Error while _account_update of client {subscription.client_id}: {e}")
@@ -1,14 +1,15 @@
 import time
 from datetime import datetime
-from threading import Thread
+from threading import Event, Thread
 from typing import Callable, Literal, Optional
 
 from .abstract import AbstractService
-from .connectors import EXCHANGE_TO_POLLING_SERVICE, AbstractExchangeConnector
+from .connectors import EXCHANGE_TO_POLLING_SERVICE, AbstractExchangeConnector, AbstractAccountBook, PollingState
 from ..configuration import logger, config
+from ..metrics import polling_cycle_duration
 from ..schemas.enums import BalanceStatus
 from ..schemas.models import UserSettings, TraderSettings
-from ..schemas.types import ServiceStatus
+from ..schemas.types import PollingServiceStatus
 
 
 class TraderPollingService(AbstractService, Thread):
@@ -21,8 +22,14 @@ class TraderPollingService(AbstractService, Thread):
             connector_factory: Callable[[Literal["trader", "client"]], Optional[AbstractExchangeConnector]],
             user_settings: UserSettings,
             trader_settings: TraderSettings,
+            trader_book_factory: Callable[[], Optional[AbstractAccountBook]] = lambda: None,
+            client_book_factory: Callable[[], Optional[AbstractAccountBook]] = lambda: None,
             interval: int | float = config.TRADER_POLLING_INTERVAL
     ) -> None:
+        """
+        :param trader_book_factory: Возвращает заполненную книгу трейдера, если она есть.
+        :param client_book_factory: Возвращает заполненную книгу клиента, если она есть.
+        """
         AbstractService.__init__(self)
         Thread.__init__(self, daemon=True)
 
@@ -30,23 +37,30 @@ class TraderPollingService(AbstractService, Thread):
             connector_factory
         self._user_settings: UserSettings = user_settings
         self._trader_settings: TraderSettings = trader_settings
+        self._trader_book_factory: Callable[[], Optional[AbstractAccountBook]] = trader_book_factory
+        self._client_book_factory: Callable[[], Optional[AbstractAccountBook]] = client_book_factory
         self._balance_status: BalanceStatus = BalanceStatus.NOT_DEFINED
 
         self._interval: int | float = interval
+        self._polling_state: PollingState = PollingState()  # previous snapshots and failed actions
 
         self._last_update_time: int | float = 0.00  # for status
+        self._last_cycle_duration: float = 0.00  # for status
+        self._stopped: Event = Event()
 
-    def get_status(self) -> ServiceStatus:
-        return ServiceStatus(
+    def get_status(self) -> PollingServiceStatus:
+        return PollingServiceStatus(
             status=self._check_statuses(),
-            last_update_time=datetime.fromtimestamp(self._last_update_time).isoformat(timespec='seconds')
+            last_update_time=datetime.fromtimestamp(self._last_update_time).isoformat(timespec='seconds'),
+            last_cycle_duration=round(self._last_cycle_duration, 3),
+            suppressed_actions=self._polling_state.negative_cache.get_status()
         )
 
     get_status.__doc__ = AbstractService.get_status.__doc__
 
     def run(self) -> None:
         """ Service entry point """
-        while True:
+        while not self._stopped.is_set():
             try:
                 if not self._check_statuses():
                     continue
@@ -55,13 +69,24 @@ class TraderPollingService(AbstractService, Thread):
 
                 EXCHANGE_TO_POLLING_SERVICE[self._trader_settings.exchange].process(
                     connector_factory=self._connector_factory,
-                    user_settings=self._user_settings
+                    user_settings=self._user_settings,
+                    trader_book=self._trader_book_factory(),
+                    client_book=self._client_book_factory(),
+                    state=self._polling_state
                 )
 
+                self._last_cycle_duration = time.time() - self._last_update_time
+                logger.debug(f"Polling cycle took {self._last_cycle_duration:.3f}s")
+                polling_cycle_duration.observe(self._last_cycle_duration)
+
             except Exception as e:
                 logger.error(f"Error in trader pollong service: {e}")
             finally:
-                time.sleep(self._interval)
+                self._stopped.wait(self._interval)
+
+    def stop(self) -> None:
+        """ Останавливает поток сервиса после текущего цикла. """
+        self._stopped.set()
 
     def _check_statuses(self) -> bool:
         """ Функция проверяет все статусы и переменные, перед тем как дать разрешение на продолжение работы. """
@@ -94,3 +119,4 @@ class TraderPollingService(AbstractService, Thread):
     def on_trader_settings_update(self, u: TraderSettings) -> None:
         logger.info(f"Trader settings update event: {u}")
         self._trader_settings: TraderSettings = u
+        self._polling_state.reset()  # trader account may be changed
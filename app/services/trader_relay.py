@@ -0,0 +1,218 @@
+import hmac
+import queue
+import socket
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+from .abstract import AbstractService
+from .connectors import AbstractAccountBook
+from ..configuration import config, logger
+from ..metrics import relay_subscribers
+from ..schemas.types import RelayServiceStatus
+from ..utils.fast_json import dumps, loads
+
+
+class _RelaySubscriber(threading.Thread):
+    """ Connection of one client node: messages are queued and written by own thread, so slow node waits alone """
+
+    def __init__(self, sock: socket.socket, address: tuple, queue_size: int) -> None:
+        super().__init__(name=f"relay-subscriber-{address[0]}:{address[1]}", daemon=True)
+        self.address: tuple = address
+        self._sock: socket.socket = sock
+        self._queue: queue.Queue[bytes] = queue.Queue(maxsize=queue_size)
+        self._closed: bool = False
+
+    def put(self, line: bytes) -> bool:
+        """ Queues message, returns False if subscriber is too slow and was closed """
+        try:
+            self._queue.put_nowait(line)
+            return True
+        except queue.Full:
+            logger.warning(f"Relay subscriber {self.address} is too slow, disconnecting")
+            self.close()
+            return False
+
+    def close(self) -> None:
+        self._closed = True
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def run(self) -> None:
+        try:
+            while not self._closed:
+                try:
+                    line: bytes = self._queue.get(timeout=1)
+                except queue.Empty:
+                    continue
+                self._sock.sendall(line)
+        except OSError as e:
+            logger.info(f"Relay subscriber {self.address} disconnected: {e}")
+        finally:
+            self._closed = True
+            self._sock.close()
+
+
+class TraderRelayService(AbstractService):
+    """
+    Relay узел раздает события вебсокета трейдера и периодические снапшоты его книги другим узлам по TCP.
+    Узлы клиентов подключаются к relay вместо биржи, поэтому на ключах трейдера открыт один listen key,
+    а его REST не опрашивается каждым узлом.
+
+    Протокол - строки JSON (NDJSON):
+    - клиент после подключения отправляет {"token": "..."};
+    - {"type": "event", "seq": 1, "data": {событие binance}} - события по порядку, seq растет на 1;
+    - {"type": "snapshot", "seq": 1, "orders": [...], "positions": [...], "balance": 1.0} - книга трейдера
+      после события seq, отправляется при подключении и раз в snapshot_interval секунд;
+    - {"type": "heartbeat", "seq": 1} - вместо снапшота, пока книга трейдера не заполнена.
+    Событие может попасть в книгу раньше, чем получит свой seq, поэтому оно может повториться после снапшота,
+    обработка событий книгой от этого не меняется.
+    """
+
+    def __init__(
+            self,
+            trader_book_factory: Callable[[], Optional[AbstractAccountBook]],
+            host: str = config.RELAY_SERVER_HOST,
+            port: int = config.RELAY_SERVER_PORT,
+            token: str = config.RELAY_TOKEN,
+            snapshot_interval: int | float = config.RELAY_SNAPSHOT_INTERVAL,
+            queue_size: int = config.RELAY_SUBSCRIBER_QUEUE_SIZE
+    ) -> None:
+        """
+        :param trader_book_factory: Возвращает заполненную книгу трейдера, из нее берутся снапшоты.
+        :param token: Общий секрет, без которого подключение закрывается. Пустой токен запрещен.
+        """
+        super().__init__()
+
+        self._trader_book_factory: Callable[[], Optional[AbstractAccountBook]] = trader_book_factory
+        self._host: str = host
+        self._port: int = port
+        self._token: str = token
+        self._snapshot_interval: int | float = snapshot_interval
+        self._queue_size: int = queue_size
+
+        # Seq is assigned and message is queued to every subscriber under one lock, so all nodes get the same order
+        self._lock: threading.Lock = threading.Lock()
+        self._seq: int = 0
+        self._subscribers: set[_RelaySubscriber] = set()
+        self._server: Optional[socket.socket] = None
+        self._stopped: threading.Event = threading.Event()
+
+        self._last_event_time: int | float = 0.0  # for status
+        relay_subscribers.set_function(lambda: len(self._subscribers))
+
+    def get_status(self) -> RelayServiceStatus:
+        return RelayServiceStatus(
+            status=self._server is not None,
+            last_update_time=datetime.fromtimestamp(self._last_event_time).isoformat(timespec='seconds'),
+            subscribers=len(self._subscribers),
+            seq=self._seq
+        )
+
+    get_status.__doc__ = AbstractService.get_status.__doc__
+
+    def start(self) -> None:
+        """ Открывает порт relay и запускает потоки приема подключений и снапшотов. """
+        if not self._token:
+            # Without token anyone, who can reach the port, receives trader orders and positions
+            raise ValueError("RELAY_TOKEN must be set to start trader relay")
+        self._server = socket.create_server((self._host, self._port))
+        logger.info(f"Trader relay is listening on {self._host}:{self._port}")
+        threading.Thread(target=self._accept_thread, name="relay-accept", daemon=True).start()
+        threading.Thread(target=self._snapshot_thread, name="relay-snapshot", daemon=True).start()
+
+    def stop(self) -> None:
+        """ Закрывает порт relay и подключения узлов, останавливает потоки сервиса. """
+        self._stopped.set()
+        server, self._server = self._server, None
+        if server:
+            try:
+                server.shutdown(socket.SHUT_RDWR)  # wakes accept
+            except OSError:
+                pass
+            server.close()
+        with self._lock:
+            for subscriber in self._subscribers:
+                subscriber.close()
+            self._subscribers.clear()
+        logger.info("Trader relay is stopped")
+
+    def publish(self, msg: dict) -> None:
+        """ Раздает событие трейдера всем подключенным узлам, передается в вебсокет трейдера как слушатель. """
+        self._last_event_time = time.time()
+        with self._lock:
+            self._seq += 1
+            self._broadcast(dumps({"type": "event", "seq": self._seq, "data": msg}) + b"\n")
+
+    def _broadcast(self, line: bytes) -> None:
+        """ Called under lock """
+        for subscriber in [s for s in self._subscribers if s.closed or not s.put(line)]:
+            self._subscribers.discard(subscriber)
+
+    def _snapshot(self) -> Optional[bytes]:
+        """ Called under lock, returns None if trader book is not ready yet """
+        book: Optional[AbstractAccountBook] = self._trader_book_factory()
+        if not book:
+            return None
+        return dumps({
+            "type": "snapshot",
+            "seq": self._seq,
+            "orders": book.get_open_orders(),
+            "positions": book.get_open_positions(),
+            "balance": book.get_balance()
+        }) + b"\n"
+
+    def _accept_thread(self) -> None:
+        server: socket.socket = self._server
+        while not self._stopped.is_set():
+            try:
+                sock, address = server.accept()
+                threading.Thread(target=self._subscribe, args=(sock, address), daemon=True).start()
+            except Exception as e:
+                if self._stopped.is_set():
+                    return
+                logger.error(f"Error while accepting relay subscriber: {e}")
+                self._stopped.wait(1)
+
+    def _subscribe(self, sock: socket.socket, address: tuple) -> None:
+        """ Checks token of node, then sends snapshot and adds node to subscribers """
+        try:
+            sock.settimeout(10)
+            hello: dict = loads(sock.makefile("rb").readline() or b"{}")
+            token: object = hello.get("token")
+            if not isinstance(token, str) or not hmac.compare_digest(token.encode(), self._token.encode()):
+                logger.warning(f"Relay subscriber {address} sent wrong token")
+                sock.close()
+                return
+            sock.settimeout(None)
+        except Exception as e:
+            logger.warning(f"Relay subscriber {address} handshake error: {e}")
+            sock.close()
+            return
+
+        subscriber: _RelaySubscriber = _RelaySubscriber(sock, address, self._queue_size)
+        with self._lock:
+            if self._stopped.is_set():
+                sock.close()
+                return
+            # Heartbeat instead of snapshot confirms subscription, while trader book is not ready
+            subscriber.put(self._snapshot() or dumps({"type": "heartbeat", "seq": self._seq}) + b"\n")
+            self._subscribers.add(subscriber)
+        subscriber.start()
+        logger.info(f"Relay subscriber {address} connected, seq={self._seq}")
+
+    def _snapshot_thread(self) -> None:
+        """ Sends full trader book to all nodes, it also works as heartbeat of relay """
+        while not self._stopped.wait(timeout=self._snapshot_interval):
+            try:
+                with self._lock:
+                    self._broadcast(self._snapshot() or dumps({"type": "heartbeat", "seq": self._seq}) + b"\n")
+            except Exception as e:
+                logger.error(f"Error in relay snapshot thread: {e}")
@@ -4,37 +4,87 @@ from datetime import datetime
 from typing import Callable, Literal, Optional
 
 from .abstract import AbstractService
-from .connectors import AbstractExchangeConnector, AbstractTraderWebsocket, EXCHANGE_TO_WEBSOCKET
-from ..configuration import logger
-from ..schemas.enums import BalanceStatus
-from ..schemas.models import UserSettings, TraderSettings
+from .connectors import (AbstractAccountBook, AbstractExchangeConnector, AbstractTraderWebsocket, ClientSubscription,
+                         EXCHANGE_TO_WEBSOCKET, EXCHANGE_TO_RELAY_WEBSOCKET)
+from ..configuration import config, logger
+from ..devtools import FrameRecorder
+from ..schemas.models import TraderSettings
 from ..schemas.types import ServiceStatus
 
 
+class _FrameDeduplicator:
+    """ Drops the second copy of trader frame, while old and new websockets of one trader overlap on restart """
+
+    def __init__(self) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self._active_until: float = 0.0  # monotonic time
+        self._seen: set[str | bytes] = set()
+
+    def activate(self, duration: float) -> None:
+        with self._lock:
+            self._active_until = max(self._active_until, time.monotonic() + duration)
+
+    def is_duplicate(self, frame: str | bytes | dict) -> bool:
+        if time.monotonic() > self._active_until:
+            if self._seen:
+                with self._lock:
+                    self._seen.clear()
+            return False
+
+        # Each frame comes at most twice, once from every stream, so it is forgotten after second copy
+        key: str | bytes = frame if isinstance(frame, (str, bytes)) else repr(frame)
+        with self._lock:
+            if key in self._seen:
+                self._seen.discard(key)
+                return True
+            self._seen.add(key)
+            return False
+
+
 class TraderWebsocketService(AbstractService):
     """
     Класс, который отвечает за подключение вебсокетом к трейдеру, и прослушке его сигналов.
+    Вебсокет один на процесс, его события копируются во все подписанные аккаунты клиентов.
+    Статусы клиентов (настройки, баланс) проверяет подписка каждого клиента.
+    При перезапуске новый вебсокет открывается до закрытия старого (make-before-break), пока работают оба,
+    повторы событий отбрасываются.
     """
 
     def __init__(
             self,
             connector_factory: Callable[[Literal["trader", "client"]], Optional[AbstractExchangeConnector]],
-            user_settings: UserSettings,
             trader_settings: TraderSettings,
+            handover_timeout: int | float = config.WEBSOCKET_HANDOVER_TIMEOUT,
+            handover_overlap: int | float = config.WEBSOCKET_HANDOVER_OVERLAP
     ) -> None:
+        """
+        :param connector_factory: Фабрика, из которой берется коннектор трейдера.
+        :param handover_timeout: Сколько ждать первое сообщение нового вебсокета при перезапуске.
+        :param handover_overlap: Сколько старый вебсокет работает после переключения на новый.
+        """
         super().__init__()
 
         self._connector_factory: Callable[[Literal["trader", "client"]], Optional[AbstractExchangeConnector]] = \
             connector_factory
-        self._user_settings: UserSettings = user_settings
         self._trader_settings: TraderSettings = trader_settings
-        self._balance_status: BalanceStatus = BalanceStatus.NOT_DEFINED
+        self._clients: dict[str, ClientSubscription] = {}
+        self._event_listeners: list[Callable[[dict], None]] = []
 
         self._websocket: Optional[AbstractTraderWebsocket] = None
+        self._websocket_settings: Optional[TraderSettings] = None  # settings, with which websocket was started
+        self._handover_websocket: Optional[AbstractTraderWebsocket] = None  # new websocket, while it is confirmed
+        self._handover_timeout: int | float = handover_timeout
+        self._handover_overlap: int | float = handover_overlap
+        self._deduplicator: _FrameDeduplicator = _FrameDeduplicator()
+        self._restart_lock: threading.Lock = threading.Lock()
         self._next_restart_time: int | float = 0.0  # for restart websocket in while True cycle
         self._restart_interval: int | float = 60 * 60 * 12  # 12 hours
         self._last_message_time: int | float = 0.0  # for logs
 
+        # Raw frames are recorded for replay, if WEBSOCKET_RECORD_PATH is set
+        self._recorder: Optional[FrameRecorder] = \
+            FrameRecorder(config.WEBSOCKET_RECORD_PATH) if config.WEBSOCKET_RECORD_PATH else None
+
         # Launch restart thread one time
         threading.Thread(target=self._restart_thread).start()
 
@@ -52,26 +102,113 @@ class TraderWebsocketService(AbstractService):
             logger.info("Status to start trader websocket is false")
             return
 
-        logger.info("Starting trader websocket")
-        self._websocket = EXCHANGE_TO_WEBSOCKET[self._trader_settings.exchange](
+        self._websocket = self._create_websocket()
+        self._websocket.start_websocket()
+
+    def add_client(self, client: ClientSubscription) -> None:
+        """ Подписывает клиента на события трейдера, в том числе в текущем вебсокете. """
+        logger.info(f"Client {client.client_id} subscribed to trader websocket")
+        self._clients[client.client_id] = client
+        for websocket in self._live_websockets():
+            websocket.add_client(client)
+
+    def remove_client(self, client_id: str) -> None:
+        """ Отписывает клиента от событий трейдера. """
+        logger.info(f"Client {client_id} unsubscribed from trader websocket")
+        self._clients.pop(client_id, None)
+        for websocket in self._live_websockets():
+            websocket.remove_client(client_id)
+
+    def add_event_listener(self, callback: Callable[[dict], None]) -> None:
+        """ Добавляет коллбэк, в который передается каждое событие трейдера, в том числе после перезапуска. """
+        self._event_listeners.append(callback)
+        for websocket in self._live_websockets():
+            websocket.add_event_listener(callback)
+
+    def get_trader_book(self) -> Optional[AbstractAccountBook]:
+        """ Возвращает книгу ордеров и позиций трейдера, если она уже заполнена. """
+        if self._websocket:
+            book: Optional[AbstractAccountBook] = self._websocket.get_trader_book()
+            if book and book.is_ready():
+                return book
+
+    def _live_websockets(self) -> list[AbstractTraderWebsocket]:
+        return [w for w in (self._websocket, self._handover_websocket) if w]
+
+    def _create_websocket(self) -> AbstractTraderWebsocket:
+        # Client node of relay takes trader stream from relay node instead of exchange
+        websockets: dict = EXCHANGE_TO_RELAY_WEBSOCKET if config.RELAY_URL else EXCHANGE_TO_WEBSOCKET
+        logger.info(f"Starting trader websocket{' from relay ' + config.RELAY_URL if config.RELAY_URL else ''}")
+        websocket: AbstractTraderWebsocket = websockets[self._trader_settings.exchange](
             callback=self._message_middleware,
             connector_factory=self._connector_factory,
-            user_settings=self._user_settings,
+            user_settings=None,
             trader_settings=self._trader_settings,
+            clients=list(self._clients.values()),
         )
+        for callback in self._event_listeners:
+            websocket.add_event_listener(callback)
+        self._websocket_settings = self._trader_settings
         self._next_restart_time: int | float = time.time() + self._restart_interval
-        self._websocket.start_websocket()
+        return websocket
 
     def _restart(self) -> None:
-        """ Перезапуск соединения с вебсокетом трейдера. """
-        logger.info("Restarting trader websocket")
-        if self._websocket:
+        """
+        Перезапуск соединения с вебсокетом трейдера: новый вебсокет запускается и ждет первое сообщение,
+        события идут через текущий вебсокет, затем он переключается на новый, а старый закрывается
+        после handover_overlap секунд. Пока открыты оба, повторы событий отбрасываются.
+        """
+        with self._restart_lock:
+            logger.info("Restarting trader websocket")
+            previous: Optional[AbstractTraderWebsocket] = self._websocket
+            previous_settings: Optional[TraderSettings] = self._websocket_settings
+            same_account: bool = bool(previous and previous_settings) and \
+                (previous_settings.exchange, previous_settings.api_key) == \
+                (self._trader_settings.exchange, self._trader_settings.api_key)
+
+            if not self._check_statuses():
+                logger.info("Status to start trader websocket is false")
+                self._stop_websocket(previous, close_listen_key=True)
+                self._websocket_settings = None  # stopped websocket is not taken over on next start
+                return
+
+            self._deduplicator.activate(self._handover_timeout + self._handover_overlap)
+            websocket: AbstractTraderWebsocket = self._create_websocket()
+            self._handover_websocket = websocket
             try:
-                self._websocket.stop_websocket()
+                websocket.start_websocket()
+                confirmed: bool = websocket.wait_confirmed(timeout=self._handover_timeout)
             except Exception as e:
-                logger.error(f"Can not stop previous websocket connection: {e}")
+                logger.error(f"Can not start new websocket connection: {e}")
+                confirmed = False
+
+            if not confirmed and previous and same_account:
+                # Old stream still works for the same trader, so it is kept until next attempt
+                logger.error(f"New trader websocket is not confirmed in {self._handover_timeout}s, keep previous")
+                self._handover_websocket = None
+                self._stop_websocket(websocket, close_listen_key=False)
+                self._websocket_settings = previous_settings
+                self._next_restart_time = time.time() + self._handover_timeout * 6
+                return
+
+            if same_account:
+                websocket.take_over(previous)
+            self._websocket, self._handover_websocket = websocket, None
+            logger.info("Trader websocket is switched to new connection")
 
-        self.start()
+            # Listen key of the same account is shared by both streams, so it is not closed with old one
+            if previous:
+                self._deduplicator.activate(self._handover_overlap + 1)
+                threading.Timer(self._handover_overlap, self._stop_websocket,
+                                args=(previous, not same_account)).start()
+
+    @staticmethod
+    def _stop_websocket(websocket: Optional[AbstractTraderWebsocket], close_listen_key: bool) -> None:
+        if websocket:
+            try:
+                websocket.stop_websocket(close_listen_key=close_listen_key)
+            except Exception as e:
+                logger.error(f"Can not stop previous websocket connection: {e}")
 
     def _restart_thread(self) -> None:
         """ Функция перезапускает вебсокет каждые 12 часов. """
@@ -87,10 +224,22 @@ class TraderWebsocketService(AbstractService):
     def _message_middleware(self, *args, **kwargs) -> None:
         """ Мидлварь для принятия сообщения, в котором проводятся дополнительные проверки. """
         logger.debug(f"Websocket message: {args}, {kwargs}")
+        if len(args) > 1 and self._deduplicator.is_duplicate(args[1]):
+            return
         self._last_message_time = time.time()
 
+        if self._recorder and len(args) > 1 and isinstance(args[1], (str, bytes)):
+            try:
+                self._recorder.write(args[1], self._last_message_time)
+            except Exception as e:
+                logger.error(f"Error while recording websocket message: {e}")
+
         if not self._check_statuses():
             logger.info("Status for processing ws message is false.")
+            try:
+                self._websocket.handle_state_message(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"Exception while updating trader state({args=}, {kwargs=}): {e}")
             return
 
         try:
@@ -101,34 +250,18 @@ class TraderWebsocketService(AbstractService):
     def _check_statuses(self) -> bool:
         """ Функция проверяет все статусы и переменные, перед тем как дать разрешение на продолжение работы. """
         result: bool = True
-        if not self._connector_factory("client"):
-            logger.debug("Can not proceed polling becouse client connector factory")
-            result = False
         if not self._connector_factory("trader"):
-            logger.debug("Can not proceed polling becouse trader connector factory")
-            result = False
-        if not self._user_settings.status:
-            logger.debug("Can not proceed polling becouse _user_settings.status")
+            logger.debug("Can not proceed websocket becouse trader connector factory")
             result = False
         if not self._trader_settings.status:
-            logger.debug("Can not proceed polling becouse _trader_settings.status")
-            result = False
-        if self._balance_status != BalanceStatus.CAN_TRADE:
-            logger.debug("Can not proceed polling becouse _balance_status")
+            logger.debug("Can not proceed websocket becouse _trader_settings.status")
             result = False
         return result
 
-    def on_balance_status_update(self, balance_status: BalanceStatus):
-        logger.info(f"Balance status update: {balance_status}")
-        self._balance_status = balance_status
-
-    def on_user_settings_update(self, u: UserSettings) -> None:
-        logger.info(f"User settings update event: {u}")
-        self._user_settings: UserSettings = u
-        # User settings update always got before trader settings update, so we dont need to restart ws here.
-        # self._restart()
-
     def on_trader_settings_update(self, u: TraderSettings) -> None:
         logger.info(f"Trader settings update event: {u}")
+        if u == self._trader_settings:
+            logger.info("Trader settings are not changed, trader websocket is not restarted")
+            return
         self._trader_settings: TraderSettings = u
         self._restart()
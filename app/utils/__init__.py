@@ -1 +1,2 @@
 from .helpers import *
+from .lanes import LanesExecutor
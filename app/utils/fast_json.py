@@ -0,0 +1,14 @@
+"""
+Module with JSON functions of hot paths: user data stream frames and relay messages.
+orjson is a dependency of project, json fallback only keeps app working in environment installed without lock file.
+"""
+__all__ = ["dumps", "loads", ]
+
+try:
+    from orjson import dumps, loads
+except ImportError:  # json is several times slower
+    from json import dumps as _dumps, loads
+
+    def dumps(obj) -> bytes:
+        """ Compact bytes, like orjson.dumps """
+        return _dumps(obj, separators=(",", ":")).encode()
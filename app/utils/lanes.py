@@ -0,0 +1,87 @@
+"""
+Module with executor, which runs tasks with the same key one by one and tasks with different keys in parallel
+"""
+__all__ = ["LanesExecutor", ]
+
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Callable
+
+from app.configuration import logger
+
+
+class _Lane(threading.Thread):
+    """ One serial lane: tasks are buffered in heap by order key and run one by one """
+
+    def __init__(self, name: str, reorder_window: float) -> None:
+        super().__init__(name=name, daemon=True)
+
+        self._reorder_window: float = reorder_window
+        self._condition: threading.Condition = threading.Condition()
+        # (order key, arrival seq, ready time, function, args)
+        self._heap: list[tuple[tuple, int, float, Callable[..., Any], tuple]] = []
+        self._seq: itertools.count = itertools.count()
+        self._running: bool = True
+
+    def qsize(self) -> int:
+        return len(self._heap)
+
+    def put(self, order_key: tuple, function: Callable[..., Any], args: tuple) -> None:
+        with self._condition:
+            heapq.heappush(
+                self._heap, (order_key, next(self._seq), time.monotonic() + self._reorder_window, function, args))
+            self._condition.notify()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+
+    def run(self) -> None:
+        while True:
+            with self._condition:
+                while True:
+                    if not self._running:
+                        return
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+                    # Task waits reorder window, so task with lower key, which came a bit later, runs first
+                    delay: float = self._heap[0][2] - time.monotonic()
+                    if delay <= 0:
+                        _, _, _, function, args = heapq.heappop(self._heap)
+                        break
+                    self._condition.wait(delay)
+
+            try:
+                function(*args)
+            except Exception as e:
+                logger.error(f"Error in {self.name} task {function.__name__}: {e}")
+
+
+class LanesExecutor:
+    """
+    Исполнитель, в котором задачи распределяются по ключу (например, символу) в последовательные очереди.
+    Задачи с одним ключом выполняются по порядку, с разными ключами - параллельно.
+    Внутри очереди задачи сортируются по order_key в течение reorder_window секунд после получения.
+    """
+
+    def __init__(self, lanes: int, reorder_window: float = 0.0, name: str = "lane") -> None:
+        self._lanes: list[_Lane] = [_Lane(f"{name}-{i}", reorder_window) for i in range(lanes)]
+        for lane in self._lanes:
+            lane.start()
+
+    def submit(self, key: str, order_key: tuple, function: Callable[..., Any], *args) -> None:
+        """ Puts task to lane of key, tasks of lane run in order of order_key, then arrival """
+        self._lanes[hash(key) % len(self._lanes)].put(order_key, function, args)
+
+    def qsize(self) -> int:
+        """ Amount of tasks waiting in all lanes """
+        return sum(lane.qsize() for lane in self._lanes)
+
+    def shutdown(self) -> None:
+        """ Stops lanes, tasks which are not started yet are dropped """
+        for lane in self._lanes:
+            lane.stop()
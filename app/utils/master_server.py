@@ -0,0 +1,232 @@
+"""
+Module with client of master-server: pooled keep-alive session, timeouts, jittered retries and circuit breaker.
+Notifications are queued and sent by own thread, so slow master-server never blocks trading threads.
+"""
+__all__ = ["CircuitBreaker", "MasterServerClient", "master_server", ]
+
+import itertools
+import random
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Hashable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.configuration import config, logger
+from app.metrics import executor_queue_depth, master_server_requests
+from app.schemas.exceptions import MasterServerConnectionError
+from app.schemas.types import M
+
+
+class CircuitBreaker:
+    """
+    Breaker opens after threshold consecutive failures and rejects requests for cooldown,
+    then lets one probe request through: its success closes breaker, failure opens it again.
+    """
+
+    def __init__(self, threshold: int, cooldown: float) -> None:
+        self._threshold: int = threshold
+        self._cooldown: float = cooldown
+        self._lock: threading.Lock = threading.Lock()
+        self._failures: int = 0
+        self._opened_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def retry_in(self) -> float:
+        """ Seconds until next request is allowed, 0 if it is allowed now """
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(self._opened_at + self._cooldown - time.monotonic(), 0.0)
+
+    def allow(self) -> bool:
+        """ Returns True if request can be sent, in half open state only one probe is allowed per cooldown """
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self._cooldown:
+                return False
+            self._opened_at = time.monotonic()  # probe, next one waits cooldown again
+            return True
+
+    def record(self, success: bool) -> None:
+        with self._lock:
+            if success:
+                if self._opened_at is not None:
+                    logger.info("Master-server circuit breaker is closed")
+                self._failures, self._opened_at = 0, None
+                return
+            self._failures += 1
+            if self._failures >= self._threshold:
+                if self._opened_at is None:
+                    logger.warning(f"Master-server circuit breaker is open after {self._failures} failures")
+                self._opened_at = time.monotonic()
+
+
+@dataclass
+class _Outbound:
+    endpoint: str
+    data: str
+    on_success: Optional[Callable[[], None]]
+    min_interval: float = 0.0
+    not_before: float = 0.0  # monotonic time
+    attempts: int = 0
+
+
+class MasterServerClient:
+    """
+    Клиент мастер-сервера. Модели запрашиваются синхронно с повторами, уведомления ставятся в очередь.
+    Уведомления с одним ключом схлопываются: в очереди остается только последнее, поэтому после долгой
+    недоступности мастер-сервера отправляется актуальный баланс, а не вся история.
+    """
+
+    def __init__(
+            self,
+            base_url: str = f"http://{config.MASTER_SERVER_HOST}:{config.MASTER_SERVER_PORT}",
+            timeout: tuple[float, float] = (config.MASTER_SERVER_CONNECT_TIMEOUT, config.MASTER_SERVER_READ_TIMEOUT),
+            pool_size: int = config.MASTER_SERVER_POOL_SIZE,
+            queue_size: int = config.MASTER_SERVER_QUEUE_SIZE,
+            retries: int = config.MASTER_SERVER_RETRIES,
+            backoff: float = config.MASTER_SERVER_RETRY_BACKOFF,
+            max_backoff: float = config.MASTER_SERVER_MAX_RETRY_BACKOFF,
+            breaker: Optional[CircuitBreaker] = None
+    ) -> None:
+        self._base_url: str = base_url
+        self._timeout: tuple[float, float] = timeout
+        self._queue_size: int = queue_size
+        self._retries: int = retries
+        self._backoff: float = backoff
+        self._max_backoff: float = max_backoff
+        self._breaker: CircuitBreaker = breaker or CircuitBreaker(
+            threshold=config.MASTER_SERVER_BREAKER_THRESHOLD, cooldown=config.MASTER_SERVER_BREAKER_COOLDOWN)
+
+        self._session: requests.Session = requests.Session()
+        adapter: HTTPAdapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+        # Pending notifications by coalesce key in order of submit, worker thread is started on first submit
+        self._condition: threading.Condition = threading.Condition()
+        self._pending: OrderedDict[Hashable, _Outbound] = OrderedDict()
+        self._sent_at: dict[Hashable, float] = {}  # coalesce key -> monotonic time of last successful send
+        self._keys: itertools.count = itertools.count()
+        self._worker: Optional[threading.Thread] = None
+        executor_queue_depth.set_function(lambda: len(self._pending), executor="master_server")
+
+    def get_model(self, endpoint: str, model: type[M]) -> M:
+        """ Запрашивает модель с мастер-сервера, повторяет запрос с паузой при ошибке. """
+        for attempt in range(self._retries):
+            try:
+                response: requests.Response = self._request("GET", f"{config.VERSION}/{endpoint}")
+                return model(**response.json())
+            except (requests.RequestException, MasterServerConnectionError) as e:
+                if attempt + 1 == self._retries:
+                    raise
+                delay: float = max(self._jitter(attempt), self._breaker.retry_in())
+                logger.warning(f"Error while requesting {endpoint} from master-server, retry in {delay:.1f}s: {e}")
+                time.sleep(delay)
+
+    def submit(
+            self,
+            endpoint: str,
+            data: str,
+            key: Optional[Hashable] = None,
+            min_interval: float = 0.0,
+            on_success: Optional[Callable[[], None]] = None
+    ) -> None:
+        """
+        Ставит POST запрос в очередь и сразу возвращается.
+        :param key: Ключ схлопывания: новый запрос заменяет ждущий запрос с тем же ключом.
+        :param min_interval: Запросы с ключом отправляются не чаще, чем раз в min_interval секунд.
+        :param on_success: Вызывается в потоке клиента после успешной отправки.
+        """
+        key = ("submit", next(self._keys)) if key is None else key
+        with self._condition:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._worker_thread, name="master-server", daemon=True)
+                self._worker.start()
+
+            if key not in self._pending and len(self._pending) >= self._queue_size:
+                _, dropped = self._pending.popitem(last=False)
+                master_server_requests.inc(endpoint=dropped.endpoint, result="dropped")
+                logger.warning(f"Master-server queue is full, dropped request to {dropped.endpoint}")
+
+            sent_at: Optional[float] = self._sent_at.get(key)
+            not_before: float = sent_at + min_interval if sent_at is not None else 0.0
+            previous: Optional[_Outbound] = self._pending.get(key)
+            if previous:
+                # Latest data replaces pending one, but keeps its place, retry delay and attempts
+                previous.data, previous.on_success = data, on_success
+            else:
+                self._pending[key] = _Outbound(endpoint, data, on_success, min_interval, not_before)
+            self._condition.notify()
+
+    def _request(self, method: str, endpoint: str, data: Optional[str] = None) -> requests.Response:
+        if not self._breaker.allow():
+            master_server_requests.inc(endpoint=endpoint, result="rejected")
+            raise MasterServerConnectionError(status_code=0, response_text="Circuit breaker is open")
+        try:
+            response: requests.Response = self._session.request(
+                method, f"{self._base_url}/{endpoint}", data=data, timeout=self._timeout)
+            if response.status_code != 200:
+                raise MasterServerConnectionError(status_code=response.status_code, response_text=response.text)
+        except Exception:
+            self._breaker.record(success=False)
+            master_server_requests.inc(endpoint=endpoint, result="error")
+            raise
+        self._breaker.record(success=True)
+        master_server_requests.inc(endpoint=endpoint, result="ok")
+        return response
+
+    def _jitter(self, attempt: int) -> float:
+        """ Full jitter: random delay up to exponential backoff, so nodes do not retry at the same time """
+        return random.uniform(0, min(self._backoff * 2 ** attempt, self._max_backoff))
+
+    def _next(self) -> tuple[Hashable, _Outbound]:
+        """ Waits until some pending request can be sent and pops it """
+        with self._condition:
+            while True:
+                now: float = time.monotonic()
+                ready: list[Hashable] = [k for k, o in self._pending.items() if o.not_before <= now]
+                if ready and not self._breaker.retry_in():
+                    return ready[0], self._pending.pop(ready[0])
+                delays: list[float] = [o.not_before - now for o in self._pending.values()]
+                self._condition.wait(timeout=max(min(delays, default=60), self._breaker.retry_in(), 0.01))
+
+    def _worker_thread(self) -> None:
+        while True:
+            key, outbound = self._next()
+            try:
+                self._request("POST", outbound.endpoint, outbound.data)
+            except Exception as e:
+                outbound.attempts += 1
+                with self._condition:
+                    if key in self._pending:
+                        continue  # newer data is already queued
+                    if outbound.attempts >= self._retries:
+                        logger.error(f"Error while sending {outbound.endpoint} to master-server, "
+                                     f"dropped after {outbound.attempts} attempts: {e}")
+                        continue
+                    outbound.not_before = time.monotonic() + self._jitter(outbound.attempts - 1)
+                    self._pending[key] = outbound
+                    self._pending.move_to_end(key, last=False)
+                logger.warning(f"Error while sending {outbound.endpoint} to master-server, will retry: {e}")
+                continue
+
+            if outbound.min_interval:
+                with self._condition:
+                    self._sent_at[key] = time.monotonic()
+            if outbound.on_success:
+                try:
+                    outbound.on_success()
+                except Exception as e:
+                    logger.error(f"Error in master-server success callback: {e}")
+
+
+master_server = MasterServerClient()
@@ -3,12 +3,12 @@ import time
 import binance.lib.utils  # Импорт только модуля utils до основной библиотеки
 import requests
 
-from app.configuration import logger
+from app.configuration import config, logger
 
 # Monkey patch of binance timestamp lib
 try:
     timestamp_offset: float = requests.get(
-        url="https://fapi.binance.com/fapi/v1/time"
+        url=f"{config.BINANCE_REST_URL}/fapi/v1/time"
     ).json()["serverTime"] - int(time.time() * 1000)
 
 
@@ -0,0 +1,53 @@
+"""
+Benchmark of user data stream frames decoding.
+Run from repository root: MASTER_SERVER_HOST=localhost python -m benchmarks.decode_events
+"""
+import json
+import timeit
+
+from app.services.connectors.binance_conn.events import AccountUpdateEvent, OrderTradeUpdateEvent
+from app.utils.fast_json import loads
+
+ORDER_TRADE_UPDATE: str = json.dumps({
+    "e": "ORDER_TRADE_UPDATE", "E": 1568879465651, "T": 1568879465650,
+    "o": {
+        "s": "BTCUSDT", "c": "TEST", "S": "SELL", "o": "TRAILING_STOP_MARKET", "f": "GTC", "q": "0.001", "p": "0",
+        "ap": "0", "sp": "7103.04", "x": "NEW", "X": "NEW", "i": 8886774, "l": "0", "z": "0", "L": "0", "N": "USDT",
+        "n": "0", "T": 1568879465650, "t": 0, "b": "0", "a": "9.91", "m": False, "R": False, "wt": "CONTRACT_PRICE",
+        "ot": "TRAILING_STOP_MARKET", "ps": "LONG", "cp": False, "AP": "7476.89", "cr": "5.0", "pP": False, "si": 0,
+        "ss": 0, "rp": "0", "V": "EXPIRE_TAKER", "pm": "OPPONENT", "gtd": 0
+    }
+})
+
+ACCOUNT_UPDATE: str = json.dumps({
+    "e": "ACCOUNT_UPDATE", "E": 1564745798939, "T": 1564745798938,
+    "a": {
+        "m": "ORDER",
+        "B": [{"a": "USDT", "wb": "122624.12345678", "cw": "100.12345678", "bc": "50.12345678"}],
+        "P": [
+            {"s": "BTCUSDT", "pa": "20", "ep": "6563.66500", "bep": "0", "cr": "0", "up": "2850.21200",
+             "mt": "isolated", "iw": "13200.70726908", "ps": "LONG"},
+            {"s": "BTCUSDT", "pa": "-10", "ep": "6563.86000", "bep": "6563.6", "cr": "-45.04000000",
+             "up": "-1423.15600", "mt": "isolated", "iw": "6570.42511771", "ps": "SHORT"},
+        ]
+    }
+})
+
+
+def _bench(name: str, func: callable, number: int = 100_000) -> None:
+    seconds: float = min(timeit.repeat(func, number=number, repeat=5))
+    print(f"{name:<40} {seconds / number * 1e6:8.2f} us/msg")
+
+
+def main() -> None:
+    print(f"json backend: {loads.__module__}")
+    _bench("json.loads ORDER_TRADE_UPDATE", lambda: json.loads(ORDER_TRADE_UPDATE))
+    _bench("loads ORDER_TRADE_UPDATE", lambda: loads(ORDER_TRADE_UPDATE))
+    _bench("decode ORDER_TRADE_UPDATE", lambda: OrderTradeUpdateEvent.from_dict(loads(ORDER_TRADE_UPDATE)))
+    _bench("json.loads ACCOUNT_UPDATE", lambda: json.loads(ACCOUNT_UPDATE))
+    _bench("loads ACCOUNT_UPDATE", lambda: loads(ACCOUNT_UPDATE))
+    _bench("decode ACCOUNT_UPDATE", lambda: AccountUpdateEvent.from_dict(loads(ACCOUNT_UPDATE)))
+
+
+if __name__ == "__main__":
+    main()
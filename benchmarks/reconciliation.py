@@ -0,0 +1,62 @@
+"""
+Benchmark of polling cycle diff: indexed reconcile against former list based helpers.
+Run from repository root: MASTER_SERVER_HOST=localhost python -m benchmarks.reconciliation
+"""
+import random
+import timeit
+
+from app.schemas.types import Order, Position
+from app.services.connectors.binance_conn.reconciliation import reconcile
+
+SYMBOLS: list[str] = [f"SYM{i}USDT" for i in range(300)]
+SIDES: tuple[str, ...] = ("LONG", "SHORT")
+
+
+def _accounts(orders: int) -> tuple[list[Position], list[Position], list[Order], list[Order]]:
+    """ Trader and client accounts, where 90% of trader orders are copied and client has 5% of stale orders """
+    rnd: random.Random = random.Random(orders)
+    trader_positions: list[Position] = [{"symbol": s, "positionSide": p} for s in SYMBOLS for p in SIDES
+                                        if rnd.random() < 0.5]
+    client_positions: list[Position] = [p for p in trader_positions if rnd.random() < 0.9] + [
+        {"symbol": s, "positionSide": p} for s in SYMBOLS for p in SIDES if rnd.random() < 0.05]
+    trader_orders: list[Order] = [{"orderId": i, "symbol": rnd.choice(SYMBOLS), "positionSide": rnd.choice(SIDES),
+                                   "origQty": "0.01"} for i in range(orders)]
+    client_orders: list[Order] = [{"clientOrderId": str(o["orderId"]), "symbol": o["symbol"],
+                                   "positionSide": o["positionSide"]} for o in trader_orders if rnd.random() < 0.9]
+    client_orders += [{"clientOrderId": f"stale{i}", "symbol": rnd.choice(SYMBOLS), "positionSide": "LONG"}
+                      for i in range(orders // 20)]
+    return trader_positions, client_positions, trader_orders, client_orders
+
+
+def _legacy(trader_positions: list[Position], client_positions: list[Position], trader_orders: list[Order],
+            client_orders: list[Order]) -> int:
+    """ Diff as it was done by app.utils find_* helpers and _copy_trader_orders: `in` against lists """
+    trader_keys: set = {(p["symbol"], p["positionSide"]) for p in trader_positions}
+    close: list = [p for p in client_positions if (p["symbol"], p["positionSide"]) not in trader_keys]
+    trader_ids: list[str] = [str(o["orderId"]) for o in trader_orders]
+    cancel: list = [o for o in client_orders if o["clientOrderId"] not in trader_ids]
+    client_ids: list[str] = [o["clientOrderId"] for o in client_orders]
+    unique: list = [o for o in trader_orders if str(o["orderId"]) not in client_ids]
+    trader_positions_t: list[tuple] = [(p["symbol"], p["positionSide"]) for p in trader_positions]
+    client_positions_t: list[tuple] = [(p["symbol"], p["positionSide"]) for p in client_positions]
+    copy: list = [o for o in unique if ((o["symbol"], o["positionSide"]) in trader_positions_t)
+                  == ((o["symbol"], o["positionSide"]) in client_positions_t)]
+    return len(close) + len(cancel) + len(copy)
+
+
+def main() -> None:
+    for orders in (100, 1_000, 10_000):
+        accounts = _accounts(orders)
+        plan = reconcile(*accounts)
+        assert len(plan.close_positions) + len(plan.cancel_orders) + len(plan.copy_orders) == _legacy(*accounts)
+
+        number: int = max(10_000 // orders, 1)
+        legacy: float = min(timeit.repeat(lambda: _legacy(*accounts), number=1, repeat=3))
+        indexed: float = min(timeit.repeat(lambda: reconcile(*accounts), number=number, repeat=5)) / number
+        print(f"{orders:>6} orders: legacy {legacy * 1000:10.2f} ms, reconcile {indexed * 1000:8.2f} ms, "
+              f"x{legacy / indexed:.0f} (plan: {len(plan.close_positions)} close, {len(plan.cancel_orders)} cancel, "
+              f"{len(plan.copy_orders)} copy, {len(plan.skipped)} skip)")
+
+
+if __name__ == "__main__":
+    main()
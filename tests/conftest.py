@@ -0,0 +1,4 @@
+import os
+
+# Configuration requires master-server host on import, tests do not call it
+os.environ.setdefault("MASTER_SERVER_HOST", "localhost")
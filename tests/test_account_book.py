@@ -0,0 +1,92 @@
+from app.services.connectors.binance_conn.account_book import BinanceAccountBook
+
+STARTED_AT: int = 1_700_000_000_000  # time when REST snapshot was requested
+
+
+def _order(order_id: int, update_time: int) -> dict:
+    return {"orderId": order_id, "symbol": "BTCUSDT", "status": "NEW", "updateTime": update_time}
+
+
+def _position(symbol: str, amount: str, update_time: int = STARTED_AT - 100) -> dict:
+    return {"symbol": symbol, "positionSide": "BOTH", "positionAmt": amount, "updateTime": update_time}
+
+
+def _order_event(order_id: int, status: str, event_time: int) -> dict:
+    return {"e": "ORDER_TRADE_UPDATE", "T": event_time, "o": {
+        "i": order_id, "c": f"c{order_id}", "s": "BTCUSDT", "S": "BUY", "ps": "BOTH", "o": "LIMIT", "ot": "LIMIT",
+        "X": status, "f": "GTC", "q": "1", "z": "0", "p": "1", "ap": "0", "sp": "0"}}
+
+
+def _account_event(event_time: int, amount: str, balance: str) -> dict:
+    return {"e": "ACCOUNT_UPDATE", "T": event_time, "a": {
+        "B": [{"a": "USDT", "wb": balance}],
+        "P": [{"s": "BTCUSDT", "ps": "BOTH", "pa": amount, "ep": "1", "up": "0", "mt": "cross", "iw": "0"}]}}
+
+
+def test_snapshot_replaces_stale_state_and_reports_drift():
+    book = BinanceAccountBook()
+    book.handle_event(_order_event(1, "NEW", STARTED_AT - 100))
+    book.handle_event(_account_event(STARTED_AT - 100, amount="1", balance="100"))
+
+    drift = book._apply_snapshot([_order(2, STARTED_AT - 50)], [_position("ETHUSDT", "3")], 90.0, STARTED_AT)
+
+    assert [o["orderId"] for o in book.get_open_orders()] == [2]
+    assert [p["symbol"] for p in book.get_open_positions()] == ["ETHUSDT"]
+    assert book.get_balance() == 90.0
+    assert len(drift) == 5  # order 1, order 2, BTCUSDT and ETHUSDT positions, balance
+
+
+def test_snapshot_keeps_state_updated_by_events_during_request():
+    book = BinanceAccountBook()
+    book.handle_event(_order_event(1, "NEW", STARTED_AT + 10))
+    book.handle_event(_account_event(STARTED_AT + 10, amount="2", balance="120"))
+
+    drift = book._apply_snapshot([], [_position("BTCUSDT", "1")], 100.0, STARTED_AT)
+
+    assert drift == []
+    assert [o["orderId"] for o in book.get_open_orders()] == [1]
+    assert book.get_position("BTCUSDT", "BOTH")["positionAmt"] == "2"
+    assert book.get_balance() == 120.0
+
+
+def test_order_removed_by_event_is_not_restored_by_older_snapshot():
+    book = BinanceAccountBook()
+    book.handle_event(_order_event(1, "NEW", STARTED_AT - 100))
+    book.handle_event(_order_event(1, "CANCELED", STARTED_AT + 10))
+
+    # Snapshot was requested before cancel event, so it still has the order
+    assert book._apply_snapshot([_order(1, STARTED_AT - 100)], [], 100.0, STARTED_AT) == []
+    assert book.get_open_orders() == []
+    assert 1 in book._removed_orders
+
+    # Snapshot requested after cancel event can not have the order, removed order is forgotten
+    book._apply_snapshot([], [], 100.0, STARTED_AT + 20)
+    assert book._removed_orders == {}
+
+
+def test_stale_order_event_is_ignored():
+    book = BinanceAccountBook()
+    book.handle_event(_order_event(1, "PARTIALLY_FILLED", STARTED_AT + 10))
+    book.handle_event(_order_event(1, "NEW", STARTED_AT))
+    assert book.get_open_orders()[0]["status"] == "PARTIALLY_FILLED"
+
+
+def test_load_snapshot_trusts_relay_state_and_keeps_balance():
+    book = BinanceAccountBook()
+    book.handle_event(_order_event(1, "NEW", STARTED_AT + 10))
+    book.handle_event(_account_event(STARTED_AT + 10, amount="2", balance="120"))
+
+    book.load_snapshot([_order(2, STARTED_AT)], [], None)
+
+    assert book.is_ready()
+    assert [o["orderId"] for o in book.get_open_orders()] == [2]
+    assert book.get_open_positions() == []
+    assert book.get_balance() == 120.0
+
+
+def test_balance_listener_receives_event_balance():
+    book = BinanceAccountBook()
+    balances: list[float] = []
+    book.add_balance_listener(balances.append)
+    book.handle_event(_account_event(STARTED_AT, amount="0", balance="55.5"))
+    assert balances == [55.5]
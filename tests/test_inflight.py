@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from app.services.connectors.abstract.inflight import InflightRegistry
+
+
+def test_action_is_taken_once_per_account():
+    registry = InflightRegistry(inflight_ttl=10, completed_ttl=10)
+    key = registry.copy_key(1)
+    assert registry.begin("client", key, path="websocket")
+    assert not registry.begin("client", key, path="polling")
+    assert registry.begin("tenant", key, path="polling")  # other account
+    assert registry.begin("client", registry.cancel_key(1), path="polling")  # other action
+
+
+def test_failed_action_can_be_retried_and_completed_one_is_kept():
+    registry = InflightRegistry(inflight_ttl=10, completed_ttl=10)
+    failed, done = registry.close_key("BTCUSDT", "LONG"), registry.close_key("BTCUSDT", "SHORT")
+    registry.begin("client", failed, path="websocket")
+    registry.complete("client", failed, success=False)
+    assert registry.begin("client", failed, path="polling")
+
+    registry.begin("client", done, path="websocket")
+    registry.complete("client", done, success=True)
+    assert not registry.begin("client", done, path="polling")
+    registry.forget("client", done)  # e.g. position is opened again
+    assert registry.begin("client", done, path="polling")
+
+
+def test_lost_and_completed_actions_expire():
+    registry = InflightRegistry(inflight_ttl=0.05, completed_ttl=0.1)
+    lost, done = registry.copy_key(1), registry.copy_key(2)
+    registry.begin("client", lost, path="websocket")
+    registry.begin("client", done, path="websocket")
+    registry.complete("client", done, success=True)
+
+    time.sleep(0.06)
+    assert registry.begin("client", lost, path="polling")
+    assert not registry.begin("client", done, path="polling")
+    time.sleep(0.05)
+    assert registry.begin("client", done, path="polling")
+
+
+def test_expired_entries_are_purged():
+    registry = InflightRegistry(inflight_ttl=0.01, completed_ttl=0.01)
+    for order_id in range(100):
+        registry.begin("client", registry.copy_key(order_id), path="websocket")
+    time.sleep(0.02)
+    registry.begin("client", registry.copy_key("new"), path="websocket")
+    assert len(registry) == 1
+
+
+def test_take_completes_action_by_result_of_body():
+    registry = InflightRegistry(inflight_ttl=10, completed_ttl=10)
+    key = registry.cancel_key(1)
+    with pytest.raises(RuntimeError):
+        with registry.take("client", key, path="websocket") as taken:
+            assert taken
+            raise RuntimeError("request failed")
+
+    with registry.take("client", key, path="polling") as taken:
+        assert taken
+    with registry.take("client", key, path="websocket") as taken:
+        assert not taken
@@ -0,0 +1,46 @@
+import threading
+import time
+
+from app.utils.lanes import LanesExecutor
+
+
+def _wait(condition, timeout: float = 2) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def test_tasks_of_one_key_run_in_order_of_order_key():
+    executor = LanesExecutor(lanes=4, reorder_window=0.05)
+    done: list[int] = []
+    for order_key in [3, 1, 2]:  # arrive out of order within reorder window
+        executor.submit("BTCUSDT", (order_key,), done.append, order_key)
+    assert _wait(lambda: len(done) == 3)
+    assert done == [1, 2, 3]
+    executor.shutdown()
+
+
+def test_slow_key_does_not_block_other_keys():
+    executor = LanesExecutor(lanes=2)
+    keys = ["BTCUSDT", "ETHUSDT"]
+    while hash(keys[0]) % 2 == hash(keys[1]) % 2:  # hash of str depends on process
+        keys[1] += "X"
+    release, done = threading.Event(), []
+    executor.submit(keys[0], (0,), release.wait, 2)
+    executor.submit(keys[1], (0,), done.append, keys[1])
+    assert _wait(lambda: done == [keys[1]], timeout=1)
+    assert executor.qsize() == 0
+    release.set()
+    executor.shutdown()
+
+
+def test_failed_task_does_not_stop_lane():
+    executor = LanesExecutor(lanes=1)
+    done: list[str] = []
+    executor.submit("BTCUSDT", (0,), lambda: 1 / 0)
+    executor.submit("BTCUSDT", (1,), done.append, "next")
+    assert _wait(lambda: done == ["next"])
+    executor.shutdown()
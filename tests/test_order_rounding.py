@@ -0,0 +1,41 @@
+import pytest
+
+from app.services.connectors.binance_conn import BinanceConnector
+from app.services.connectors.binance_conn.exchange_info import ExchangeInfo, exchange_info
+from app.services.connectors.binance_conn.quantizer import SymbolQuantizer
+
+
+@pytest.fixture(autouse=True)
+def quantizers(monkeypatch):
+    monkeypatch.setattr(ExchangeInfo, "quantizers", {"BTCUSDT": SymbolQuantizer.from_filters("0.10", "0.001")})
+
+
+def _trader_order(order_id: int, type: str, quantity: float, price: str, stop_price: str = "0") -> dict:
+    return {"orderId": order_id, "symbol": "BTCUSDT", "type": type, "side": "BUY", "positionSide": "BOTH",
+            "origQty": quantity, "price": price, "stopPrice": stop_price, "timeInForce": "GTC",
+            "closePosition": False}
+
+
+def test_rounded_orders_are_sent_without_second_rounding(monkeypatch):
+    orders = exchange_info.round_orders([
+        _trader_order(1, "LIMIT", 0.12345, "43123.456"),
+        _trader_order(2, "STOP", -0.5, "43000.04", "42999.96"),
+    ])
+    assert [(o["origQty"], o["price"], o["stopPrice"]) for o in orders] == [
+        ("0.123", "43123.5", "0"), ("0.500", "43000.0", "43000.0")]
+
+    def format_again(*args):
+        raise AssertionError("order is rounded twice")
+
+    monkeypatch.setattr(ExchangeInfo, "format_quantity", format_again)
+    monkeypatch.setattr(ExchangeInfo, "format_price", format_again)
+    connector = BinanceConnector("key", "secret")
+    assert connector._create_batch_order_kwargs(orders[1]) == {
+        "symbol": "BTCUSDT", "type": "STOP", "side": "BUY", "positionSide": "BOTH", "newClientOrderId": "2",
+        "quantity": "0.500", "stopPrice": "43000.0", "price": "43000.0"}
+
+
+def test_float_values_are_rounded_by_connector():
+    kwargs = BinanceConnector("key", "secret")._create_order_kwargs(
+        symbol="BTCUSDT", type="LIMIT", side="SELL", position_side="BOTH", quantity=-0.0126, price=43123.456)
+    assert (kwargs["quantity"], kwargs["price"]) == ("0.013", "43123.5")
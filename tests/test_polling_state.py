@@ -0,0 +1,53 @@
+from app.services.connectors.abstract.polling_state import NegativeCache, PollingState
+
+NOW: float = 1_700_000_000.0
+CLOSE: tuple[str, str, str] = ("CLOSE_POSITION", "BTCUSDT", "BOTH")
+
+
+def test_failed_action_is_suppressed_with_doubling_delay():
+    cache = NegativeCache(base_delay=10, max_delay=25)
+    assert cache.add(CLOSE, "-2022", "ReduceOnly Order is rejected", now=NOW).retry_at == NOW + 10
+    assert cache.is_suppressed(CLOSE, now=NOW + 9)
+    assert not cache.is_suppressed(CLOSE, now=NOW + 10)
+    assert cache.due_symbols(now=NOW + 10) == {"BTCUSDT"}
+
+    assert cache.add(CLOSE, "-2022", "", now=NOW).retry_at == NOW + 20
+    entry = cache.add(CLOSE, "-2022", "", now=NOW)
+    assert (entry.failures, entry.retry_at) == (3, NOW + 25)  # capped by max delay
+
+
+def test_entries_of_reconciled_symbols_are_dropped_if_action_is_not_planned():
+    cache = NegativeCache(base_delay=10, max_delay=100)
+    cancel = ("CANCEL_ORDER", "BTCUSDT", "1")
+    other = ("CANCEL_ORDER", "ETHUSDT", "2")
+    for key in (CLOSE, cancel, other):
+        cache.add(key, "error", "", now=NOW)
+    cache.retain(symbols={"BTCUSDT"}, keys={CLOSE})
+    assert sorted(cache.keys()) == sorted([CLOSE, other])
+
+
+def test_only_changed_symbols_are_dirty():
+    state = PollingState(base_delay=10, max_delay=100)
+    fingerprints = {"BTCUSDT": 1, "ETHUSDT": 2}
+    assert state.dirty_symbols(fingerprints, multiplier=1) == {"BTCUSDT", "ETHUSDT"}
+    state.commit(fingerprints, reconciled={"BTCUSDT", "ETHUSDT"}, executed={"ETHUSDT"})
+
+    # ETHUSDT had executed actions, so it is checked again to confirm them
+    assert state.dirty_symbols(fingerprints, multiplier=1) == {"ETHUSDT"}
+    state.commit(fingerprints, reconciled={"ETHUSDT"}, executed=set())
+    assert state.dirty_symbols(fingerprints, multiplier=1) == set()
+    assert state.dirty_symbols({"BTCUSDT": 3, "ETHUSDT": 2}, multiplier=1) == {"BTCUSDT"}
+
+
+def test_symbol_which_left_accounts_and_multiplier_change_are_dirty():
+    state = PollingState(base_delay=10, max_delay=100)
+    state.dirty_symbols({"BTCUSDT": 1}, multiplier=1)
+    state.commit({"BTCUSDT": 1}, reconciled={"BTCUSDT"}, executed=set())
+    state.negative_cache.add(("COPY_ORDER", "XRPUSDT", "5"), "error", "")
+
+    assert state.dirty_symbols({}, multiplier=1) == {"BTCUSDT", "XRPUSDT"}
+    state.commit({}, reconciled={"BTCUSDT", "XRPUSDT"}, executed=set())
+
+    state.commit({"BTCUSDT": 1}, reconciled={"BTCUSDT"}, executed=set())
+    assert state.dirty_symbols({"BTCUSDT": 1}, multiplier=2) == {"BTCUSDT"}
+    assert len(state.negative_cache) == 0
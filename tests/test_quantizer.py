@@ -0,0 +1,25 @@
+import pytest
+
+from app.services.connectors.binance_conn.quantizer import SymbolQuantizer
+
+
+@pytest.mark.parametrize("tick_size, step_size, price, quantity, expected_price, expected_quantity", [
+    ("0.10", "0.001", 43123.456, 0.12345, "43123.5", "0.123"),
+    ("0.5", "1", 10.26, 7.6, "10.5", "8"),  # tick is not power of ten
+    ("5", "0.0050", 1237.0, 0.0124, "1235", "0.010"),
+    ("0.0001", "10", 0.30000000000000004, 1234.0, "0.3000", "1230"),
+])
+def test_prices_and_quantities_are_snapped_to_filters(tick_size, step_size, price, quantity,
+                                                     expected_price, expected_quantity):
+    quantizer = SymbolQuantizer.from_filters(tick_size, step_size)
+    assert quantizer.format_price(price) == expected_price
+    assert quantizer.format_quantity(quantity) == expected_quantity
+    assert quantizer.round_price(price) == float(expected_price)
+    assert quantizer.round_quantity(quantity) == float(expected_quantity)
+
+
+def test_batch_formatting_matches_single_one():
+    quantizer = SymbolQuantizer.from_filters("0.01", "0.001")
+    prices, quantities = [0.015, 1.004, 99.999], [0.0005, 1.2344, 3.0]
+    assert quantizer.format_prices(prices) == [quantizer.format_price(p) for p in prices]
+    assert quantizer.format_quantities(quantities) == [quantizer.format_quantity(q) for q in quantities]
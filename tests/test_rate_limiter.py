@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from app.schemas.enums import RequestPriority
+from app.services.connectors.binance_conn.rate_limiter import BinanceRateLimiter, TokenBucket
+
+
+def _drain(bucket: TokenBucket, left: float) -> None:
+    """ Leaves left part of bucket capacity """
+    bucket.take(round(bucket.capacity * (1 - left)))
+
+
+def test_bucket_refills_linearly():
+    bucket = TokenBucket(capacity=100, interval=1)
+    bucket.take(100)
+    assert bucket.wait_time(10) == pytest.approx(0.1, abs=0.02)
+    time.sleep(0.1)
+    assert bucket.wait_time(10) == pytest.approx(0, abs=0.02)
+
+
+def test_bucket_keeps_reserve_and_syncs_with_exchange():
+    bucket = TokenBucket(capacity=100, interval=60)
+    bucket.take(70)
+    assert bucket.wait_time(10) == 0
+    assert bucket.wait_time(10, reserve=25) > 0
+    bucket.sync(used=95)
+    assert bucket.used == 95
+    bucket.sync(used=10)  # exchange usage lower than local one does not give tokens back
+    assert bucket.used == 95
+
+
+def test_costs_and_default_priorities():
+    limiter = BinanceRateLimiter()
+    _drain(limiter._weight, left=0.1)
+
+    # GET requests are LOW and can not take reserve of orders and closes
+    assert limiter._try_acquire("key", "GET", "/fapi/v2/balance",
+                                limiter._default_priority("GET")) > 0
+    assert limiter._try_acquire("key", "POST", "/fapi/v1/order",
+                                limiter._default_priority("POST")) == 0
+    assert limiter.get_status("key")["used_orders_10s"] == 1
+
+
+@pytest.mark.parametrize("priority, served", [
+    (RequestPriority.LOW, False),
+    (RequestPriority.HIGH, False),
+    (RequestPriority.CRITICAL, True),
+])
+def test_only_critical_requests_take_last_orders(priority: RequestPriority, served: bool):
+    limiter = BinanceRateLimiter()
+    _drain(limiter._order_buckets("key")[0], left=0.03)
+    wait: float = limiter._try_acquire("key", "POST", "/fapi/v1/order", priority)
+    assert (wait == 0) is served
+
+
+def test_waiting_critical_request_goes_first():
+    limiter = BinanceRateLimiter()
+    orders_10s, _ = limiter._order_buckets("key")
+    orders_10s.take(orders_10s.capacity)
+    served: list[RequestPriority] = []
+
+    def acquire(priority: RequestPriority) -> None:
+        limiter.acquire("key", "POST", "/fapi/v1/order", priority)
+        served.append(priority)
+
+    critical = threading.Thread(target=acquire, args=(RequestPriority.CRITICAL,))
+    critical.start()
+    time.sleep(0.05)
+    high = threading.Thread(target=acquire, args=(RequestPriority.HIGH,))
+    high.start()
+    critical.join(timeout=5)
+    high.join(timeout=5)
+    assert served == [RequestPriority.CRITICAL, RequestPriority.HIGH]
+
+
+def test_ban_stops_all_requests():
+    limiter = BinanceRateLimiter()
+    limiter.on_error(500, {"Retry-After": "30"})
+    assert limiter._try_acquire("key", "POST", "/fapi/v1/order", RequestPriority.CRITICAL) == 0
+
+    limiter.on_error(429, {"Retry-After": "30"})
+    assert limiter._try_acquire("key", "POST", "/fapi/v1/order", RequestPriority.CRITICAL) == \
+        pytest.approx(30, abs=1)
+    assert limiter.get_status("key")["banned_until"] is not None
+
+
+def test_headers_sync_buckets():
+    limiter = BinanceRateLimiter()
+    limiter.update_from_headers("key", {"X-MBX-USED-WEIGHT-1M": "1000", "X-MBX-ORDER-COUNT-10S": "7"})
+    status = limiter.get_status("key")
+    assert status["used_weight"] == 1000
+    assert status["used_orders_10s"] == 7
+    assert limiter.get_status("other")["used_orders_10s"] == 0
@@ -0,0 +1,66 @@
+from app.schemas.enums import ReconciliationActionKind, SkipReason
+from app.services.connectors.binance_conn.reconciliation import fingerprint_symbols, reconcile
+
+
+def _position(symbol: str, side: str = "BOTH") -> dict:
+    return {"symbol": symbol, "positionSide": side, "positionAmt": "1"}
+
+
+def _trader_order(order_id: int, symbol: str, side: str = "BOTH") -> dict:
+    return {"orderId": order_id, "clientOrderId": f"web_{order_id}", "symbol": symbol, "positionSide": side,
+            "origQty": "2"}
+
+
+def _client_order(order_id: int, trader_order_id: int, symbol: str) -> dict:
+    return {"orderId": order_id, "clientOrderId": str(trader_order_id), "symbol": symbol, "positionSide": "BOTH",
+            "origQty": "1"}
+
+
+def test_plan_makes_client_follow_trader():
+    plan = reconcile(
+        trader_positions=[_position("BTCUSDT")],
+        client_positions=[_position("BTCUSDT"), _position("ETHUSDT")],
+        trader_orders=[_trader_order(1, "BTCUSDT"), _trader_order(2, "BTCUSDT"), _trader_order(3, "XRPUSDT")],
+        client_orders=[_client_order(10, 1, "BTCUSDT"), _client_order(11, 9, "BTCUSDT")],
+        multiplier=0.5
+    )
+
+    assert [a.key for a in plan] == [
+        ("CLOSE_POSITION", "ETHUSDT", "BOTH"),  # trader has no position
+        ("CANCEL_ORDER", "BTCUSDT", "11"),  # trader order 9 is gone
+        ("COPY_ORDER", "BTCUSDT", "2"),  # both are in position
+        ("COPY_ORDER", "XRPUSDT", "3"),  # both are not in position
+    ]
+    assert plan.copy_orders[0].target["origQty"] == 1.0
+    assert len(plan) == 4
+
+
+def test_order_is_skipped_when_only_one_account_is_in_position():
+    plan = reconcile(
+        trader_positions=[_position("BTCUSDT")],
+        client_positions=[_position("ETHUSDT")],
+        trader_orders=[_trader_order(1, "BTCUSDT"), _trader_order(2, "ETHUSDT")],
+        client_orders=[],
+    )
+    assert [(a.kind, a.symbol, a.reason) for a in plan.skipped] == [
+        (ReconciliationActionKind.SKIP, "BTCUSDT", SkipReason.CLIENT_HAS_NO_POSITION),
+        (ReconciliationActionKind.SKIP, "ETHUSDT", SkipReason.TRADER_HAS_NO_POSITION),
+    ]
+    assert plan.copy_orders == []
+
+
+def test_only_passed_symbols_are_reconciled_and_inputs_are_not_changed():
+    trader_orders = [_trader_order(1, "BTCUSDT"), _trader_order(2, "ETHUSDT")]
+    plan = reconcile([], [_position("XRPUSDT")], trader_orders, [], multiplier=2, symbols={"ETHUSDT"})
+    assert [a.key for a in plan] == [("COPY_ORDER", "ETHUSDT", "2")]
+    assert trader_orders[1]["origQty"] == "2"
+
+
+def test_fingerprint_changes_only_for_changed_symbol():
+    positions, orders = [_position("BTCUSDT")], [_trader_order(1, "BTCUSDT"), _trader_order(2, "ETHUSDT")]
+    before = fingerprint_symbols(positions, [], orders, [])
+    after = fingerprint_symbols(positions, [], orders, [_client_order(10, 2, "ETHUSDT")])
+    assert before.keys() == after.keys() == {"BTCUSDT", "ETHUSDT"}
+    assert before["BTCUSDT"] == after["BTCUSDT"]
+    assert before["ETHUSDT"] != after["ETHUSDT"]
+    assert fingerprint_symbols(positions, [], orders[::-1], []) == before  # order of lists does not matter
@@ -0,0 +1,123 @@
+import time
+from typing import Optional
+
+import pytest
+
+from app.devtools.replay import MockConnector
+from app.schemas.enums import Exchange
+from app.schemas.models import TraderSettings, UserSettings
+from app.services.connectors.binance_conn import BinanceConnector, BinanceTraderWebsocket
+
+SINCE: int = 1_700_000_000_000
+
+
+def _order(order_id: int, symbol: str, status: str, update_time: int, type: str = "LIMIT",
+           executed: str = "0", side: str = "BUY") -> dict:
+    return {"orderId": order_id, "symbol": symbol, "status": status, "clientOrderId": f"c{order_id}", "price": "1",
+            "avgPrice": "0", "origQty": "1", "executedQty": executed, "timeInForce": "GTC", "type": type,
+            "reduceOnly": False, "closePosition": False, "side": side, "positionSide": "BOTH", "stopPrice": "0",
+            "workingType": "CONTRACT_PRICE", "priceProtect": False, "origType": type, "updateTime": update_time}
+
+
+def _position(symbol: str, amount: str) -> dict:
+    return {"symbol": symbol, "positionAmt": amount, "entryPrice": "1", "breakEvenPrice": "1", "unRealizedProfit": "0",
+            "marginType": "cross", "isolatedWallet": "0", "positionSide": "BOTH", "updateTime": SINCE - 100}
+
+
+class TraderConnector(MockConnector):
+    """ Trader account after gap: BTCUSDT long is closed by market order, ETHUSDT is opened and closed in gap,
+    XRPUSDT position and order are not touched """
+
+    def __init__(self) -> None:
+        super().__init__(api_key="trader")
+        self.history_requests: list[str] = []
+
+    def get_all_open_orders(self) -> list[dict]:
+        return [_order(9, "XRPUSDT", "NEW", SINCE - 100)]
+
+    def get_all_open_positions(self) -> list[dict]:
+        return [_position("XRPUSDT", "5")]
+
+    def get_income_history(self, start_time: int) -> list[dict]:
+        return [{"symbol": "BTCUSDT", "incomeType": "COMMISSION", "time": SINCE + 20, "tranId": 1},
+                {"symbol": "ETHUSDT", "incomeType": "COMMISSION", "time": SINCE + 30, "tranId": 2},
+                {"symbol": "ETHUSDT", "incomeType": "REALIZED_PNL", "time": SINCE + 40, "tranId": 3},
+                {"symbol": "", "incomeType": "TRANSFER", "time": SINCE + 50, "tranId": 4}]
+
+    def get_order_history(self, symbol: str, start_time: Optional[int] = None,
+                          order_id: Optional[int] = None) -> list[dict]:
+        self.history_requests.append(symbol)
+        if symbol == "BTCUSDT":
+            return [_order(1, symbol, "FILLED", SINCE - 50, "MARKET", "1"),  # before gap, is not replayed
+                    _order(2, symbol, "FILLED", SINCE + 20, "MARKET", "1", "SELL")]
+        if symbol == "ETHUSDT":
+            return [_order(3, symbol, "FILLED", SINCE + 30, "MARKET", "1"),
+                    _order(4, symbol, "FILLED", SINCE + 40, "MARKET", "1", "SELL")]
+        return []
+
+    def get_trade_history(self, symbol: str, start_time: int) -> list[dict]:
+        return []
+
+
+def _websocket(trader: MockConnector, client: MockConnector, callback=None) -> BinanceTraderWebsocket:
+    holder: dict = {}
+    websocket = BinanceTraderWebsocket(
+        connector_factory=lambda which: trader if which == "trader" else client,
+        user_settings=UserSettings(status=True, balance_threshold=0, multiplier=1),
+        trader_settings=TraderSettings(status=True, api_key="t", api_secret="t", exchange=Exchange.BINANCE),
+        callback=callback or (lambda *args: holder["websocket"].handle_websocket_message(*args))
+    )
+    holder["websocket"] = websocket
+    websocket._book.load_snapshot([_order(9, "XRPUSDT", "NEW", SINCE - 100)],
+                                  [_position("BTCUSDT", "1"), _position("XRPUSDT", "5")], 100.0)
+    return websocket
+
+
+def test_catch_up_requests_only_touched_symbols():
+    trader = TraderConnector()
+    _websocket(trader, MockConnector(api_key="client"), callback=lambda *args: None)._catch_up(SINCE)
+    assert sorted(trader.history_requests) == ["BTCUSDT", "ETHUSDT"]
+
+
+def test_catch_up_passes_positions_before_orders():
+    events: list[dict] = []
+    _websocket(TraderConnector(), MockConnector(api_key="client"),
+               callback=lambda _, msg: events.append(msg))._catch_up(SINCE)
+
+    for symbol in ("BTCUSDT", "ETHUSDT"):
+        symbol_events: list[dict] = [e for e in events if (e["o"]["s"] if "o" in e else e["a"]["P"][0]["s"]) == symbol]
+        assert symbol_events[0]["e"] == "ACCOUNT_UPDATE"
+        assert symbol_events[0]["a"]["P"][0]["pa"] == "0"
+        assert all(e["e"] == "ORDER_TRADE_UPDATE" and e["T"] >= symbol_events[0]["T"] for e in symbol_events[1:])
+    assert [e["o"]["i"] for e in events if e["e"] == "ORDER_TRADE_UPDATE"] == [2, 3, 4]
+
+
+def test_catch_up_closes_client_positions_closed_in_gap():
+    client = MockConnector(api_key="client")
+    websocket = _websocket(TraderConnector(), client)
+    websocket._catch_up(SINCE)
+
+    deadline: float = time.monotonic() + 5
+    while len(client.actions) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    websocket._lanes.shutdown()
+
+    assert {a["method"] for a in client.actions} == {"close_position_from_websocket_message"}
+    assert sorted("BTCUSDT" in a["position"] for a in client.actions) == [False, True]
+    assert [p["symbol"] for p in websocket.get_trader_book().get_open_positions()] == ["XRPUSDT"]
+
+
+@pytest.mark.parametrize("rows", [0, 499, 500, 1200])
+def test_order_history_is_paged(monkeypatch, rows: int):
+    connector = BinanceConnector(api_key="key", api_secret="secret")
+    requests: list[Optional[int]] = []
+
+    def call(http_method, url_path, function, **kwargs):
+        requests.append(kwargs["orderId"])
+        first: int = kwargs["orderId"] or 0
+        return [{"orderId": i} for i in range(first, min(first + kwargs["limit"], rows))]
+
+    monkeypatch.setattr(connector, "_call", call)
+    orders: list[dict] = connector.get_order_history("BTCUSDT", start_time=SINCE)
+    assert [o["orderId"] for o in orders] == list(range(rows))
+    assert len(requests) == rows // connector.HISTORY_LIMIT + 1